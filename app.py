@@ -8,6 +8,10 @@ import urllib.parse
 import pathlib
 import os
 import time
+import typing
+import collections
+import concurrent.futures
+import asyncio
 
 
 def __description() -> str:
@@ -25,6 +29,212 @@ def __init_cli() -> argparse:
 
     parser.add_argument("--nocommit", action="store_true")
 
+    parser.add_argument(
+        "--depth",
+        type=int,
+        help="Clone and fetch the coArchi repository with history truncated to this many commits.",
+    )
+
+    parser.add_argument(
+        "--filter",
+        help="Partial clone filter, e.g. blob:none to fetch file contents only when they are checked out.",
+    )
+
+    parser.add_argument(
+        "--sparse",
+        action="store_true",
+        help="Check out only the model directory of the coArchi repository.",
+    )
+
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Number of model files processed concurrently. Default is 1, i.e. files are processed one by one.",
+    )
+
+    parser.add_argument(
+        "--retry-backoff",
+        type=float,
+        default=60,
+        help="Seconds before the first retry of a file which failed to process. Each next retry of the file waits twice as long, up to one hour. A file is given up after 6 retries. Default is 60.",
+    )
+
+    parser.add_argument(
+        "--include",
+        action="append",
+        help="Glob of model files to inspect, relative to the clone dir, e.g. model/business/*. May be repeated. Default is all files.",
+    )
+
+    parser.add_argument(
+        "--exclude",
+        action="append",
+        help="Glob of model files to skip, relative to the clone dir, e.g. model/diagrams/*. May be repeated.",
+    )
+
+    parser.add_argument(
+        "--inventory",
+        action="store_true",
+        help="Enumerate model files from the git index. Remember, per git blob SHA, whether a file has inspector properties and which URLs, so that unchanged files are not read again to find out. The inventory is kept in the .git dir of the local clone.",
+    )
+
+    parser.add_argument(
+        "--prefetch",
+        action="store_true",
+        help="Before processing files, collect distinct dependency URLs across all the model files and resolve each of them once, using --workers concurrent workers.",
+    )
+
+    parser.add_argument(
+        "--async",
+        dest="use_async",
+        action="store_true",
+        help="Same as --prefetch, but resolve the URLs on an asyncio event loop with up to --concurrency resolver calls in flight.",
+    )
+
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=100,
+        help="Maximum number of in-flight resolver calls in --async mode. Default is 100.",
+    )
+
+    parser.add_argument(
+        "--shard",
+        type=lib.parseShard,
+        metavar="i/N",
+        help="Inspect only the i-th of N slices of the model, i is 0..N-1, and write the changed files to --shard-output instead of committing them. Files which share dependency URLs are in the same slice.",
+    )
+
+    parser.add_argument(
+        "--merge-shards",
+        type=int,
+        metavar="N",
+        help="Instead of inspecting the model, commit and push the changed files which N shards wrote to --shard-output.",
+    )
+
+    parser.add_argument(
+        "--shard-output",
+        help="Directory, shared by the shards and the --merge-shards run, for the changed files of the shards.",
+    )
+
+    parser.add_argument(
+        "--report",
+        metavar="FILE",
+        help="Write a JSON report of the run: time per stage, parse, resolve per scheme and host, and write time, cache hits and misses and bytes fetched per UrlResolver, the slowest files and dependency URLs.",
+    )
+
+    parser.add_argument(
+        "--report-top",
+        type=int,
+        default=10,
+        help="Number of the slowest files and dependency URLs in --report. Default is 10.",
+    )
+
+    parser.add_argument(
+        "--prometheus-textfile",
+        metavar="FILE",
+        help="Write the figures of --report as metrics for the Prometheus node exporter's textfile collector.",
+    )
+
+    parser.add_argument(
+        "--profile",
+        metavar="FILE",
+        help="Run under cProfile, write pstats to the file and log the top functions by cumulative time. With --workers 1, files are processed on the main thread, so that they are profiled on any Python version.",
+    )
+
+    parser.add_argument(
+        "--profile-top",
+        type=int,
+        default=20,
+        help="Number of functions in the --profile summary. Default is 20.",
+    )
+
+    parser.add_argument(
+        "--profile-memory",
+        action="store_true",
+        help="Trace allocations with tracemalloc and log the peak of each stage: plugin_load, parse, resolve, serialize, commit. Accurate with --workers 1.",
+    )
+
+    parser.add_argument(
+        "--trace",
+        metavar="FILE",
+        help="Write every resolver call, with nested git, API, HTTP and regex spans, as a Chrome trace-event JSON file, which e.g. Perfetto loads.",
+    )
+
+    parser.add_argument(
+        "--call-timeout",
+        type=float,
+        metavar="SECONDS",
+        help="Timeout of every network call of the plugins: HTTP requests, API calls, git fetches. Default is no timeout.",
+    )
+
+    parser.add_argument(
+        "--scheme-call-timeout",
+        action="append",
+        metavar="SCHEME=SECONDS",
+        help="--call-timeout for the plugin of a URL scheme, e.g. gitlab=600. May be repeated.",
+    )
+
+    parser.add_argument(
+        "--deadline",
+        type=float,
+        metavar="SECONDS",
+        help="Seconds from the start of a run after which no more files and dependency URLs are started. The files processed by then are committed.",
+    )
+
+    parser.add_argument(
+        "--plan",
+        action="store_true",
+        help="Instead of inspecting the model, print how many distinct dependency URLs it has, by scheme, host, GitLab project and ref pair, AWS service and region and k8s context, and how many distinct API calls and git fetches inspecting it would make. Reads the existing local clone as is, without touching the network.",
+    )
+
+    parser.add_argument(
+        "--daemon",
+        action="store_true",
+        help="Keep running, inspecting the model every --interval seconds. Plugins and their caches are kept between cycles.",
+    )
+
+    parser.add_argument(
+        "--interval",
+        type=float,
+        default=3600,
+        help="Seconds between cycles in --daemon mode. Default is 3600.",
+    )
+
+    parser.add_argument(
+        "--cache-ttl",
+        type=float,
+        default=0,
+        help="Seconds a resolved dependency is cached in --daemon mode. Expired entries are re-fetched in the next cycle. Default is 0, i.e. every cycle re-fetches everything.",
+    )
+
+    parser.add_argument(
+        "--scheme-cache-ttl",
+        action="append",
+        metavar="SCHEME=SECONDS",
+        help="Cache TTL for the dependencies of a URL scheme, e.g. boto3=3600. Schemes served by the same plugin share the TTL. May be repeated.",
+    )
+
+    parser.add_argument(
+        "--cache-db",
+        metavar="FILE",
+        help="Keep resolved dependencies across runs in this SQLite file. Contents at a commit SHA are kept until purged, others for --cache-db-ttl. Values are stored as is, secrets included. Inspect and purge it with cache_db.py.",
+    )
+
+    parser.add_argument(
+        "--cache-db-ttl",
+        type=float,
+        default=3600,
+        help="Seconds a resolved dependency which may change is kept in --cache-db. Default is 3600.",
+    )
+
+    parser.add_argument(
+        "--scheme-cache-db-ttl",
+        action="append",
+        metavar="SCHEME=SECONDS",
+        help="--cache-db-ttl for the dependencies of a URL scheme, e.g. boto3=3600. May be repeated.",
+    )
+
     parser.add_argument(
         "-l",
         "--log",
@@ -47,69 +257,440 @@ def redact_url(url: str) -> str:
     return url
 
 
-def main():
+def __processFiles(
+    logger: logging.Logger,
+    plugins,
+    files,
+    workers: int,
+    retry_backoff: float,
+    deadline: float | None = None,  # time.monotonic()
+) -> typing.Tuple[typing.List, typing.List[Exception], typing.List]:
+    """Process the files. A file which fails is parked in a retry queue, while other files keep being processed.
 
-    __cli_args = __init_cli().parse_args()
+    At the deadline, files which are not being processed yet are given up, and files being processed are let finish.
+    Return the files which processFile rewrote, the errors of the files which ran out of retries,
+    and the files which were not processed by the deadline.
+    """
+    retry_queue = lib.RetryQueue(initial_backoff=retry_backoff)
+    changed_files = []
+    errors: typing.List[Exception] = []
+    not_processed = []
+    deadline_reached = False
+    pending = collections.deque(files)
 
-    logging.basicConfig(
-        format="%(asctime)s %(levelname).1s %(message)s", level=__cli_args.log
+    # Under --profile with one worker, the executor processes each file on this thread when it is submitted
+    with lib.newExecutor(workers) as executor:
+        futures = {}
+        while pending or futures or retry_queue:
+            # As many files in flight as workers, so that files not started yet are given up at the deadline
+            while pending and len(futures) < workers:
+                file = pending.popleft()
+                futures[executor.submit(lib.processFile, logger, plugins, file)] = file
+            timeouts = [retry_queue.nextDueIn()] if retry_queue else []
+            if deadline is not None and not deadline_reached:
+                timeouts.append(max(0, deadline - time.monotonic()))
+            timeout = min(timeouts) if timeouts else None
+            if futures:
+                done, _ = concurrent.futures.wait(
+                    futures,
+                    timeout=timeout,
+                    return_when=concurrent.futures.FIRST_COMPLETED,
+                )
+            else:
+                time.sleep(timeout)
+                done = []
+
+            for future in done:
+                file = futures.pop(future)
+                try:
+                    if future.result():
+                        changed_files.append(file)
+                except Exception as e:
+                    if deadline_reached:
+                        logger.error(f"Error processing {file}: {e}. Past the deadline")
+                        not_processed.append(file)
+                        continue
+                    delay = retry_queue.park(file)
+                    if delay is None:
+                        logger.error(f"Error processing {file}: {e}. Giving up")
+                        errors.append(e)
+                    else:
+                        logger.error(
+                            f"Error processing {file}: {e}. Retrying in {delay:.0f} seconds"
+                        )
+
+            if (
+                deadline is not None
+                and not deadline_reached
+                and time.monotonic() >= deadline
+            ):
+                deadline_reached = True
+                cancelled = [future for future in futures if future.cancel()]
+                not_processed += [futures.pop(future) for future in cancelled]
+                not_processed += pending
+                pending.clear()
+                not_processed += retry_queue.popAll()
+                logger.warning(
+                    f"Deadline reached. Giving up {len(not_processed)} files not being processed yet, waiting for {len(futures)} being processed"
+                )
+
+            for file in retry_queue.popDue():
+                logger.info(f"Retrying {file}")
+                futures[executor.submit(lib.processFile, logger, plugins, file)] = file
+
+    return sorted(changed_files, key=str), errors, not_processed
+
+
+def __discoverFiles(
+    logger: logging.Logger, cloned_repo: git.Repo, __cli_args
+) -> typing.Tuple[typing.List, lib.PrefilterStats, lib.Plan | None]:
+    """Find the model files with inspector properties. The inventory also tells their plan."""
+    git_clone_dir: str = __cli_args.git_clone_dir
+    if __cli_args.inventory:
+        inventory = lib.Inventory(lib.inventoryFileName(cloned_repo))
+        try:
+            return lib.discoverFiles(
+                logger,
+                cloned_repo,
+                inventory,
+                include=__cli_args.include,
+                exclude=__cli_args.exclude,
+            )
+        finally:
+            inventory.close()
+    files, prefilter_stats = lib.prefilterFiles(
+        logger,
+        sorted(pathlib.Path(git_clone_dir).glob("model/**/*.xml")),
+        git_clone_dir,
+        include=__cli_args.include,
+        exclude=__cli_args.exclude,
     )
-    logger = logging.getLogger("app")
+    return files, prefilter_stats, None
+
+
+def __inspect(
+    logger: logging.Logger,
+    plugins,
+    cloned_repo: git.Repo,
+    __cli_args,
+    deadline: float | None = None,  # time.monotonic()
+) -> typing.Tuple[typing.List[str], typing.List[Exception]]:
+    """Find the model files to inspect and process them, until the deadline.
+
+    Return the paths, relative to the clone dir, of the files which were rewritten
+    and the errors of the files which failed to process.
+    """
+    git_clone_dir: str = __cli_args.git_clone_dir
+    report = lib.getRunReport()
+
+    with report.measureStage("discover"):
+        files, prefilter_stats, plan = __discoverFiles(logger, cloned_repo, __cli_args)
 
-    plugins = plugin_registry.Registry(
-        plugin_directory="plugins", logger=logger
-    ).loadPlugins()
-    plugins = [P(logger) for P in plugins]
+    if plan is None and (
+        __cli_args.shard or __cli_args.prefetch or __cli_args.use_async
+    ):
+        logger.info("Planning...")
+        with report.measureStage("plan"):
+            plan = lib.planFiles(logger, files)
 
+    if __cli_args.shard:
+        files, plan = lib.shardPlan(plan, git_clone_dir, *__cli_args.shard)
+        index, count = __cli_args.shard
+        logger.info(f"Shard {index}/{count}: {len(files)} files")
+
+    if __cli_args.prefetch or __cli_args.use_async:
+        logger.info("Resolving planned dependency URLs...")
+        with report.measureStage("prefetch"):
+            if __cli_args.use_async:
+                asyncio.run(
+                    lib.resolvePlanAsync(
+                        logger,
+                        plugins,
+                        plan,
+                        concurrency=__cli_args.concurrency,
+                        deadline=deadline,
+                    )
+                )
+            else:
+                lib.resolvePlan(
+                    logger,
+                    plugins,
+                    plan,
+                    workers=__cli_args.workers,
+                    deadline=deadline,
+                )
+        logger.info("... Resolved")
+
+    if __cli_args.workers > 1:
+        logger.info(f"Processing files with {__cli_args.workers} workers")
+    with report.measureStage("process"):
+        changed_files, errors, not_processed = __processFiles(
+            logger,
+            plugins,
+            files,
+            __cli_args.workers,
+            __cli_args.retry_backoff,
+            deadline,
+        )
+
+    logger.info(
+        f"Summary: {prefilter_stats.total} files found, {prefilter_stats.excluded} excluded, {prefilter_stats.without_inspector_properties} skipped without inspector properties, {prefilter_stats.candidates - len(not_processed)} processed, {len(errors)} failed"
+    )
+    if not_processed:
+        logger.warning(
+            f"{len(not_processed)} files were not processed by the deadline. Committing the partial results"
+        )
+
+    return [
+        os.path.relpath(file, git_clone_dir).replace(os.sep, "/")
+        for file in changed_files
+    ], errors
+
+
+def __printPlan(logger: logging.Logger, plugins, __cli_args) -> None:
+    """Print what inspecting the model of the existing local clone would take, offline."""
+    git_clone_dir: str = __cli_args.git_clone_dir
+    if not os.path.exists(git_clone_dir):
+        raise Exception(f"--plan requires an existing local clone in {git_clone_dir}")
+
+    files, _, plan = __discoverFiles(logger, git.Repo(git_clone_dir), __cli_args)
+    if plan is None:
+        plan = lib.planFiles(logger, files)
+    if __cli_args.shard:
+        files, plan = lib.shardPlan(plan, git_clone_dir, *__cli_args.shard)
+    workload = lib.estimateWorkload(plugins, plan)
+
+    print(f"Files with dependency URLs: {workload['files']}")
+    print(f"Distinct dependency URLs: {workload['urls']}")
+    if workload["unresolvable_urls"]:
+        print(f"  of them without a plugin: {workload['unresolvable_urls']}")
+    for title, counts in [
+        ("scheme", workload["urls_by_scheme"]),
+        ("host", workload["urls_by_host"]),
+    ] + list(workload["urls_by_group"].items()):
+        print(f"Distinct URLs by {title}:")
+        for key, count in sorted(counts.items(), key=lambda item: (-item[1], item[0])):
+            print(f"  {count:8} {key}")
+    print("Estimated distinct calls:")
+    for kind, count in sorted(workload["calls"].items()):
+        print(f"  {count:8} {kind}")
+
+
+def __syncClone(logger: logging.Logger, __cli_args) -> git.Repo:
+    """Clone the coArchi repo, or bring the existing local clone up to date."""
     coarchi_git_repo_url: str = __cli_args.coarchi_git_repo_url
     git_clone_dir: str = __cli_args.git_clone_dir
 
+    fetch_options = {}
+    if __cli_args.depth:
+        fetch_options["depth"] = __cli_args.depth
+    clone_options = dict(fetch_options)
+    if __cli_args.filter:
+        clone_options["filter"] = __cli_args.filter
+    if __cli_args.sparse:
+        clone_options["sparse"] = True
+
     logger.info(f"Processing coArchi repo: {redact_url(coarchi_git_repo_url)}")
     logger.info(f"Local clone dir: {git_clone_dir}")
     if os.path.exists(git_clone_dir):
         if not os.path.isdir(git_clone_dir):
             raise Exception(f"Can not use {git_clone_dir} as local clone dir.")
         else:
-            logger.info("Local clone dir exists. Pulling...")
             cloned_repo = git.Repo(git_clone_dir)
-            git.remote.Remote(cloned_repo, "origin").pull()
-            logger.info("... Pulled")
+            if clone_options:
+                # Pull would merge, which may need history beyond the fetched depth.
+                # Nothing to merge anyway, as the local clone only gets commits of this app.
+                logger.info("Local clone dir exists. Fetching...")
+                cloned_repo.remotes.origin.fetch(**fetch_options)
+                cloned_repo.head.reset(
+                    f"origin/{cloned_repo.active_branch.name}",
+                    index=True,
+                    working_tree=True,
+                )
+                logger.info("... Fetched and reset")
+            else:
+                logger.info("Local clone dir exists. Pulling...")
+                git.remote.Remote(cloned_repo, "origin").pull()
+                logger.info("... Pulled")
     else:
         logger.info("Local clone dir does not exist. Cloning...")
         cloned_repo = git.Repo.clone_from(
-            coarchi_git_repo_url, git_clone_dir
-        )  # TODO: No history
+            coarchi_git_repo_url, git_clone_dir, **clone_options
+        )
+        if __cli_args.sparse:
+            cloned_repo.git.sparse_checkout("set", "model")
         logger.info("... Cloned")
+    return cloned_repo
 
-    changes_detected = False
-    files = pathlib.Path(git_clone_dir).glob("model/**/*.xml")
-    for file in files:
-        backoff_timeout = 60  # seconds
-        while True:
-            try:
-                changes_detected |= lib.processFile(logger, plugins, file)
-                break
-            except Exception as e:
-                if backoff_timeout >= 3600:
-                    raise
-                logger.error(f"Error processing {file}: {e}")
-                logger.error(f"Sleep {backoff_timeout} seconds before retrying...")
-                time.sleep(backoff_timeout)
-                logger.error("Continue processing...")
-                backoff_timeout *= 2
-
-    if changes_detected and not __cli_args.nocommit:
-        logger.info("Preparing git commit...")
-        modified_files_map = map(lambda item: item.a_path, cloned_repo.index.diff(None))
-        cloned_repo.index.add(modified_files_map)
-        cloned_repo.index.commit(
-            "Report detected changes",
-            author=git.Actor(
-                "Archi Power Tools Inspector", "some@email.com"
-            ),  # TODO: Make email configurable
+
+def __runCycle(logger: logging.Logger, plugins, __cli_args) -> None:
+    """Bring the local clone up to date, inspect the model and commit the detected changes."""
+    git_clone_dir: str = __cli_args.git_clone_dir
+    report = lib.startRunReport()
+    for url_resolver in plugin_registry.getUrlResolvers(plugins):
+        url_resolver.resetCacheStats()
+    deadline = (
+        time.monotonic() + __cli_args.deadline if __cli_args.deadline else None
+    )
+    try:
+        with report.measureStage("clone"):
+            cloned_repo = __syncClone(logger, __cli_args)
+
+        if __cli_args.merge_shards:
+            with report.measureStage("merge_shards"):
+                changed_paths = lib.mergeShardOutputs(
+                    logger,
+                    __cli_args.shard_output,
+                    __cli_args.merge_shards,
+                    git_clone_dir,
+                    cloned_repo.head.commit.hexsha,
+                )
+            errors = []
+        else:
+            changed_paths, errors = __inspect(
+                logger, plugins, cloned_repo, __cli_args, deadline
+            )
+
+        if __cli_args.shard:
+            lib.writeShardOutput(
+                logger,
+                __cli_args.shard_output,
+                *__cli_args.shard,
+                git_clone_dir,
+                changed_paths,
+                len(errors),
+                cloned_repo.head.commit.hexsha,
+            )
+        elif changed_paths and not __cli_args.nocommit:
+            logger.info(f"Preparing git commit of {len(changed_paths)} files...")
+            with report.measureStage("commit"), lib.measureMemory("commit"):
+                cloned_repo.index.add(changed_paths)
+                cloned_repo.index.commit(
+                    "Report detected changes",
+                    author=git.Actor(
+                        "Archi Power Tools Inspector", "some@email.com"
+                    ),  # TODO: Make email configurable
+                )
+            logger.info(f"... Committed in {report.stages['commit']:.1f} seconds")
+            logger.info("Pushing to the origin...")
+            with report.measureStage("push"):
+                cloned_repo.remotes.origin.push()
+            logger.info(f"... Pushed in {report.stages['push']:.1f} seconds")
+
+        if errors:
+            raise Exception(f"Failed to process {len(errors)} files") from errors[0]
+    finally:
+        # Also for a failed run, to see where it went
+        report_dict = report.toDict(plugins, top=__cli_args.report_top)
+        if __cli_args.report:
+            lib.writeRunReport(report_dict, __cli_args.report)
+            logger.info(f"Run report written to {__cli_args.report}")
+        if __cli_args.prometheus_textfile:
+            lib.writePrometheusTextfile(report_dict, __cli_args.prometheus_textfile)
+
+
+def __perScheme(
+    plugins, scheme_values: typing.List[str] | None, option: str
+) -> typing.Iterator[typing.Tuple[plugin_registry.IUrlResolver, float]]:
+    """Yield the UrlResolver and the value of each SCHEME=VALUE of the option."""
+    for scheme_value in scheme_values or []:
+        scheme, value = scheme_value.split("=")
+        url_resolver = plugin_registry.getUrlResolver(plugins, scheme)
+        if url_resolver is None:
+            raise Exception(f"No plugin for scheme in {option}: {scheme}")
+        yield url_resolver, float(value)
+
+
+def __setCallTimeouts(plugins, __cli_args) -> None:
+    if __cli_args.call_timeout:
+        plugin_registry.configureUrlResolvers(
+            plugins,
+            lambda url_resolver: url_resolver.setCallTimeout(__cli_args.call_timeout),
+        )
+    for url_resolver, timeout in __perScheme(
+        plugins, __cli_args.scheme_call_timeout, "--scheme-call-timeout"
+    ):
+        url_resolver.setCallTimeout(timeout)
+
+
+def __openPersistentCache(
+    plugins, __cli_args
+) -> plugin_registry.PersistentCache | None:
+    if not __cli_args.cache_db:
+        return None
+    persistent_cache = plugin_registry.PersistentCache(__cli_args.cache_db)
+    plugin_registry.configureUrlResolvers(
+        plugins,
+        lambda url_resolver: url_resolver.setPersistentCache(
+            persistent_cache, __cli_args.cache_db_ttl
+        ),
+    )
+    for url_resolver, ttl in __perScheme(
+        plugins, __cli_args.scheme_cache_db_ttl, "--scheme-cache-db-ttl"
+    ):
+        url_resolver.setPersistentCache(persistent_cache, ttl)
+    return persistent_cache
+
+
+def __runDaemon(logger: logging.Logger, plugins, __cli_args) -> None:
+    """Run cycles forever, keeping the plugins and their caches between cycles."""
+    plugin_registry.configureUrlResolvers(
+        plugins, lambda url_resolver: url_resolver.setCacheTtl(__cli_args.cache_ttl)
+    )
+    for url_resolver, ttl in __perScheme(
+        plugins, __cli_args.scheme_cache_ttl, "--scheme-cache-ttl"
+    ):
+        url_resolver.setCacheTtl(ttl)
+
+    while True:
+        try:
+            __runCycle(logger, plugins, __cli_args)
+        except Exception as e:
+            logger.error(f"Error in cycle: {e}")
+        evicted = sum(
+            url_resolver.evictExpired()
+            for url_resolver in plugin_registry.getUrlResolvers(plugins)
+        )
+        logger.info(
+            f"Evicted {evicted} expired cache entries. Sleeping {__cli_args.interval} seconds before the next cycle..."
         )
-        logger.info("Pushing to the origin...")
-        cloned_repo.remotes.origin.push()
+        time.sleep(__cli_args.interval)
+
+
+def main():
+
+    parser = __init_cli()
+    __cli_args = parser.parse_args()
+    if (__cli_args.shard or __cli_args.merge_shards) and not __cli_args.shard_output:
+        parser.error("--shard and --merge-shards require --shard-output")
+
+    logging.basicConfig(
+        format="%(asctime)s %(levelname).1s %(message)s", level=__cli_args.log
+    )
+    logger = logging.getLogger("app")
+
+    with lib.profiled(
+        logger, __cli_args.profile, __cli_args.profile_top, __cli_args.profile_memory
+    ), plugin_registry.tracing.traced(__cli_args.trace):
+        with lib.measureMemory("plugin_load"):
+            # Plugins are imported when the model first has a URL of their schemes
+            plugins = plugin_registry.Registry(
+                plugin_directory="plugins", logger=logger
+            ).loadPluginsLazily()
+        __setCallTimeouts(plugins, __cli_args)
+
+        if __cli_args.plan:
+            __printPlan(logger, plugins, __cli_args)
+        else:
+            persistent_cache = __openPersistentCache(plugins, __cli_args)
+            try:
+                if __cli_args.daemon:
+                    __runDaemon(logger, plugins, __cli_args)
+                else:
+                    __runCycle(logger, plugins, __cli_args)
+            finally:
+                if persistent_cache:
+                    persistent_cache.close()
 
     logger.info("Done")
 
@@ -0,0 +1,108 @@
+"""Requests per second of the https plugin against a local HTTPS server.
+
+Compares a new connection per request, as with requests.get, to the plugin's pooled sessions.
+Run from the repository root: python benchmarks/https_plugin.py
+"""
+
+import argparse
+import concurrent.futures
+import gzip
+import http.server
+import logging
+import os
+import ssl
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import plugins.https.handler  # noqa: E402
+
+BODY = b'{"some_attr": "some value", "padding": "' + b"x" * 4096 + b'"}'
+
+
+class Handler(http.server.BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # Keep-alive
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        body = BODY
+        self.send_response(200)
+        if "gzip" in self.headers.get("Accept-Encoding", ""):
+            body = gzip.compress(body)
+            self.send_header("Content-Encoding", "gzip")
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def startServer(cert_dir: str) -> http.server.ThreadingHTTPServer:
+    cert_file = os.path.join(cert_dir, "cert.pem")
+    key_file = os.path.join(cert_dir, "key.pem")
+    subprocess.run(
+        ["openssl", "req", "-x509", "-newkey", "rsa:2048", "-nodes", "-days", "1"]
+        + ["-subj", "/CN=localhost", "-addext", "subjectAltName=DNS:localhost"]
+        + ["-keyout", key_file, "-out", cert_file],
+        check=True,
+        capture_output=True,
+    )
+    os.environ["REQUESTS_CA_BUNDLE"] = cert_file
+
+    server = http.server.ThreadingHTTPServer(("localhost", 0), Handler)
+    context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+    context.load_cert_chain(cert_file, key_file)
+    server.socket = context.wrap_socket(server.socket, server_side=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def newConnectionPerRequest(url: str) -> bytes:
+    # What the plugin did before pooling
+    return requests.get(url).text.encode()
+
+
+def measure(name: str, fetch, urls, workers: int) -> None:
+    started = time.perf_counter()
+    with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+        for _ in executor.map(fetch, urls):
+            pass
+    seconds = time.perf_counter() - started
+    print(f"{name}: {len(urls) / seconds:.0f} requests per second")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--workers", type=int, default=4)
+    cli_args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as cert_dir:
+        server = startServer(cert_dir)
+        urls = [
+            f"https://localhost:{server.server_port}/{i}"
+            for i in range(cli_args.requests)
+        ]
+        url_resolver = plugins.https.handler.UrlResolver(
+            logging.getLogger("benchmark"), {}, pool_size=cli_args.workers
+        )
+
+        measure(
+            "New connection per request",
+            newConnectionPerRequest,
+            urls,
+            cli_args.workers,
+        )
+        measure("Pooled sessions", url_resolver.resolveToContent, urls, cli_args.workers)
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""Requests per second of the https plugin's resolveToContentAsync against a local HTTP server with injected latency.
+
+Compares the thread pool adapter of IUrlResolver, which the plugin used before, to its native async implementation.
+Run from the repository root: python benchmarks/https_plugin_async.py
+"""
+
+import argparse
+import asyncio
+import http.server
+import logging
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import plugin_registry  # noqa: E402
+import plugins.https.handler  # noqa: E402
+
+BODY = b'{"some_attr": "some value", "padding": "' + b"x" * 4096 + b'"}'
+
+
+def startServer(latency: float) -> http.server.ThreadingHTTPServer:
+    class Handler(http.server.BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"  # Keep-alive
+        disable_nagle_algorithm = True
+
+        def do_GET(self):
+            time.sleep(latency)
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(BODY)))
+            self.end_headers()
+            self.wfile.write(BODY)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = http.server.ThreadingHTTPServer(("localhost", 0), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def measure(name: str, url_resolver, resolve, urls, concurrency: int) -> None:
+    async def run():
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def bounded(url):
+            async with semaphore:
+                return await resolve(url_resolver, url)
+
+        try:
+            return await asyncio.gather(*[bounded(url) for url in urls])
+        finally:
+            await url_resolver.closeAsync()
+
+    started = time.perf_counter()
+    results = asyncio.run(run())
+    seconds = time.perf_counter() - started
+    assert all(r.content == BODY for r in results)
+    print(f"{name}: {len(urls) / seconds:.0f} requests per second")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=100,
+        help="Calls in flight, as resolvePlanAsync's.",
+    )
+    parser.add_argument(
+        "--pool-size",
+        type=int,
+        default=plugins.https.handler.DEFAULT_POOL_SIZE,
+        help="Concurrent requests per host of the native implementation.",
+    )
+    parser.add_argument(
+        "--latency", type=float, default=0.05, help="Seconds per response."
+    )
+    cli_args = parser.parse_args()
+
+    server = startServer(cli_args.latency)
+    urls = [
+        f"http://localhost:{server.server_port}/{i}" for i in range(cli_args.requests)
+    ]
+
+    def newUrlResolver():
+        return plugins.https.handler.UrlResolver(
+            logging.getLogger("benchmark"), {}, pool_size=cli_args.pool_size
+        )
+
+    measure(
+        "Thread pool adapter",
+        newUrlResolver(),
+        plugin_registry.IUrlResolver.resolveToContentAsync,
+        urls,
+        cli_args.concurrency,
+    )
+    measure(
+        "Native async",
+        newUrlResolver(),
+        plugins.https.handler.UrlResolver.resolveToContentAsync,
+        urls,
+        cli_args.concurrency,
+    )
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+import plugin_registry
+
+import argparse
+import datetime
+
+
+def __description() -> str:
+    return "Inspect and purge the persistent cache of resolved dependencies, the --cache-db of app.py."
+
+
+def __init_cli() -> argparse:
+    parser = argparse.ArgumentParser(description=__description())
+    parser.add_argument(
+        "cache_db",
+        help="Path and name of the SQLite file.",
+    )
+
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    subparsers.add_parser(
+        "stats", help="Entries, expired entries and compressed bytes per namespace."
+    )
+
+    parser_list = subparsers.add_parser("list", help="List the entries.")
+    parser_purge = subparsers.add_parser(
+        "purge", help="Delete entries. Without options, delete all of them."
+    )
+    for subparser in [parser_list, parser_purge]:
+        subparser.add_argument(
+            "--namespace",
+            help="Only the entries of the namespace, e.g. plugins.boto3.handler:responses.",
+        )
+        subparser.add_argument(
+            "--key-prefix",
+            help="Only the entries which keys start with the prefix, e.g. secretsmanager@.",
+        )
+    parser_purge.add_argument(
+        "--expired",
+        action="store_true",
+        help="Only the expired entries.",
+    )
+
+    return parser
+
+
+def __formatTime(timestamp: float | None) -> str:
+    if timestamp is None:
+        return "never"
+    return datetime.datetime.fromtimestamp(timestamp).isoformat(timespec="seconds")
+
+
+def main():
+
+    __cli_args = __init_cli().parse_args()
+
+    persistent_cache = plugin_registry.PersistentCache(__cli_args.cache_db)
+    try:
+        if __cli_args.command == "stats":
+            for stats in persistent_cache.stats():
+                print(
+                    f"{stats['namespace']}: {stats['entries']} entries, {stats['expired']} expired, {stats['bytes']} bytes"
+                )
+        elif __cli_args.command == "list":
+            for entry in persistent_cache.entries(
+                __cli_args.namespace, __cli_args.key_prefix
+            ):
+                print(
+                    f"{entry['namespace']} {entry['key']} {entry['bytes']} bytes, stored {__formatTime(entry['stored_at'])}, expires {__formatTime(entry['expires_at'])}"
+                )
+        else:
+            count = persistent_cache.purge(
+                __cli_args.namespace, __cli_args.key_prefix, __cli_args.expired
+            )
+            print(f"Purged {count} entries")
+    finally:
+        persistent_cache.close()
+
+
+if __name__ == "__main__":  # pragma: no cover
+    main()
@@ -17,6 +17,25 @@ def __init_cli() -> argparse:
         help="Path and name of the file.",
     )
 
+    parser.add_argument(
+        "--profile",
+        metavar="FILE",
+        help="Run under cProfile, write pstats to the file and log the top functions by cumulative time.",
+    )
+
+    parser.add_argument(
+        "--profile-top",
+        type=int,
+        default=20,
+        help="Number of functions in the --profile summary. Default is 20.",
+    )
+
+    parser.add_argument(
+        "--profile-memory",
+        action="store_true",
+        help="Trace allocations with tracemalloc and log the peak of each stage: plugin_load, parse, resolve, serialize.",
+    )
+
     parser.add_argument(
         "-l",
         "--log",
@@ -39,15 +58,18 @@ def main():
     )
     logger = logging.getLogger("app")
 
-    plugins = plugin_registry.Registry(
-        plugin_directory="plugins", logger=logger
-    ).loadPlugins()
-    plugins = [P(logger) for P in plugins]
-
     in_file_name = __cli_args.file
     out_file_name = "processed.xml"
 
-    changes_detected = lib.processFile(logger, plugins, in_file_name, out_file_name)
+    with lib.profiled(
+        logger, __cli_args.profile, __cli_args.profile_top, __cli_args.profile_memory
+    ):
+        with lib.measureMemory("plugin_load"):
+            plugins = plugin_registry.Registry(
+                plugin_directory="plugins", logger=logger
+            ).loadPluginsLazily()
+
+        changes_detected = lib.processFile(logger, plugins, in_file_name, out_file_name)
     print("Changes detected:", changes_detected)
     if changes_detected:
         diff = difflib.Differ().compare(
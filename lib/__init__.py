@@ -1 +1,27 @@
-from .process_file import processFile, upsertProperty, writeXmlTreeInArchiFormat
+from .process_file import (
+    processFile,
+    upsertProperty,
+    writeXmlTreeInArchiFormat,
+    isVersionedUrl,
+)
+from .plan import (
+    Plan,
+    planFile,
+    planFiles,
+    resolvePlan,
+    resolvePlanAsync,
+    estimateWorkload,
+)
+from .retry_queue import RetryQueue
+from .prefilter import PrefilterStats, hasInspectorProperties, prefilterFiles
+from .inventory import Inventory, inventoryFileName, discoverFiles
+from .shard import parseShard, shardPlan, writeShardOutput, mergeShardOutputs
+from .run_report import RunReport, getRunReport, startRunReport, writeRunReport, writePrometheusTextfile
+from .profiling import (
+    InlineExecutor,
+    MemoryPeaks,
+    getMemoryPeaks,
+    measureMemory,
+    newExecutor,
+    profiled,
+)
@@ -0,0 +1,147 @@
+from .plan import Plan, planFile
+from .prefilter import PrefilterStats, hasInspectorProperties, isIncluded
+
+import typing
+import logging
+import json
+import os
+import sqlite3
+import git
+
+
+class Inventory:
+    """What model files have inspector properties and which URLs, keyed by git blob SHA of the file.
+
+    A blob SHA identifies the content, so an entry never goes stale.
+    """
+
+    def __init__(self, db_file_name: str) -> None:
+        self._connection = sqlite3.connect(db_file_name)
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS blobs (sha TEXT PRIMARY KEY, has_inspector_properties INTEGER, urls TEXT)"
+        )
+
+    def get(
+        self, sha: str
+    ) -> typing.Tuple[bool, typing.List[str], typing.List[str]] | None:
+        """Return whether the file has inspector properties, its URLs and of them its content URLs, see planFile."""
+        row = self._connection.execute(
+            "SELECT has_inspector_properties, urls FROM blobs WHERE sha = ?", (sha,)
+        ).fetchone()
+        if row is None:
+            return None
+        urls = json.loads(row[1])
+        if isinstance(urls, list):
+            # Of inventories which predate content URLs. Resolving all to content fetches each once too.
+            return bool(row[0]), urls, urls
+        return bool(row[0]), urls["urls"], urls["content_urls"]
+
+    def put(
+        self,
+        sha: str,
+        has_inspector_properties: bool,
+        urls: typing.List[str],
+        content_urls: typing.List[str],
+    ):
+        self._connection.execute(
+            "INSERT OR REPLACE INTO blobs VALUES (?, ?, ?)",
+            (
+                sha,
+                int(has_inspector_properties),
+                json.dumps({"urls": urls, "content_urls": content_urls}),
+            ),
+        )
+
+    def commit(self) -> None:
+        self._connection.commit()
+
+    def close(self) -> None:
+        self._connection.close()
+
+
+def inventoryFileName(repo: git.Repo) -> str:
+    # In .git, so that the inventory is never committed to the model repository
+    return os.path.join(repo.git_dir, "pwrt-inspector-inventory.sqlite")
+
+
+def discoverFiles(
+    logger: logging.Logger,
+    repo: git.Repo,
+    inventory: Inventory,
+    include: typing.List[str] | None = None,
+    exclude: typing.List[str] | None = None,
+) -> typing.Tuple[typing.List[str], PrefilterStats, Plan]:
+    """Same as prefilterFiles over model/**/*.xml, but enumerate the files from git
+    and read only those which blobs are not in the inventory yet.
+
+    Return the files to process, the skip counts and the plan of the files.
+    """
+    stats = PrefilterStats()
+    plan = Plan()
+    files = []
+    read_count = 0
+    for path, sha in sorted(_workingTreeBlobShas(repo).items()):
+        if not (path.startswith("model/") and path.endswith(".xml")):
+            continue
+        stats.total += 1
+        if not isIncluded(path, include, exclude):
+            stats.excluded += 1
+            continue
+
+        file_name = os.path.join(repo.working_tree_dir, path)
+        known = inventory.get(sha)
+        if known is None:
+            read_count += 1
+            try:
+                known = _inspectFile(file_name)
+                inventory.put(sha, *known)
+            except Exception as e:
+                # Not fatal here. processFile reports the error when it gets to the file.
+                logger.warning(f"Error inspecting {file_name}: {e}")
+                known = True, [], []
+
+        has_inspector_properties, urls, content_urls = known
+        if not has_inspector_properties:
+            stats.without_inspector_properties += 1
+            continue
+        files.append(file_name)
+        plan.add(file_name, urls, content_urls)
+
+    inventory.commit()
+    stats.candidates = len(files)
+    logger.info(
+        f"Discovered {stats.total} files, {read_count} not in the inventory: {stats.excluded} excluded, {stats.without_inspector_properties} without inspector properties, {stats.candidates} to process"
+    )
+    return files, stats, plan
+
+
+def _workingTreeBlobShas(repo: git.Repo) -> typing.Dict[str, str]:
+    # The blob SHAs of the files in the working tree. Those of the index, which git keeps for the
+    # files it tracks, except for the files changed since they were staged and the untracked ones,
+    # which are hashed as git hash-object does. In the clone after pull, there are none.
+    def nulSeparated(output: str) -> typing.List[str]:
+        return [path for path in output.split("\0") if path]
+
+    shas = {path: entry.hexsha for (path, _stage), entry in repo.index.entries.items()}
+    changed = nulSeparated(repo.git.diff("--name-only", "-z", "--", "model"))
+    untracked = nulSeparated(
+        repo.git.ls_files("--others", "--exclude-standard", "-z", "--", "model")
+    )
+    for path in changed:
+        shas.pop(path, None)  # Deleted ones stay out
+    to_hash = [
+        path
+        for path in changed + untracked
+        if os.path.isfile(os.path.join(repo.working_tree_dir, path))
+    ]
+    if to_hash:
+        shas.update(zip(to_hash, repo.git.hash_object("--", *to_hash).splitlines()))
+    return shas
+
+
+def _inspectFile(
+    file_name: str,
+) -> typing.Tuple[bool, typing.List[str], typing.List[str]]:
+    if not hasInspectorProperties(file_name):
+        return False, [], []
+    return True, *planFile(file_name)
@@ -0,0 +1,255 @@
+from .process_file import isVersionedUrl
+from . import profiling, run_report
+import plugin_registry
+
+import typing
+import logging
+import asyncio
+import itertools
+import time
+import urllib.parse
+import xml.etree.ElementTree as ET
+
+
+class Plan:
+    def __init__(self) -> None:
+        self.files: typing.Dict[str, typing.List[str]] = {}
+        self.urls: typing.Dict[str, None] = {}  # Distinct URLs, in order of appearance
+        # Of the URLs, those which content processFile searches, e.g. value-refs.
+        # The others only need the fingerprint of their content.
+        self.content_urls: typing.Dict[str, None] = {}
+
+    def add(
+        self,
+        file_name: str,
+        urls: typing.List[str],
+        content_urls: typing.Iterable[str] = (),
+    ) -> None:
+        self.files[file_name] = urls
+        for url in urls:
+            self.urls[url] = None
+        for url in content_urls:
+            self.content_urls[url] = None
+
+    def groupByResolverAndHost(
+        self, plugins
+    ) -> typing.Dict[
+        typing.Tuple[plugin_registry.IUrlResolver, str], typing.List[str]
+    ]:
+        groups = {}
+        for url in self.urls:
+            url_parsed = urllib.parse.urlparse(url)
+            url_resolver = plugin_registry.getUrlResolver(plugins, url_parsed.scheme)
+            groups.setdefault((url_resolver, url_parsed.netloc), []).append(url)
+        return groups
+
+
+def planFile(file_name: str) -> typing.Tuple[typing.List[str], typing.List[str]]:
+    """Return the dependency and value-ref URLs which processFile would resolve for the file,
+    and of them the value-ref, which content processFile needs and not only its fingerprint.
+    """
+    root = ET.parse(file_name).getroot()
+
+    if (
+        root.find("./properties[@key='pwrt:inspector:value-requires-reviewing']")
+        is not None
+    ):
+        return [], []
+
+    urls = []
+    content_urls = []
+    deps = root.find("./properties[@key='pwrt:inspector:value-deps']")
+    if deps is not None:
+        urls += deps.get("value").split(";")
+    value_ref = root.find("./properties[@key='pwrt:inspector:value-ref']")
+    if value_ref is not None:
+        urls.append(value_ref.get("value"))
+        content_urls.append(value_ref.get("value"))
+    return urls, content_urls
+
+
+def planFiles(logger: logging.Logger, files) -> Plan:
+    plan = Plan()
+    for file_name in files:
+        try:
+            plan.add(file_name, *planFile(file_name))
+        except Exception as e:
+            # Not fatal here. Planned without URLs, the file still lands in a shard,
+            # where processFile reports the error when it gets to the file.
+            logger.warning(f"Error planning {file_name}: {e}")
+            plan.add(file_name, [])
+    logger.info(
+        f"Planned {len(plan.files)} files, {len(plan.urls)} distinct dependency URLs"
+    )
+    return plan
+
+
+def resolvePlan(
+    logger: logging.Logger,
+    plugins,
+    plan: Plan,
+    workers: int = 1,
+    deadline: float | None = None,  # time.monotonic()
+) -> None:
+    """Resolve every distinct URL of the plan once, filling the UrlResolvers' caches.
+
+    processFile then finds the results in the caches when it is run for each file.
+    No URL is started past the deadline.
+    Unversioned URLs are resolved as processFile resolves them: value-refs to their content,
+    value-deps to the fingerprint of their content, which plugins may hash without holding it, e.g. https.
+    The URLs of each resolver and host are first handed to its prefetch, e.g. for batch API calls.
+    """
+
+    def prefetch(url_resolver: plugin_registry.IUrlResolver, urls: typing.List[str]):
+        if _isPast(deadline):
+            return
+        try:
+            url_resolver.prefetch(urls)
+        except Exception as e:
+            # Not fatal here. The URLs are resolved one by one then.
+            logger.warning(f"Error prefetching {len(urls)} URLs: {e}")
+
+    def resolve(url_resolver: plugin_registry.IUrlResolver, url: str) -> None:
+        if _isPast(deadline):
+            return
+        try:
+            with run_report.getRunReport().measureResolve(url):
+                if isVersionedUrl(url_resolver, urllib.parse.urlparse(url)):
+                    url_resolver.diff(url)
+                elif url in plan.content_urls:
+                    url_resolver.resolveToContent(url)
+                else:
+                    url_resolver.resolveToFingerprint(url)
+        except Exception as e:
+            # Not fatal here. processFile retries and reports the error.
+            logger.warning(f"Error resolving {url}: {e}")
+
+    jobs = _planJobs(logger, plugins, plan)
+    with profiling.newExecutor(workers) as executor:
+        for _ in executor.map(
+            lambda group: prefetch(*group), _prefetchGroups(plugins, plan)
+        ):
+            pass
+        for _ in executor.map(lambda job: resolve(*job), jobs):
+            pass
+
+
+async def resolvePlanAsync(
+    logger: logging.Logger,
+    plugins,
+    plan: Plan,
+    concurrency: int = 100,
+    deadline: float | None = None,  # time.monotonic()
+) -> None:
+    """Same as resolvePlan, but with up to `concurrency` resolver calls in flight on one event loop."""
+
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def prefetch(
+        url_resolver: plugin_registry.IUrlResolver, urls: typing.List[str]
+    ) -> None:
+        async with semaphore:
+            if _isPast(deadline):
+                return
+            try:
+                await url_resolver.prefetchAsync(urls)
+            except Exception as e:
+                # Not fatal here. The URLs are resolved one by one then.
+                logger.warning(f"Error prefetching {len(urls)} URLs: {e}")
+
+    async def resolve(url_resolver: plugin_registry.IUrlResolver, url: str) -> None:
+        async with semaphore:
+            if _isPast(deadline):
+                return
+            try:
+                with run_report.getRunReport().measureResolve(url):
+                    if isVersionedUrl(url_resolver, urllib.parse.urlparse(url)):
+                        await url_resolver.diffAsync(url)
+                    elif url in plan.content_urls:
+                        await url_resolver.resolveToContentAsync(url)
+                    else:
+                        await url_resolver.resolveToFingerprintAsync(url)
+            except Exception as e:
+                # Not fatal here. processFile retries and reports the error.
+                logger.warning(f"Error resolving {url}: {e}")
+
+    jobs = _planJobs(logger, plugins, plan)
+    try:
+        await asyncio.gather(
+            *[prefetch(*group) for group in _prefetchGroups(plugins, plan)]
+        )
+        await asyncio.gather(*[resolve(*job) for job in jobs])
+    finally:
+        for url_resolver in plugin_registry.getUrlResolvers(plugins):
+            await url_resolver.closeAsync()
+
+
+def _isPast(deadline: float | None) -> bool:
+    return deadline is not None and time.monotonic() >= deadline
+
+
+def _prefetchGroups(
+    plugins, plan: Plan
+) -> typing.List[typing.Tuple[plugin_registry.IUrlResolver, typing.List[str]]]:
+    return [
+        (url_resolver, urls)
+        for (url_resolver, _), urls in plan.groupByResolverAndHost(plugins).items()
+        if url_resolver is not None
+    ]
+
+
+def _planJobs(
+    logger: logging.Logger, plugins, plan: Plan
+) -> typing.List[typing.Tuple[plugin_registry.IUrlResolver, str]]:
+    groups = plan.groupByResolverAndHost(plugins)
+    for (url_resolver, host), urls in groups.items():
+        logger.info(
+            f"  {type(url_resolver).__module__} {host}: {len(urls)} distinct URLs"
+        )
+
+    # Interleave hosts, so that a slow host does not occupy all workers at once.
+    queues = [
+        [(url_resolver, url) for url in urls]
+        for (url_resolver, _), urls in groups.items()
+        if url_resolver is not None
+    ]
+    return [
+        job for batch in itertools.zip_longest(*queues) for job in batch if job is not None
+    ]
+
+
+def estimateWorkload(plugins, plan: Plan) -> dict:
+    """Tell, without touching the network, what resolving the plan takes.
+
+    Count distinct URLs by scheme, by host and by the groups the UrlResolvers tell,
+    and the distinct calls of each kind, which the UrlResolvers' caches make once per run.
+    """
+    by_scheme: typing.Dict[str, int] = {}
+    by_host: typing.Dict[str, int] = {}
+    by_group: typing.Dict[str, typing.Dict[str, int]] = {}
+    calls: typing.Dict[str, typing.Set[typing.Hashable]] = {}
+    unresolvable = 0
+    for url in plan.urls:
+        url_parsed = urllib.parse.urlparse(url)
+        by_scheme[url_parsed.scheme] = by_scheme.get(url_parsed.scheme, 0) + 1
+        host = f"{url_parsed.scheme}://{url_parsed.netloc}"
+        by_host[host] = by_host.get(host, 0) + 1
+        url_resolver = plugin_registry.getUrlResolver(plugins, url_parsed.scheme)
+        if url_resolver is None:
+            unresolvable += 1
+            continue
+        workload = url_resolver.describeWorkload(url)
+        for group, key in workload.groups.items():
+            by_group.setdefault(group, {})
+            by_group[group][key] = by_group[group].get(key, 0) + 1
+        for kind, key in workload.calls:
+            calls.setdefault(kind, set()).add(key)
+    return {
+        "files": len(plan.files),
+        "urls": len(plan.urls),
+        "unresolvable_urls": unresolvable,
+        "urls_by_scheme": by_scheme,
+        "urls_by_host": by_host,
+        "urls_by_group": by_group,
+        "calls": {kind: len(keys) for kind, keys in calls.items()},
+    }
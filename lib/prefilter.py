@@ -0,0 +1,66 @@
+import typing
+import logging
+import fnmatch
+import mmap
+import os
+
+INSPECTOR_PROPERTY_MARKER = b"pwrt:inspector:"
+
+
+class PrefilterStats:
+    def __init__(self) -> None:
+        self.total: int = 0
+        self.excluded: int = 0  # By include/exclude globs
+        self.without_inspector_properties: int = 0
+        self.candidates: int = 0
+
+
+def hasInspectorProperties(file_name: str) -> bool:
+    """Tell by a raw byte search, without parsing XML, whether the file may have inspector properties."""
+    try:
+        with open(file_name, "rb") as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                return False  # mmap can not map an empty file
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as m:
+                return m.find(INSPECTOR_PROPERTY_MARKER) != -1
+    except OSError:
+        return True  # Let processFile report the error
+
+
+def isIncluded(
+    relative_path: str,
+    include: typing.List[str] | None = None,
+    exclude: typing.List[str] | None = None,
+) -> bool:
+    if include and not any(fnmatch.fnmatch(relative_path, p) for p in include):
+        return False
+    return not (exclude and any(fnmatch.fnmatch(relative_path, p) for p in exclude))
+
+
+def prefilterFiles(
+    logger: logging.Logger,
+    files,
+    base_dir: str,
+    include: typing.List[str] | None = None,
+    exclude: typing.List[str] | None = None,
+) -> typing.Tuple[typing.List, PrefilterStats]:
+    """Return the files which may have inspector properties, i.e. are worth parsing, and the skip counts.
+
+    Globs in include and exclude match file paths relative to base_dir, e.g. model/diagrams/*
+    """
+    stats = PrefilterStats()
+    candidates = []
+    for file_name in files:
+        stats.total += 1
+        relative_path = os.path.relpath(file_name, base_dir).replace(os.sep, "/")
+        if not isIncluded(relative_path, include, exclude):
+            stats.excluded += 1
+        elif not hasInspectorProperties(file_name):
+            stats.without_inspector_properties += 1
+        else:
+            candidates.append(file_name)
+    stats.candidates = len(candidates)
+    logger.info(
+        f"Prefiltered {stats.total} files: {stats.excluded} excluded, {stats.without_inspector_properties} without inspector properties, {stats.candidates} to process"
+    )
+    return candidates, stats
@@ -1,9 +1,9 @@
+from . import run_report
 import plugin_registry
 
 import typing
 import xml.etree.ElementTree as ET
 import xml.sax.saxutils
-import hashlib
 import re
 import io
 import urllib.parse
@@ -44,6 +44,14 @@ def writeXmlTreeInArchiFormat(
         file.write(f"</{tag}>\n")
 
 
+def isVersionedUrl(
+    url_resolver: plugin_registry.IUrlResolver, url: urllib.parse.ParseResult
+) -> bool:
+    return bool(
+        url_resolver.isVersioningSupported and re.match(r".+@[0-9a-fA-F]+", url.path)
+    )
+
+
 def upsertProperty(tree: ET.ElementTree, key, value):
     e = tree.find(f"./properties[@key='{key}']")
     if e is None:
@@ -53,9 +61,26 @@ def upsertProperty(tree: ET.ElementTree, key, value):
     e.set("value", value)
 
 
+def _resolve(method: typing.Callable[[str], typing.Any], url: str) -> typing.Any:
+    with run_report.getRunReport().measureResolve(url):
+        return method(url)
+
+
+def _searchValue(value_regexp_str: str, content: str) -> re.Match | None:
+    with plugin_registry.tracing.span("regex", "lib", regexp=value_regexp_str):
+        return re.search(value_regexp_str, content)
+
+
 def processFile(
     logger, plugins, file_name: str, out_file_name: str = None, log_indentation: int = 0
 ) -> bool:
+    with run_report.getRunReport().measureFile(file_name):
+        return _processFile(logger, plugins, file_name, out_file_name, log_indentation)
+
+
+def _processFile(
+    logger, plugins, file_name: str, out_file_name: str = None, log_indentation: int = 0
+) -> bool:
 
     logger.info(f'{" "*log_indentation}Processing file: {file_name}')
 
@@ -65,7 +90,8 @@ def processFile(
     changed_detected: bool = False
     requires_reviewing: bool = False
 
-    tree = ET.parse(file_name)
+    with run_report.getRunReport().measureParse():
+        tree = ET.parse(file_name)
     root = tree.getroot()
 
     if (
@@ -102,11 +128,11 @@ def processFile(
                 plugins, url.scheme
             )
 
-            if url_resolver.isVersioningSupported and re.match(
-                r".+@[0-9a-fA-F]+", url.path
-            ):
+            if isVersionedUrl(url_resolver, url):
                 new_deps_hashes.append("")
-                diff: plugin_registry.contract.IDiff = url_resolver.diff(deps_url)
+                diff: plugin_registry.contract.IDiff = _resolve(
+                    url_resolver.diff, deps_url
+                )
                 logger.debug(f'{" "*log_indentation}    Diff: {diff}')
                 if diff == False:
                     new_deps_arr.append(deps_url)
@@ -122,17 +148,18 @@ def processFile(
                     if deps_hashes_arr and i < len(deps_hashes_arr)
                     else "~none~"
                 )
-                content_obj: plugin_registry.contract.IContent = (
-                    url_resolver.resolveToContent(deps_url)
+                content_obj: plugin_registry.contract.IContent = _resolve(
+                    url_resolver.resolveToFingerprint, deps_url
                 )
                 if content_obj is None:
                     hash_calculated = "~none~"
                 else:
                     content = content_obj.content
-                    logger.debug(
-                        f'{" "*log_indentation}    Resolved content: {content}'
-                    )
-                    hash_calculated = hashlib.shake_128(content).hexdigest(4)
+                    if content is not None:
+                        logger.debug(
+                            f'{" "*log_indentation}    Resolved content: {content}'
+                        )
+                    hash_calculated = content_obj.fingerprint()
                     logger.debug(
                         f'{" "*log_indentation}    Hash of resolved content: {hash_calculated}. Hash known in pwrt:inspector:value-deps-hashes: {hash_known}{". Mismatch!" if hash_calculated != hash_known else ""}'
                     )
@@ -194,10 +221,10 @@ def processFile(
         else:
             value_known_str = "~none~"
 
-        if url_resolver.isVersioningSupported and re.match(
-            r".+@[0-9a-fA-F]+", url.path
-        ):
-            diff: plugin_registry.contract.IDiff = url_resolver.diff(value_ref_url)
+        if isVersionedUrl(url_resolver, url):
+            diff: plugin_registry.contract.IDiff = _resolve(
+                url_resolver.diff, value_ref_url
+            )
             logger.debug(f'{" "*log_indentation}    Diff: {diff}')
             value_new_str: str = "~none~"
             if diff != False:
@@ -209,24 +236,26 @@ def processFile(
                         r"\1",
                         diff.updated_url,
                     )
-                    current_lines_content = url_resolver.resolveToContent(
-                        url_without_sha1
+                    current_lines_content = _resolve(
+                        url_resolver.resolveToContent, url_without_sha1
                     ).content.decode("utf-8")
                 else:
                     current_lines_content = diff.current_lines_content
-                search_res = re.search(value_regexp_str, current_lines_content)
+                search_res = _searchValue(value_regexp_str, current_lines_content)
                 if search_res:
                     value_new_str = search_res.groups()[0]
             else:
                 if value_known is None:
-                    content_obj = url_resolver.resolveToContent(value_ref_url)
+                    content_obj = _resolve(
+                        url_resolver.resolveToContent, value_ref_url
+                    )
                     value_str = content_obj.content
                     if value_str:
                         changed_detected = True
                         logger.debug(
                             f'{" "*log_indentation}    Ref resolved to content: {value_str}'
                         )
-                        search_res = re.search(
+                        search_res = _searchValue(
                             value_regexp_str, value_str.decode("utf-8")
                         )
                         if search_res:
@@ -250,13 +279,13 @@ def processFile(
                 upsertProperty(root, "pwrt:inspector:value-new", value_new_str)
         else:
             value_new_str = "~none~"
-            content_obj = url_resolver.resolveToContent(value_ref_url)
+            content_obj = _resolve(url_resolver.resolveToContent, value_ref_url)
             value_str: str = content_obj.content if content_obj else None
             if value_str:
                 logger.debug(
                     f'{" "*log_indentation}    Ref resolved to content: {value_str}'
                 )
-                search_res = re.search(value_regexp_str, value_str.decode("utf-8"))
+                search_res = _searchValue(value_regexp_str, value_str.decode("utf-8"))
                 if search_res:
                     value_new_str = search_res.groups()[0]
                 if type(content_obj) == plugin_registry.contract.IVersionedContent:
@@ -292,9 +321,10 @@ def processFile(
             + ("" if child.get("key") is None else child.get("key")),
         )
 
-        f = open(out_file_name, "w")
-        writeXmlTreeInArchiFormat(tree.getroot(), f)
-        f.close()
+        with run_report.getRunReport().measureWrite():
+            f = open(out_file_name, "w")
+            writeXmlTreeInArchiFormat(tree.getroot(), f)
+            f.close()
         return True
     else:
         logger.info(f'{" "*log_indentation}  No changes detected')
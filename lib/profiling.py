@@ -0,0 +1,104 @@
+import typing
+import concurrent.futures
+import contextlib
+import cProfile
+import io
+import logging
+import pstats
+import threading
+import tracemalloc
+
+
+class MemoryPeaks:
+    """Peak traced memory per stage, while tracemalloc is tracing.
+
+    Stages must not overlap, so the peaks are accurate when files are processed one by one.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.peaks: typing.Dict[str, int] = {}  # Bytes
+
+    @contextlib.contextmanager
+    def measure(self, stage: str):
+        if not tracemalloc.is_tracing():
+            yield
+            return
+        tracemalloc.reset_peak()
+        try:
+            yield
+        finally:
+            _, peak = tracemalloc.get_traced_memory()
+            with self._lock:
+                self.peaks[stage] = max(self.peaks.get(stage, 0), peak)
+
+
+_memory_peaks = MemoryPeaks()
+_profiling = False  # Under profiled, with a profile file
+
+
+class InlineExecutor(concurrent.futures.Executor):
+    """Run each submitted call on the calling thread, when it is submitted."""
+
+    def submit(self, fn, /, *args, **kwargs) -> concurrent.futures.Future:
+        future: concurrent.futures.Future = concurrent.futures.Future()
+        try:
+            future.set_result(fn(*args, **kwargs))
+        except Exception as e:
+            future.set_exception(e)
+        return future
+
+
+def newExecutor(workers: int) -> concurrent.futures.Executor:
+    """A pool of workers. Under profiled with one worker, the calling thread, which cProfile profiles."""
+    if _profiling and workers == 1:
+        return InlineExecutor()
+    return concurrent.futures.ThreadPoolExecutor(max_workers=workers)
+
+
+def getMemoryPeaks() -> MemoryPeaks:
+    return _memory_peaks
+
+
+def measureMemory(stage: str):
+    return _memory_peaks.measure(stage)
+
+
+@contextlib.contextmanager
+def profiled(
+    logger: logging.Logger,
+    profile_file: str | None = None,
+    top: int = 20,
+    trace_memory: bool = False,
+):
+    """Run the body under cProfile, dump pstats to profile_file and log the top functions.
+
+    Before Python 3.12, cProfile profiles the calling thread only, so with one worker newExecutor runs the
+    processing of files on it. With trace_memory, also log peak allocations per stage measured with measureMemory.
+    """
+    global _memory_peaks, _profiling
+    profile = cProfile.Profile() if profile_file else None
+    if trace_memory:
+        _memory_peaks = MemoryPeaks()
+        tracemalloc.start()
+    if profile:
+        _profiling = True
+        profile.enable()
+    try:
+        yield
+    finally:
+        if profile:
+            profile.disable()
+            _profiling = False
+            profile.dump_stats(profile_file)
+            summary = io.StringIO()
+            pstats.Stats(profile, stream=summary).sort_stats(
+                pstats.SortKey.CUMULATIVE
+            ).print_stats(top)
+            logger.info(
+                f"Profile written to {profile_file}. Top {top} functions:\n{summary.getvalue()}"
+            )
+        if trace_memory:
+            tracemalloc.stop()
+            for stage, peak in _memory_peaks.peaks.items():
+                logger.info(f"Peak traced memory in {stage}: {peak / 1024:.0f} KiB")
@@ -0,0 +1,50 @@
+import typing
+import random
+import time
+
+
+class RetryQueue:
+    """Items parked for a retry, each one with its own exponential backoff and jitter."""
+
+    def __init__(
+        self,
+        initial_backoff: float = 60,  # seconds
+        max_backoff: float = 3600,  # seconds
+        max_retries: int = 6,
+        jitter: float = 0.25,
+    ) -> None:
+        self._initial_backoff = initial_backoff
+        self._max_backoff = max_backoff
+        self._max_retries = max_retries
+        self._jitter = jitter
+        self._retries: typing.Dict[typing.Hashable, int] = {}
+        self._due: typing.Dict[typing.Hashable, float] = {}
+
+    def __len__(self) -> int:
+        return len(self._due)
+
+    def park(self, item: typing.Hashable) -> float | None:
+        """Park the item. Return the delay before it is due, or None if the item ran out of retries."""
+        retries = self._retries.get(item, 0)
+        if retries >= self._max_retries:
+            return None
+        self._retries[item] = retries + 1
+        backoff = min(self._initial_backoff * 2**retries, self._max_backoff)
+        delay = backoff * random.uniform(1 - self._jitter, 1 + self._jitter)
+        self._due[item] = time.monotonic() + delay
+        return delay
+
+    def nextDueIn(self) -> float:
+        return max(0, min(self._due.values()) - time.monotonic())
+
+    def popDue(self) -> typing.List[typing.Hashable]:
+        now = time.monotonic()
+        items = [item for item, due in self._due.items() if due <= now]
+        for item in items:
+            del self._due[item]
+        return items
+
+    def popAll(self) -> typing.List[typing.Hashable]:
+        items = list(self._due)
+        self._due.clear()
+        return items
@@ -0,0 +1,179 @@
+from .profiling import measureMemory
+import plugin_registry
+
+import typing
+import contextlib
+import heapq
+import json
+import os
+import threading
+import time
+import urllib.parse
+
+
+class RunReport:
+    """Where the time of a run went. Thread-safe."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.stages: typing.Dict[str, float] = {}  # Seconds
+        self.parse_seconds: float = 0
+        self.write_seconds: float = 0
+        # scheme -> host -> {"calls": int, "seconds": float}
+        self.resolve: typing.Dict[str, typing.Dict[str, typing.Dict[str, float]]] = {}
+        self.file_seconds: typing.Dict[str, float] = {}
+        self.url_seconds: typing.Dict[str, float] = {}
+
+    @contextlib.contextmanager
+    def measureStage(self, stage: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            with self._lock:
+                self.stages[stage] = self.stages.get(stage, 0) + (
+                    time.perf_counter() - started
+                )
+
+    @contextlib.contextmanager
+    def measureParse(self):
+        started = time.perf_counter()
+        try:
+            with measureMemory("parse"):
+                yield
+        finally:
+            with self._lock:
+                self.parse_seconds += time.perf_counter() - started
+
+    @contextlib.contextmanager
+    def measureWrite(self):
+        started = time.perf_counter()
+        try:
+            with measureMemory("serialize"):
+                yield
+        finally:
+            with self._lock:
+                self.write_seconds += time.perf_counter() - started
+
+    @contextlib.contextmanager
+    def measureResolve(self, url: str):
+        started = time.perf_counter()
+        try:
+            with measureMemory("resolve"):
+                yield
+        finally:
+            seconds = time.perf_counter() - started
+            url_parsed = urllib.parse.urlparse(url)
+            with self._lock:
+                host = self.resolve.setdefault(url_parsed.scheme, {}).setdefault(
+                    url_parsed.netloc, {"calls": 0, "seconds": 0}
+                )
+                host["calls"] += 1
+                host["seconds"] += seconds
+                self.url_seconds[url] = self.url_seconds.get(url, 0) + seconds
+
+    @contextlib.contextmanager
+    def measureFile(self, file_name: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            with self._lock:
+                self.file_seconds[str(file_name)] = self.file_seconds.get(
+                    str(file_name), 0
+                ) + (time.perf_counter() - started)
+
+    def toDict(self, plugins, top: int = 10) -> dict:
+        def slowest(seconds: typing.Dict[str, float], key_name: str):
+            return [
+                {key_name: key, "seconds": value}
+                for key, value in heapq.nlargest(
+                    top, seconds.items(), key=lambda item: item[1]
+                )
+            ]
+
+        with self._lock:
+            return {
+                "stages": dict(self.stages),
+                "parse_seconds": self.parse_seconds,
+                "write_seconds": self.write_seconds,
+                "resolve": {
+                    scheme: {host: dict(stats) for host, stats in hosts.items()}
+                    for scheme, hosts in self.resolve.items()
+                },
+                "url_resolvers": {
+                    type(url_resolver).__module__: url_resolver.cacheStats()
+                    for url_resolver in plugin_registry.getUrlResolvers(plugins)
+                },
+                "slowest_files": slowest(self.file_seconds, "file"),
+                "slowest_urls": slowest(self.url_seconds, "url"),
+            }
+
+
+_run_report = RunReport()
+
+
+def getRunReport() -> RunReport:
+    return _run_report
+
+
+def startRunReport() -> RunReport:
+    """Start collecting a new report, e.g. for the next cycle of a daemon."""
+    global _run_report
+    _run_report = RunReport()
+    return _run_report
+
+
+def writeRunReport(report_dict: dict, file_name: str) -> None:
+    with open(file_name, "w") as f:
+        json.dump(report_dict, f, indent=2)
+
+
+def _prometheusLabels(**labels) -> str:
+    def escape(value: str) -> str:
+        return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+    return (
+        "{" + ",".join(f'{name}="{escape(str(v))}"' for name, v in labels.items()) + "}"
+    )
+
+
+def writePrometheusTextfile(report_dict: dict, file_name: str) -> None:
+    """Write the report in the format of the node exporter's textfile collector."""
+    resolve_hosts = [
+        (_prometheusLabels(scheme=scheme, host=host), stats)
+        for scheme, hosts in report_dict["resolve"].items()
+        for host, stats in hosts.items()
+    ]
+    metrics: typing.Dict[str, typing.List[typing.Tuple[str, float]]] = {
+        "pwrt_inspector_stage_seconds": [
+            (_prometheusLabels(stage=stage), seconds)
+            for stage, seconds in report_dict["stages"].items()
+        ],
+        "pwrt_inspector_parse_seconds": [("", report_dict["parse_seconds"])],
+        "pwrt_inspector_write_seconds": [("", report_dict["write_seconds"])],
+        "pwrt_inspector_resolve_seconds": [
+            (labels, stats["seconds"]) for labels, stats in resolve_hosts
+        ],
+        "pwrt_inspector_resolve_calls": [
+            (labels, stats["calls"]) for labels, stats in resolve_hosts
+        ],
+    }
+    for stat in [
+        "cache_hits",
+        "cache_misses",
+        "persistent_cache_hits",
+        "bytes_fetched",
+    ]:
+        metrics[f"pwrt_inspector_{stat}"] = [
+            (_prometheusLabels(url_resolver=url_resolver), stats[stat])
+            for url_resolver, stats in report_dict["url_resolvers"].items()
+        ]
+
+    # Written aside and renamed, so that the collector never reads a partial file
+    with open(file_name + ".tmp", "w") as f:
+        for metric, samples in metrics.items():
+            f.write(f"# TYPE {metric} gauge\n")
+            for labels, value in samples:
+                f.write(f"{metric}{labels} {value}\n")
+    os.replace(file_name + ".tmp", file_name)
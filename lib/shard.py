@@ -0,0 +1,135 @@
+from .plan import Plan
+
+import typing
+import logging
+import hashlib
+import json
+import os
+import shutil
+import urllib.parse
+
+
+def parseShard(shard: str) -> typing.Tuple[int, int]:
+    """Parse i/N, where i is 0..N-1, into (i, N)."""
+    index, count = (int(part) for part in shard.split("/"))
+    if not 0 <= index < count:
+        raise ValueError(f"Shard index must be 0..{count - 1}: {shard}")
+    return index, count
+
+
+def shardOf(key: str, count: int) -> int:
+    # Not hash(), which is salted per process
+    return int.from_bytes(hashlib.sha1(key.encode()).digest()[:8], "big") % count
+
+
+def shardPlan(
+    plan: Plan, base_dir: str, index: int, count: int
+) -> typing.Tuple[typing.List, Plan]:
+    """Return the files of the plan, and their plan, which belong to the shard.
+
+    Files which share a dependency URL go to the same shard, so that no URL is resolved by two shards.
+    URLs are compared without the fragment, which UrlResolvers share their results across.
+    """
+    # Union-find of files, joined through the URLs they share
+    parents: typing.Dict[str, str] = {}
+
+    def find(node: str) -> str:
+        while parents[node] != node:
+            parents[node] = parents[parents[node]]
+            node = parents[node]
+        return node
+
+    for file_name, urls in plan.files.items():
+        file_node = "file:" + str(file_name)
+        parents.setdefault(file_node, file_node)
+        for url in urls:
+            url_node = "url:" + urllib.parse.urldefrag(url).url
+            parents.setdefault(url_node, url_node)
+            parents[find(url_node)] = find(file_node)
+
+    # Components are keyed by their first file, relative to base_dir, so that the key is the same on every node
+    component_keys: typing.Dict[str, str] = {}
+    for file_name in sorted(plan.files, key=str):
+        component_keys.setdefault(
+            find("file:" + str(file_name)),
+            os.path.relpath(file_name, base_dir).replace(os.sep, "/"),
+        )
+
+    shard_plan = Plan()
+    for file_name, urls in plan.files.items():
+        if shardOf(component_keys[find("file:" + str(file_name))], count) == index:
+            shard_plan.add(
+                file_name, urls, [url for url in urls if url in plan.content_urls]
+            )
+    return list(shard_plan.files), shard_plan
+
+
+def _shardOutputDir(output_dir: str, index: int, count: int) -> str:
+    return os.path.join(output_dir, f"shard-{index}-of-{count}")
+
+
+def writeShardOutput(
+    logger: logging.Logger,
+    output_dir: str,
+    index: int,
+    count: int,
+    base_dir: str,
+    changed_paths: typing.List[str],
+    error_count: int,
+    head_sha: str,
+) -> None:
+    """Copy the changed files, paths relative to base_dir, to the shard's output for mergeShardOutputs.
+
+    head_sha is the commit of base_dir which the files were inspected at.
+    """
+    shard_dir = _shardOutputDir(output_dir, index, count)
+    # Removed first, so that the output of an earlier run does not pass for complete if this one fails
+    if os.path.exists(shard_dir + ".done"):
+        os.remove(shard_dir + ".done")
+    if os.path.exists(shard_dir):
+        shutil.rmtree(shard_dir)
+    for path in changed_paths:
+        os.makedirs(os.path.dirname(os.path.join(shard_dir, path)), exist_ok=True)
+        shutil.copyfile(os.path.join(base_dir, path), os.path.join(shard_dir, path))
+    # Written last, it tells that the shard's output is complete
+    with open(shard_dir + ".done", "w") as f:
+        json.dump({"files": changed_paths, "errors": error_count, "head": head_sha}, f)
+    logger.info(f"Shard {index}/{count} output {len(changed_paths)} changed files")
+
+
+def mergeShardOutputs(
+    logger: logging.Logger, output_dir: str, count: int, base_dir: str, head_sha: str
+) -> typing.List[str]:
+    """Copy the changed files of all the shards into base_dir. Return their paths relative to base_dir.
+
+    The shards must have inspected base_dir at commit head_sha. Their outputs are removed once merged.
+    """
+    outputs = []
+    for index in range(count):
+        shard_dir = _shardOutputDir(output_dir, index, count)
+        if not os.path.exists(shard_dir + ".done"):
+            raise Exception(f"Output of shard {index}/{count} is not complete")
+        with open(shard_dir + ".done") as f:
+            output = json.load(f)
+        if output.get("head") != head_sha:
+            raise Exception(
+                f"Output of shard {index}/{count} is of commit {output.get('head')}, the clone is at {head_sha}"
+            )
+        outputs.append((index, shard_dir, output))
+
+    changed_paths = []
+    for index, shard_dir, output in outputs:
+        if output["errors"]:
+            logger.warning(
+                f"Shard {index}/{count} failed to process {output['errors']} files"
+            )
+        for path in output["files"]:
+            shutil.copyfile(os.path.join(shard_dir, path), os.path.join(base_dir, path))
+            changed_paths.append(path)
+        logger.info(f"Merged {len(output['files'])} changed files of shard {index}/{count}")
+
+    for index, shard_dir, _ in outputs:
+        os.remove(shard_dir + ".done")
+        if os.path.exists(shard_dir):
+            shutil.rmtree(shard_dir)
+    return changed_paths
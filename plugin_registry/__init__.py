@@ -1,2 +1,11 @@
+from . import tracing
 from .contract import IPlugin, IUrlResolver, IPluginRegistry
-from .registry import Registry, getUrlResolver
+from .persistent_cache import PersistentCache
+from .registry import (
+    Registry,
+    LazyPlugin,
+    Plugins,
+    getUrlResolver,
+    getUrlResolvers,
+    configureUrlResolvers,
+)
@@ -1,5 +1,14 @@
+from . import tracing
+
+import asyncio
+import functools
+import hashlib
+import inspect
 import logging
+import threading
+import time
 import typing
+import urllib.parse
 
 
 class IPluginRegistry(type):
@@ -32,9 +41,28 @@ class IDiffContentChanged(IDiffLinesMoved):
         self.was_lines_content = was_lines_content
 
 
+FINGERPRINT_BYTES = 4
+
+
+def fingerprintHash():
+    """The hash of IContent.fingerprint, to update chunk by chunk as content arrives."""
+    return hashlib.shake_128()
+
+
 class IContent:
-    def __init__(self, content: str):
+    def __init__(self, content: str | None, fingerprint: str | None = None):
+        # content is None when it was only hashed, see IUrlResolver.resolveToFingerprint
         self.content = content
+        self._fingerprint = fingerprint
+
+    def fingerprint(self) -> str:
+        """4-byte shake_128 of the content, computed once per content object, e.g. for all files sharing a dependency."""
+        # getattr, as objects from the persistent cache may predate the attribute
+        if getattr(self, "_fingerprint", None) is None:
+            content_hash = fingerprintHash()
+            content_hash.update(self.content)
+            self._fingerprint = content_hash.hexdigest(FINGERPRINT_BYTES)
+        return self._fingerprint
 
 
 class IVersionedContent(IContent):
@@ -43,22 +71,322 @@ class IVersionedContent(IContent):
         self.last_commit_id = last_commit_id
 
 
+def _tracedResolverMethod(method: typing.Callable) -> typing.Callable:
+    def spanOf(self, url: str):
+        return tracing.span(
+            f"{method.__name__} {urllib.parse.urlparse(url).netloc}",
+            type(self).__module__,
+            url=url,
+        )
+
+    if inspect.iscoroutinefunction(method):
+
+        @functools.wraps(method)
+        async def asyncWrapper(self, url: str, *args, **kwargs):
+            if not tracing.isTracing():
+                return await method(self, url, *args, **kwargs)
+            with spanOf(self, url):
+                return await method(self, url, *args, **kwargs)
+
+        return asyncWrapper
+
+    @functools.wraps(method)
+    def wrapper(self, url: str, *args, **kwargs):
+        if not tracing.isTracing():
+            return method(self, url, *args, **kwargs)
+        with spanOf(self, url):
+            return method(self, url, *args, **kwargs)
+
+    return wrapper
+
+
+class IWorkload:
+    """What resolving a URL takes, told offline.
+
+    groups: e.g. {"AWS service and region": "secretsmanager@eu-west-1"}, for reporting.
+    calls: (kind, key) of API calls, git fetches etc. Calls with equal keys are made once per run.
+    """
+
+    def __init__(
+        self,
+        groups: typing.Dict[str, str],
+        calls: typing.List[typing.Tuple[str, typing.Hashable]],
+    ):
+        self.groups = groups
+        self.calls = calls
+
+
 class IUrlResolver:
     isVersioningSupported: bool = False
 
+    def __init_subclass__(cls, **kwargs) -> None:
+        # Every diff and resolve of plugins is a span when tracing. The async ones of the base class
+        # run the sync ones, which are spans already.
+        super().__init_subclass__(**kwargs)
+        for method_name in [
+            "diff",
+            "resolveToContent",
+            "resolveToFingerprint",
+            "diffAsync",
+            "resolveToContentAsync",
+            "resolveToFingerprintAsync",
+        ]:
+            if method_name in cls.__dict__:
+                setattr(
+                    cls, method_name, _tracedResolverMethod(cls.__dict__[method_name])
+                )
+
     def diff(self, url: str) -> IDiff | bool | None:
         pass  # pragma: no cover
 
     def resolveToContent(self, url: str) -> IContent | None:
         pass  # pragma: no cover
 
+    def resolveToFingerprint(self, url: str) -> IContent | None:
+        """Resolve the URL for the fingerprint of its content only, e.g. for value-deps.
+
+        Plugins which hash content as it arrives return an IContent without content, never holding it whole.
+        """
+        return self.resolveToContent(url)
+
+    def prefetch(self, urls: typing.List[str]) -> None:
+        """Fill the caches for URLs of one host ahead of resolving them, e.g. with batch API calls.
+
+        URLs it leaves out of the caches are resolved one by one. By default it does nothing.
+        """
+        pass
+
+    def describeWorkload(self, url: str) -> IWorkload:
+        # Must not touch the network. Plugins override this to tell their groups and distinct calls.
+        return IWorkload(groups={}, calls=[("requests", url)])
+
+    # Plugins may override the async counterparts with native implementations.
+    # By default they run the blocking methods in the event loop's executor.
+    async def diffAsync(self, url: str) -> IDiff | bool | None:
+        return await asyncio.get_running_loop().run_in_executor(None, self.diff, url)
+
+    async def resolveToContentAsync(self, url: str) -> IContent | None:
+        return await asyncio.get_running_loop().run_in_executor(
+            None, self.resolveToContent, url
+        )
+
+    async def resolveToFingerprintAsync(self, url: str) -> IContent | None:
+        return await asyncio.get_running_loop().run_in_executor(
+            None, self.resolveToFingerprint, url
+        )
+
+    async def prefetchAsync(self, urls: typing.List[str]) -> None:
+        await asyncio.get_running_loop().run_in_executor(None, self.prefetch, urls)
+
+    async def closeAsync(self) -> None:
+        # Plugins with native async implementations close the clients of the event loop here
+        pass
+
     def __init__(self, logger: logging.Logger) -> None:
         self._logger = logger
+        self._locks_guard = threading.Lock()
+        self._locks: typing.Dict[typing.Hashable, threading.Lock] = {}
+        self._async_locks_loop: asyncio.AbstractEventLoop | None = None
+        self._async_locks: typing.Dict[typing.Hashable, asyncio.Lock] = {}
+        self._cache_ttl: float | None = None  # Seconds. None is forever
+        # Seconds. None is the library's default
+        self._call_timeout: float | None = None
+        # The L2 behind the in-memory caches: a PersistentCache, or an object with the same get and put
+        self._persistent_cache = None
+        # Seconds, of the persisted entries which may go stale
+        self._persistent_cache_ttl: float | None = None
+        # id(cache) -> (cache, {key: time the entry was cached}). Holds the cache, so that its id is not reused.
+        self._cached_at: typing.Dict[
+            int, typing.Tuple[dict, typing.Dict[typing.Hashable, float]]
+        ] = {}
+        self._cache_hits = 0
+        self._cache_misses = 0
+        self._persistent_cache_hits = 0  # Of the cache hits
+        self._bytes_fetched = 0
+
+    def cacheStats(self) -> typing.Dict[str, int]:
+        return {
+            "cache_hits": self._cache_hits,
+            "cache_misses": self._cache_misses,
+            "persistent_cache_hits": self._persistent_cache_hits,
+            "bytes_fetched": self._bytes_fetched,
+        }
+
+    def resetCacheStats(self) -> None:
+        """Start counting anew, e.g. for the next cycle of a daemon, which keeps the caches."""
+        with self._locks_guard:
+            self._cache_hits = 0
+            self._cache_misses = 0
+            self._persistent_cache_hits = 0
+            self._bytes_fetched = 0
+
+    def setPersistentCache(self, persistent_cache, ttl: float | None) -> None:
+        """Keep results across runs. Entries which may go stale expire after ttl seconds, None is never."""
+        self._persistent_cache = persistent_cache
+        self._persistent_cache_ttl = ttl
+
+    def setCacheTtl(self, ttl: float | None) -> None:
+        self._cache_ttl = ttl
+
+    def setCallTimeout(self, timeout: float | None) -> None:
+        """Bound every network call of the plugin: HTTP requests, API calls, git fetches.
+
+        Set it before resolving, as plugins pass it to the API clients they create and keep.
+        """
+        self._call_timeout = timeout
+
+    def _callTimeoutKwargs(self, name: str) -> typing.Dict[str, float]:
+        # The timeout as the keyword argument `name` of a library call, unless it is not set
+        return {} if self._call_timeout is None else {name: self._call_timeout}
+
+    def evictExpired(self) -> int:
+        """Remove the cache entries older than the cache TTL. Return how many were removed.
+
+        Entries are not checked for expiry when looked up, so that they are shared through a whole run.
+        Call it between runs, when no lookups are in flight: the locks of the entries are removed too,
+        so that they do not pile up in a long-running process.
+        """
+        evicted = 0
+        for cache_id, (cache, cached_at) in self._cached_at.items():
+            for key in [key for key in cached_at if self._isExpired(cached_at[key])]:
+                cache.pop(key, None)
+                del cached_at[key]
+                with self._locks_guard:
+                    self._locks.pop((cache_id, key), None)
+                evicted += 1
+        return evicted
+
+    def _lockFor(self, key: typing.Hashable) -> threading.Lock:
+        # One lock per key: concurrent lookups of the same key wait for the first one to fill the cache,
+        # lookups of different keys proceed in parallel.
+        with self._locks_guard:
+            lock = self._locks.get(key)
+            if lock is None:
+                lock = self._locks[key] = threading.Lock()
+            return lock
+
+    def _countFetched(self, content: bytes | None) -> None:
+        if content is not None:
+            with self._locks_guard:
+                self._bytes_fetched += len(content)
+
+    def _isExpired(self, cached_at: float) -> bool:
+        return (
+            self._cache_ttl is not None
+            and time.monotonic() - cached_at >= self._cache_ttl
+        )
+
+    def _putCache(
+        self, cache: dict, key: typing.Hashable, value: typing.Any, expires: bool = True
+    ) -> None:
+        cache[key] = value
+        if expires:
+            _, cached_at = self._cached_at.setdefault(id(cache), (cache, {}))
+            cached_at[key] = time.monotonic()
+
+    def _persistentNamespace(self, persist: str) -> str:
+        return f"{type(self).__module__}:{persist}"
+
+    def _getOrCompute(
+        self,
+        cache: dict,
+        key: typing.Hashable,
+        compute: typing.Callable[[], typing.Any],
+        expires: bool = True,  # False for what does not go stale, e.g. API clients
+        # Name of the cache in the persistent cache, if it is kept across runs
+        persist: str | None = None,
+        immutable: bool = False,  # The persisted entry never goes stale, e.g. content at a commit SHA
+        count: bool = True,  # False for pools, e.g. API clients, which are no results to report hits of
+    ) -> typing.Any:
+        with self._lockFor((id(cache), key)):
+            hit = key in cache
+            persistent_hit = False
+            if not hit:
+                persistent_hit, value = self._getPersistent(persist, key)
+                if not persistent_hit:
+                    value = compute()
+                    self._putPersistent(persist, key, value, immutable)
+                self._putCache(cache, key, value, expires)
+            if count:
+                self._countLookup(hit, persistent_hit)
+            return cache[key]
+
+    async def _getOrComputeAsync(
+        self,
+        cache: dict,
+        key: typing.Hashable,
+        compute: typing.Callable[[], typing.Awaitable[typing.Any]],
+        expires: bool = True,
+        persist: str | None = None,
+        immutable: bool = False,
+        count: bool = True,
+    ) -> typing.Any:
+        """Same as _getOrCompute, for a coroutine function compute, on the running event loop."""
+        async with self._asyncLockFor((id(cache), key)):
+            hit = key in cache
+            persistent_hit = False
+            if not hit:
+                persistent_hit, value = self._getPersistent(persist, key)
+                if not persistent_hit:
+                    value = await compute()
+                    self._putPersistent(persist, key, value, immutable)
+                self._putCache(cache, key, value, expires)
+            if count:
+                self._countLookup(hit, persistent_hit)
+            return cache[key]
+
+    def _asyncLockFor(self, key: typing.Hashable) -> asyncio.Lock:
+        # Locks are bound to the event loop they are used in, and every asyncio.run has its own
+        loop = asyncio.get_running_loop()
+        if self._async_locks_loop is not loop:
+            self._async_locks_loop = loop
+            self._async_locks = {}
+        return self._async_locks.setdefault(key, asyncio.Lock())
+
+    def _getPersistent(
+        self, persist: str | None, key: typing.Hashable
+    ) -> typing.Tuple[bool, typing.Any]:
+        if not persist or self._persistent_cache is None:
+            return False, None
+        return self._persistent_cache.get(self._persistentNamespace(persist), str(key))
+
+    def _putPersistent(
+        self,
+        persist: str | None,
+        key: typing.Hashable,
+        value: typing.Any,
+        immutable: bool,
+    ) -> None:
+        if not persist or self._persistent_cache is None:
+            return
+        if value is not None:  # Errors are not kept across runs
+            self._persistent_cache.put(
+                self._persistentNamespace(persist),
+                str(key),
+                value,
+                None if immutable else self._persistent_cache_ttl,
+            )
+
+    def _countLookup(self, hit: bool, persistent_hit: bool) -> None:
+        with self._locks_guard:
+            if hit or persistent_hit:
+                self._cache_hits += 1
+            else:
+                self._cache_misses += 1
+            if persistent_hit:
+                self._persistent_cache_hits += 1
 
 
 class IPlugin(object, metaclass=IPluginRegistry):
+    # Plugins without a manifest may declare their schemes here, for the scheme map of Plugins
+    schemes: typing.List[str] = []
+
     def __init__(self, logger: logging.Logger) -> None:
         self._logger = logger
 
     def getUrlResolver(self, scheme: str) -> IUrlResolver:
         pass  # pragma: no cover
+
+    def getUrlResolvers(self) -> typing.List[IUrlResolver]:
+        # Plugins which have other than one _url_resolver override this
+        return [self._url_resolver]
@@ -0,0 +1,116 @@
+import typing
+import os
+import pickle
+import sqlite3
+import threading
+import time
+import zlib
+
+
+class PersistentCache:
+    """Results of UrlResolvers kept across runs, in SQLite, pickled and compressed. Thread-safe.
+
+    Entries are keyed by namespace, e.g. "plugins.https.handler:content", and key.
+    An entry with no expiry, e.g. content at a commit SHA, is kept until purged.
+    Values are stored as is, secrets included, so the file is created readable by the owner only.
+    """
+
+    def __init__(self, db_file_name: str) -> None:
+        os.close(os.open(db_file_name, os.O_CREAT | os.O_RDWR, 0o600))
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(db_file_name, check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS entries (namespace TEXT, key TEXT, value BLOB, stored_at REAL, expires_at REAL, PRIMARY KEY (namespace, key))"
+        )
+
+    def get(self, namespace: str, key: str) -> typing.Tuple[bool, typing.Any]:
+        """Return (True, value) for an entry which has not expired, otherwise (False, None)."""
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT value, expires_at FROM entries WHERE namespace = ? AND key = ?",
+                (namespace, key),
+            ).fetchone()
+        if row is None or (row[1] is not None and row[1] <= time.time()):
+            return False, None
+        return True, pickle.loads(zlib.decompress(row[0]))
+
+    def put(
+        self, namespace: str, key: str, value: typing.Any, ttl: float | None
+    ) -> None:
+        """Store the value for ttl seconds, or until purged if ttl is None."""
+        now = time.time()
+        blob = zlib.compress(pickle.dumps(value))
+        with self._lock:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?)",
+                (namespace, key, blob, now, None if ttl is None else now + ttl),
+            )
+            self._connection.commit()
+
+    def stats(self) -> typing.List[dict]:
+        """Entries, expired entries and compressed bytes per namespace."""
+        with self._lock:
+            rows = self._connection.execute(
+                "SELECT namespace, COUNT(*), SUM(expires_at IS NOT NULL AND expires_at <= ?), SUM(LENGTH(value)) FROM entries GROUP BY namespace ORDER BY namespace",
+                (time.time(),),
+            ).fetchall()
+        return [
+            {"namespace": row[0], "entries": row[1], "expired": row[2], "bytes": row[3]}
+            for row in rows
+        ]
+
+    def entries(
+        self, namespace: str | None = None, key_prefix: str | None = None
+    ) -> typing.List[dict]:
+        where, params = self._where(namespace, key_prefix, expired_only=False)
+        with self._lock:
+            rows = self._connection.execute(
+                f"SELECT namespace, key, LENGTH(value), stored_at, expires_at FROM entries{where} ORDER BY namespace, key",
+                params,
+            ).fetchall()
+        return [
+            {
+                "namespace": row[0],
+                "key": row[1],
+                "bytes": row[2],
+                "stored_at": row[3],
+                "expires_at": row[4],
+            }
+            for row in rows
+        ]
+
+    def purge(
+        self,
+        namespace: str | None = None,
+        key_prefix: str | None = None,
+        expired_only: bool = False,
+    ) -> int:
+        """Delete the matching entries. Return how many were deleted."""
+        where, params = self._where(namespace, key_prefix, expired_only)
+        with self._lock:
+            count = self._connection.execute(
+                f"DELETE FROM entries{where}", params
+            ).rowcount
+            self._connection.commit()
+        return count
+
+    def close(self) -> None:
+        with self._lock:
+            self._connection.close()
+
+    def _where(
+        self, namespace: str | None, key_prefix: str | None, expired_only: bool
+    ) -> typing.Tuple[str, list]:
+        conditions, params = [], []
+        if namespace is not None:
+            conditions.append("namespace = ?")
+            params.append(namespace)
+        if key_prefix is not None:
+            conditions.append("substr(key, 1, ?) = ?")
+            params += [len(key_prefix), key_prefix]
+        if expired_only:
+            conditions.append("expires_at IS NOT NULL AND expires_at <= ?")
+            params.append(time.time())
+        return (" WHERE " + " AND ".join(conditions) if conditions else ""), params
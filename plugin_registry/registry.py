@@ -3,6 +3,106 @@ import typing
 import importlib
 import plugin_registry
 import pkgutil
+import json
+import os
+import threading
+
+MANIFEST_FILE_NAME = "manifest.json"
+
+
+class LazyPlugin:
+    """Stands for a plugin, of which only the manifest is read until a URL of its schemes is resolved.
+
+    The manifest, manifest.json in the plugin's package, tells the plugin's class and schemes:
+    {"class": "Https", "schemes": ["https"]}
+    The plugin's package, and so its dependencies, are imported when getUrlResolver is first called for one of the schemes.
+    """
+
+    def __init__(
+        self, package: str, manifest: dict, logger: logging.Logger
+    ) -> None:
+        self.package = package
+        self.schemes: typing.List[str] = manifest["schemes"]
+        self._class_name: str = manifest["class"]
+        self._logger = logger
+        self._lock = threading.Lock()
+        self._plugin: plugin_registry.IPlugin | None = None
+        self._configure: typing.List[
+            typing.Callable[[plugin_registry.IUrlResolver], None]
+        ] = []
+
+    def isLoaded(self) -> bool:
+        return self._plugin is not None
+
+    def getUrlResolver(self, scheme: str) -> plugin_registry.IUrlResolver:
+        if scheme not in self.schemes:
+            return None
+        return self._load().getUrlResolver(scheme)
+
+    def getUrlResolvers(self) -> typing.List[plugin_registry.IUrlResolver]:
+        # Only of a loaded plugin. The others have not resolved anything.
+        return self._plugin.getUrlResolvers() if self._plugin else []
+
+    def configureUrlResolvers(
+        self, configure: typing.Callable[[plugin_registry.IUrlResolver], None]
+    ) -> None:
+        with self._lock:
+            if self._plugin is None:
+                self._configure.append(configure)
+                return
+        for url_resolver in self._plugin.getUrlResolvers():
+            configure(url_resolver)
+
+    def _load(self) -> plugin_registry.IPlugin:
+        with self._lock:
+            if self._plugin is None:
+                self._logger.debug(f"Loading plugin {self.package}")
+                plugin_class = getattr(
+                    importlib.import_module(self.package), self._class_name
+                )
+                plugin = plugin_class(self._logger)
+                for configure in self._configure:
+                    for url_resolver in plugin.getUrlResolvers():
+                        configure(url_resolver)
+                self._plugin = plugin
+            return self._plugin
+
+
+class Plugins(list):
+    """The plugin instances, with a map of URL schemes to the plugins which resolve them.
+
+    The map is built once, so that getUrlResolver does not ask every plugin for every URL.
+    Plugins which do not declare their schemes are asked in turn, for the schemes not in the map.
+    """
+
+    def __init__(
+        self, plugins: typing.List[plugin_registry.IPlugin | LazyPlugin]
+    ) -> None:
+        super().__init__(plugins)
+        self.schemes: typing.Dict[str, plugin_registry.IPlugin | LazyPlugin] = {}
+        self._undeclared: typing.List[plugin_registry.IPlugin] = []
+        for p in plugins:
+            if not p.schemes:
+                self._undeclared.append(p)
+            for scheme in p.schemes:
+                if scheme in self.schemes:
+                    raise Exception(
+                        f"Scheme {scheme} is claimed by both plugin {_pluginName(self.schemes[scheme])} and {_pluginName(p)}"
+                    )
+                self.schemes[scheme] = p
+
+    def getUrlResolver(self, scheme: str) -> plugin_registry.IUrlResolver:
+        p = self.schemes.get(scheme)
+        if p is not None:
+            return p.getUrlResolver(scheme)
+        for p in self._undeclared:
+            urlResolver: plugin_registry.IUrlResolver = p.getUrlResolver(scheme)
+            if urlResolver:
+                return urlResolver
+
+
+def _pluginName(p: plugin_registry.IPlugin | LazyPlugin) -> str:
+    return p.package if isinstance(p, LazyPlugin) else type(p).__module__
 
 
 class Registry:
@@ -22,6 +122,40 @@ class Registry:
 
         return plugin_registry.IPluginRegistry.plugins
 
+    def loadPluginsLazily(self) -> Plugins:
+        """Return plugin instances, LazyPlugin for the plugins which have a manifest.
+
+        Plugins without a manifest are imported and instantiated right away.
+        Raise if two plugins claim the same scheme.
+        """
+        self._logger.debug(
+            f"Searching for plugins under package {self._plugin_directory}"
+        )
+
+        plugins = []
+        for _, plugin_name, ispkg in pkgutil.iter_modules(
+            path=[self._plugin_directory]
+        ):
+            package = self._plugin_directory + "." + plugin_name
+            manifest_file_name = os.path.join(
+                self._plugin_directory, plugin_name, MANIFEST_FILE_NAME
+            )
+            try:
+                with open(manifest_file_name) as f:
+                    manifest = json.load(f)
+            except FileNotFoundError:
+                manifest = None
+            if manifest is not None:
+                plugins.append(LazyPlugin(package, manifest, self._logger))
+            else:
+                loaded = len(plugin_registry.IPluginRegistry.plugins)
+                importlib.import_module(package)
+                plugins += [
+                    P(self._logger)
+                    for P in plugin_registry.IPluginRegistry.plugins[loaded:]
+                ]
+        return Plugins(plugins)
+
     def setupPlugins(self) -> None: # pragma: no cover
         self._logger.debug(
             f"Searching for plugins under package {self._plugin_directory}"
@@ -38,7 +172,28 @@ class Registry:
 def getUrlResolver(
     plugins: typing.List[plugin_registry.IPlugin], scheme: str
 ) -> plugin_registry.IUrlResolver:
+    if isinstance(plugins, Plugins):
+        return plugins.getUrlResolver(scheme)
     for p in plugins:
         urlResolver: plugin_registry.IUrlResolver = p.getUrlResolver(scheme)
         if urlResolver:
             return urlResolver
+
+
+def getUrlResolvers(
+    plugins: typing.List[plugin_registry.IPlugin],
+) -> typing.List[plugin_registry.IUrlResolver]:
+    return [r for p in plugins for r in p.getUrlResolvers()]
+
+
+def configureUrlResolvers(
+    plugins: typing.List[plugin_registry.IPlugin],
+    configure: typing.Callable[[plugin_registry.IUrlResolver], None],
+) -> None:
+    """Call configure for the UrlResolvers of the plugins, of a LazyPlugin when it is loaded."""
+    for p in plugins:
+        if isinstance(p, LazyPlugin):
+            p.configureUrlResolvers(configure)
+        else:
+            for url_resolver in p.getUrlResolvers():
+                configure(url_resolver)
@@ -0,0 +1,76 @@
+import asyncio
+import contextlib
+import itertools
+import json
+import os
+import threading
+import time
+import typing
+import weakref
+
+# Trace events, in Chrome trace-event format. None while not tracing.
+_events: typing.List[dict] | None = None
+_lock = threading.Lock()
+# Coroutines of an event loop interleave on its thread, so the spans of each task are on a track of its own
+_task_tids: "weakref.WeakKeyDictionary[asyncio.Task, int]" = weakref.WeakKeyDictionary()
+_next_task_tid = itertools.count(1)
+
+
+def isTracing() -> bool:
+    return _events is not None
+
+
+@contextlib.contextmanager
+def span(name: str, category: str, **args):
+    """Record the body as a span of the trace, when tracing."""
+    if _events is None:
+        yield
+        return
+    started = time.perf_counter_ns()
+    try:
+        yield
+    finally:
+        event = {
+            "name": name,
+            "cat": category,
+            "ph": "X",  # Complete event
+            "ts": started / 1000,  # Microseconds
+            "dur": (time.perf_counter_ns() - started) / 1000,
+            "pid": os.getpid(),
+            "tid": _tid(),
+            "args": args,
+        }
+        with _lock:
+            if _events is not None:
+                _events.append(event)
+
+
+def _tid() -> int:
+    try:
+        task = asyncio.current_task()
+    except RuntimeError:  # No running event loop
+        task = None
+    if task is None:
+        return threading.get_ident()
+    with _lock:
+        tid = _task_tids.get(task)
+        if tid is None:
+            tid = _task_tids[task] = next(_next_task_tid)
+        return tid
+
+
+@contextlib.contextmanager
+def traced(file_name: str | None):
+    """Record spans of the body and write them to file_name as a Chrome trace, e.g. for Perfetto."""
+    global _events
+    if not file_name:
+        yield
+        return
+    _events = []
+    try:
+        yield
+    finally:
+        with _lock:
+            events, _events = _events, None
+        with open(file_name, "w") as f:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
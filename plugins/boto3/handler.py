@@ -2,19 +2,104 @@ import logging
 import plugin_registry
 import boto3
 from botocore.config import Config
+import itertools
 import json
 import jmespath
+import os
 import urllib.parse
 import yaml
 import re
+import threading
+import typing
 
-MY_SCHEMES = ["boto3", "boto3+json+jmespath"]
+MY_SCHEMES = ["boto3", "boto3+json+jmespath", "boto3+paginate"]
 
 # Examples:
 # boto3://secretsmanager/get_secret_value?SecretId=arn:aws:secretsmanager:eu-west-1:012345678901:secret:mysecretname-aBcDeF&VersionId=abcd#SecretString
 # boto3://secretsmanager@us-east-1/get_secret_value ...
 # boto3+json+jmespath://secretsmanager/get_secret_value?SecretId=arn:aws:secretsmanager:eu-west-1:012345678901:secret:mysecretname-aBcDeF&VersionId=abcd#SecretString/key1
 # boto3://elbv2/describe_tags?ResourceArns=[arn:aws:elasticloadbalancing:eu-west-1:012345678901:loadbalancer/net/a1b2c3d4e5f6]#TagDescriptions
+# With a paginator, the JMESPath expression over each page, its matches of all pages as a list:
+# boto3+paginate://ec2@eu-west-1/describe_instances#Reservations[].Instances[].InstanceId
+# ... | [n], the n-th match only, fetching pages until it is found:
+# boto3+paginate://secretsmanager/list_secrets#SecretList[?Name=='mysecretname'].ARN | [0]
+
+# Connections kept open per client, for as many workers calling the service and region at once
+DEFAULT_MAX_POOL_CONNECTIONS = 10
+
+# Creating clients on a session is not thread-safe, using them is.
+_client_lock = threading.Lock()
+
+
+class _Batch:
+    """How calls of a method for one ID, or a few, are merged into calls of a batch method for many."""
+
+    def __init__(
+        self,
+        id_param: str,
+        batch_method_name: str,
+        ids_param: str,
+        max_ids: int,  # Per call of the batch method
+        passed_params: typing.List[str],  # Other params, passed on to the batch method
+        items_by_id: typing.Callable[[dict], typing.Dict[str, dict]],
+        response_of: typing.Callable[[typing.List[dict]], dict],  # As the method's
+    ) -> None:
+        self.id_param = id_param
+        self.batch_method_name = batch_method_name
+        self.ids_param = ids_param
+        self.max_ids = max_ids
+        self.passed_params = passed_params
+        self.items_by_id = items_by_id
+        self.response_of = response_of
+
+
+def _parametersByName(batch_response: dict) -> typing.Dict[str, dict]:
+    items = {}
+    for parameter in batch_response["Parameters"]:
+        if parameter.get("Selector"):  # E.g. :3, of a Name requested as mysecretname:3
+            items[parameter["Name"] + parameter["Selector"]] = parameter
+        else:
+            items[parameter["Name"]] = items[parameter["ARN"]] = parameter
+    return items
+
+
+# Per (service, method), when prefetching, if both the method and the batch method are whitelisted.
+# IDs which the batch response misses, e.g. partial ARNs, are left to calls of the method itself.
+BATCHES = {
+    ("elbv2", "describe_tags"): _Batch(
+        "ResourceArns",
+        "describe_tags",
+        "ResourceArns",
+        20,
+        [],
+        lambda batch_response: {
+            item["ResourceArn"]: item for item in batch_response["TagDescriptions"]
+        },
+        lambda items: {"TagDescriptions": items},
+    ),
+    ("ssm", "get_parameter"): _Batch(
+        "Name",
+        "get_parameters",
+        "Names",
+        10,
+        ["WithDecryption"],
+        _parametersByName,
+        lambda items: {"Parameter": items[0]},
+    ),
+    ("secretsmanager", "get_secret_value"): _Batch(
+        "SecretId",
+        "batch_get_secret_value",
+        "SecretIdList",
+        20,
+        [],
+        lambda batch_response: {
+            id: item
+            for item in batch_response["SecretValues"]
+            for id in [item["ARN"], item["Name"]]
+        },
+        lambda items: items[0],
+    ),
+}
 
 
 class Boto3(plugin_registry.contract.IPlugin):
@@ -23,7 +108,16 @@ class Boto3(plugin_registry.contract.IPlugin):
     def __init__(self, logger: logging.Logger) -> None:
         super().__init__(logger)
         with open("boto3_plugin_whitelisted_services_and_methods.yaml") as stream:
-            self._url_resolver = UrlResolver(logger, yaml.safe_load(stream))
+            self._url_resolver = UrlResolver(
+                logger,
+                yaml.safe_load(stream),
+                max_pool_connections=int(
+                    os.getenv(
+                        "BOTO3_PLUGIN_MAX_POOL_CONNECTIONS",
+                        str(DEFAULT_MAX_POOL_CONNECTIONS),
+                    )
+                ),
+            )
         logger.info(__class__.__name__ + " plugin loaded")
 
     def getUrlResolver(self, scheme: str) -> plugin_registry.IUrlResolver:
@@ -32,10 +126,18 @@ class Boto3(plugin_registry.contract.IPlugin):
 
 class UrlResolver(plugin_registry.IUrlResolver):
     def __init__(
-        self, logger: logging.Logger, whitelisted_services_and_methods
+        self,
+        logger: logging.Logger,
+        whitelisted_services_and_methods,
+        max_pool_connections: int = DEFAULT_MAX_POOL_CONNECTIONS,
     ) -> None:
         super().__init__(logger)
         self._whitelisted_services_and_methods = whitelisted_services_and_methods
+        self._max_pool_connections = max_pool_connections
+        # Shared by all clients: credentials are resolved once per run, e.g. from IMDS or STS,
+        # and refreshed by botocore when they expire. Service models are loaded once per service.
+        self._session = boto3.session.Session()
+        self._clients = {}  # Per (service, region)
         self._boto_results_cache = {}
 
     def resolveToContent(
@@ -45,10 +147,9 @@ class UrlResolver(plugin_registry.IUrlResolver):
         url_parsed = urllib.parse.urlparse(url)
 
         is_jmespath_mode = url_parsed.scheme == "boto3+json+jmespath"
-        match = re.match(
-            r"(?P<service_name>[^@]+)(@(?P<region>.+))?", url_parsed.netloc)
-        aws_service_name = match.group("service_name")  # E.g. secretsmanager
-        aws_region = match.group("region")  # E.g. us-east-1
+        is_paginate_mode = url_parsed.scheme == "boto3+paginate"
+        # E.g. secretsmanager and us-east-1
+        aws_service_name, aws_region = _splitNetloc(url_parsed.netloc)
         method_name = url_parsed.path[1:]  # E.g. /get_secret_value
         method_params = url_parsed.query
         # E.g. SecretId=arn:aws:secretsmanager:eu-west-1:012345678901:secret:mysecretname-aBcDeF&VersionId=abcd'
@@ -64,40 +165,39 @@ class UrlResolver(plugin_registry.IUrlResolver):
             value_to_return = url_parsed.fragment  # E.g. SecretString
 
         try:
-            if (aws_service_name in self._whitelisted_services_and_methods) and (
-                method_name in self._whitelisted_services_and_methods[aws_service_name]
-            ):
-                pass
-            else:
+            if not self._isWhitelisted(aws_service_name, method_name):
                 raise Exception(
                     f"Boto3 service/method is not whitelisted: {aws_service_name}.{method_name}"
                 )
 
-            cache_key = f"{aws_service_name}@{aws_region}/{method_name}?{method_params}"
+            cache_key = _cacheKey(
+                aws_service_name, aws_region, method_name, method_params
+            )
 
-            if cache_key not in self._boto_results_cache:
-                config = Config(
-                    region_name=aws_region) if aws_region else None
-                client = boto3.client(aws_service_name, config=config)
-                method = getattr(client, method_name)
-
-                params = {}
-                for equation in method_params.split("&"):
-                    match = re.match(
-                        r"(?P<name>[^=]+)=(?P<value>.+)",
-                        equation,
-                    )
-                    param_name = match.group("name")
-                    param_value = match.group("value")
-                    if not re.match(r"^\[.+\]$", param_value):
-                        params[param_name] = param_value
-                    else:
-                        params[param_name] = param_value[1:-1].split(",")
-
-                response = method(**params)
-                self._boto_results_cache[cache_key] = response
+            if is_paginate_mode:
+                # The matches, not the pages, are cached
+                result = self._getOrCompute(
+                    self._boto_results_cache,
+                    f"{cache_key}#paginate:{url_parsed.fragment}",
+                    lambda: self._paginate(
+                        aws_service_name,
+                        aws_region,
+                        method_name,
+                        method_params,
+                        url_parsed.fragment,
+                    ),
+                    persist="responses",
+                )
+                return plugin_registry.contract.IContent(content=str(result).encode())
 
-            response = self._boto_results_cache[cache_key]
+            response = self._getOrCompute(
+                self._boto_results_cache,
+                cache_key,
+                lambda: self._call(
+                    aws_service_name, aws_region, method_name, method_params
+                ),
+                persist="responses",
+            )
 
             if value_to_return == "":
                 result = str(response)
@@ -111,3 +211,219 @@ class UrlResolver(plugin_registry.IUrlResolver):
         except Exception as e:
             self._logger.warning(f"{e}: {url}")
             return None
+
+    def prefetch(self, urls: typing.List[str]) -> None:
+        """Merge the calls of the URLs which have a batch method into calls of it, see BATCHES."""
+        # (service, region, method, passed params) -> {cache key: IDs}
+        groups: typing.Dict[tuple, typing.Dict[str, typing.List[str]]] = {}
+        for url in urls:
+            url_parsed = urllib.parse.urlparse(url)
+            aws_service_name, aws_region = _splitNetloc(url_parsed.netloc)
+            method_name = url_parsed.path[1:]
+            batch = BATCHES.get((aws_service_name, method_name))
+            if (
+                batch is None
+                or url_parsed.scheme == "boto3+paginate"
+                or not url_parsed.query
+                or not self._isWhitelisted(aws_service_name, method_name)
+                or not self._isWhitelisted(aws_service_name, batch.batch_method_name)
+            ):
+                continue
+            params = _parseParams(url_parsed.query)
+            ids = params.pop(batch.id_param, None)
+            if ids is None or not set(params) <= set(batch.passed_params):
+                continue
+            cache_key = _cacheKey(
+                aws_service_name, aws_region, method_name, url_parsed.query
+            )
+            if (
+                cache_key in self._boto_results_cache
+                or self._getPersistent("responses", cache_key)[0]
+            ):
+                continue
+            group = (aws_service_name, aws_region, method_name, tuple(params.items()))
+            groups.setdefault(group, {})[cache_key] = (
+                ids if isinstance(ids, list) else [ids]
+            )
+
+        for group, ids_by_key in groups.items():
+            aws_service_name, aws_region, method_name, params = group
+            try:
+                self._callBatch(
+                    aws_service_name, aws_region, method_name, dict(params), ids_by_key
+                )
+            except Exception as e:
+                # Not fatal here. The URLs are resolved one by one then.
+                self._logger.warning(
+                    f"{e}: batch of {len(ids_by_key)} {aws_service_name}.{method_name} calls"
+                )
+
+    def describeWorkload(self, url: str) -> plugin_registry.contract.IWorkload:
+        url_parsed = urllib.parse.urlparse(url)
+        try:
+            aws_service_name, aws_region = _splitNetloc(url_parsed.netloc)
+        except Exception as e:  # Resolving it fails, it is told in the plan but takes no calls
+            self._logger.warning(f"{e}: {url}")
+            return plugin_registry.contract.IWorkload(
+                groups={"AWS service and region": "unparseable"}, calls=[]
+            )
+        method_name = url_parsed.path[1:]
+        return plugin_registry.contract.IWorkload(
+            groups={
+                "AWS service and region": f"{aws_service_name}@{aws_region or 'default'}"
+            },
+            calls=[
+                (
+                    "AWS API calls",
+                    f"{aws_service_name}@{aws_region}/{method_name}?{url_parsed.query}",
+                )
+            ],
+        )
+
+    def _getClient(self, aws_service_name: str, aws_region: str | None):
+        def createClient():
+            config_kwargs = {"max_pool_connections": self._max_pool_connections}
+            if aws_region:
+                config_kwargs["region_name"] = aws_region
+            if self._call_timeout is not None:
+                config_kwargs["connect_timeout"] = self._call_timeout
+                config_kwargs["read_timeout"] = self._call_timeout
+            with _client_lock:
+                return self._session.client(
+                    aws_service_name, config=Config(**config_kwargs)
+                )
+
+        return self._getOrCompute(
+            self._clients,
+            (aws_service_name, aws_region),
+            createClient,
+            expires=False,
+            count=False,
+        )
+
+    def _call(
+        self,
+        aws_service_name: str,
+        aws_region: str | None,
+        method_name: str,
+        method_params: str,
+    ):
+        method = getattr(self._getClient(aws_service_name, aws_region), method_name)
+        params = _parseParams(method_params)
+
+        with plugin_registry.tracing.span(
+            f"{aws_service_name}.{method_name}", "aws api", region=aws_region
+        ):
+            return method(**params)
+
+    def _paginate(
+        self,
+        aws_service_name: str,
+        aws_region: str | None,
+        method_name: str,
+        method_params: str,
+        expression: str,
+    ):
+        if not expression:
+            raise Exception("boto3+paginate URLs need a #JMESPath expression")
+        match = re.match(r"(?P<expression>.+?)\s*\|\s*\[(?P<index>\d+)\]$", expression)
+        paginator = self._getClient(aws_service_name, aws_region).get_paginator(
+            method_name
+        )
+        with plugin_registry.tracing.span(
+            f"{aws_service_name}.{method_name} pages", "aws api", region=aws_region
+        ):
+            # Pages are fetched as the matches are consumed, and dropped once searched
+            pages = paginator.paginate(**_parseParams(method_params))
+            if match is None:
+                return list(_searchPages(pages, expression))
+            index = int(match.group("index"))
+            matches = _searchPages(pages, match.group("expression"))
+            return next(itertools.islice(matches, index, None), None)
+
+    def _callBatch(
+        self,
+        aws_service_name: str,
+        aws_region: str | None,
+        method_name: str,
+        params: dict,
+        ids_by_key: typing.Dict[str, typing.List[str]],
+    ) -> None:
+        batch = BATCHES[(aws_service_name, method_name)]
+        batch_method = getattr(
+            self._getClient(aws_service_name, aws_region), batch.batch_method_name
+        )
+        ids = list(dict.fromkeys(id for ids in ids_by_key.values() for id in ids))
+        items = {}
+        starts = range(0, len(ids), batch.max_ids)
+        for i in starts:
+            with plugin_registry.tracing.span(
+                f"{aws_service_name}.{batch.batch_method_name}",
+                "aws api",
+                region=aws_region,
+            ):
+                batch_response = batch_method(
+                    **{batch.ids_param: ids[i : i + batch.max_ids]}, **params
+                )
+            items.update(batch.items_by_id(batch_response))
+        self._logger.debug(
+            f"{len(ids_by_key)} {aws_service_name}.{method_name} calls merged into {len(starts)} {aws_service_name}.{batch.batch_method_name} calls"
+        )
+
+        for cache_key, key_ids in ids_by_key.items():
+            if all(id in items for id in key_ids):
+                response = batch.response_of([items[id] for id in key_ids])
+                self._getOrCompute(
+                    self._boto_results_cache,
+                    cache_key,
+                    lambda: response,
+                    persist="responses",
+                )
+
+    def _isWhitelisted(self, aws_service_name: str, method_name: str) -> bool:
+        return (aws_service_name in self._whitelisted_services_and_methods) and (
+            method_name in self._whitelisted_services_and_methods[aws_service_name]
+        )
+
+
+def _splitNetloc(netloc: str) -> typing.Tuple[str, str | None]:
+    # E.g. secretsmanager@us-east-1, the region is optional
+    match = re.match(r"(?P<service_name>[^@]+)(@(?P<region>.+))?", netloc)
+    if not match:
+        raise Exception(f"No AWS service name in {netloc!r}")
+    return match.group("service_name"), match.group("region")
+
+
+def _cacheKey(
+    aws_service_name: str, aws_region: str | None, method_name: str, method_params: str
+) -> str:
+    return f"{aws_service_name}@{aws_region}/{method_name}?{method_params}"
+
+
+def _searchPages(pages: typing.Iterable[dict], expression: str) -> typing.Iterator:
+    # As botocore's PageIterator.search: the matches of each page, lists flattened, nulls skipped
+    compiled = jmespath.compile(expression)
+    for page in pages:
+        found = compiled.search(page)
+        if isinstance(found, list):
+            yield from found
+        elif found is not None:
+            yield found
+
+
+def _parseParams(method_params: str) -> dict:
+    params = {}
+    if not method_params:  # E.g. of list_secrets
+        return params
+    for equation in method_params.split("&"):
+        match = re.match(
+            r"(?P<name>[^=]+)=(?P<value>.+)",
+            equation,
+        )
+        param_name = match.group("name")
+        param_value = match.group("value")
+        if not re.match(r"^\[.+\]$", param_value):
+            params[param_name] = param_value
+        else:
+            params[param_name] = param_value[1:-1].split(",")
+    return params
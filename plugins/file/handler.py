@@ -22,6 +22,11 @@ class UrlResolver(plugin_registry.IUrlResolver):
     def __init__(self, logger: logging.Logger) -> str:
         super().__init__(logger)
 
+    def describeWorkload(self, url: str) -> plugin_registry.contract.IWorkload:
+        return plugin_registry.contract.IWorkload(
+            groups={}, calls=[("file reads", urllib.parse.urlparse(url).path)]
+        )
+
     def resolveToContent(self, url: str) -> plugin_registry.contract.IContent | None:
         url = urllib.parse.urlparse(url)
         try:
@@ -6,6 +6,7 @@ import git
 import gitdb
 import urllib.parse
 import re
+import shutil
 
 MY_SCHEME_NAME = "gitlab"
 
@@ -39,36 +40,51 @@ class UrlResolver(plugin_registry.IUrlResolver):
 
     def _getGL(self, url: str):
         url_parsed = urllib.parse.urlparse(url)
-        if url_parsed.hostname in self._gls:
-            gl = self._gls[url_parsed.hostname]
-        else:
-            gl = gitlab.Gitlab(
-                f"https://{url_parsed.hostname}",
-                os.getenv("GITLAB_TOKEN"),  # TODO: Provide token as plugin config
-            )
-            if self._logger.isEnabledFor(logging.DEBUG):
-                gl.enable_debug()  # TODO: Token leaks to output
-            self._gls[url_parsed.hostname] = gl
+        return self._getOrCompute(
+            self._gls,
+            url_parsed.hostname,
+            lambda: self._createGL(url_parsed.hostname),
+            expires=False,
+            count=False,
+        )
+
+    def _createGL(self, hostname: str):
+        gl = gitlab.Gitlab(
+            f"https://{hostname}",
+            os.getenv("GITLAB_TOKEN"),  # TODO: Provide token as plugin config
+            **self._callTimeoutKwargs("timeout"),
+        )
+        if self._logger.isEnabledFor(logging.DEBUG):
+            gl.enable_debug()  # TODO: Token leaks to output
         return gl
 
     def _getAndCacheProjectEnvironment(
         self, project, project_id: str, environment_name: str
     ):
-        environment_cache_key = f"{project_id}:{environment_name}"
-        if environment_cache_key not in self._environments_cache:
-            environments = project.environments.list()
-            environment_id = [e for e in environments if e.name == environment_name][
-                0
-            ].id
-            environment = project.environments.get(environment_id)
-            self._environments_cache[environment_cache_key] = environment
-
-        return self._environments_cache[environment_cache_key]
+        def getEnvironment():
+            with plugin_registry.tracing.span(
+                "environments", "gitlab api", project=project_id
+            ):
+                environments = project.environments.list()
+                environment_id = [
+                    e for e in environments if e.name == environment_name
+                ][0].id
+                return project.environments.get(environment_id)
+
+        return self._getOrCompute(
+            self._environments_cache, f"{project_id}:{environment_name}", getEnvironment
+        )
 
     def _getAndCacheProject(self, gl, project_id: str):
-        if project_id not in self._projects_cache:
-            self._projects_cache[project_id] = gl.projects.get(project_id)
-        return self._projects_cache[project_id]
+        def getProject():
+            with plugin_registry.tracing.span(
+                "projects.get", "gitlab api", project=project_id
+            ):
+                return gl.projects.get(project_id)
+
+        return self._getOrCompute(
+            self._projects_cache, project_id, getProject, expires=False, count=False
+        )
 
     def _urlToCachedRepoPath(self, url_parsed: urllib.parse.ParseResult) -> str:
         project_path_with_leading_slash = url_parsed.path.split("/-/blob/")[0]
@@ -95,42 +111,67 @@ class UrlResolver(plugin_registry.IUrlResolver):
             f"https://oauth2:REDACTED@{hostname}{project_path_with_leading_slash}.git"
         )
 
-        if self._git_fetched_for.get(repo_and_ref_to_key):
-            repo = git.Repo(cached_repo_path)
-            latest_commit = self._git_fetched_for[repo_and_ref_to_key]
-        else:
-            try:
+        # Fetches of different refs into the same local repo overwrite each other's FETCH_HEAD
+        with self._lockFor(cached_repo_path):
+            if self._git_fetched_for.get(repo_and_ref_to_key):
                 repo = git.Repo(cached_repo_path)
-                try:
-                    self._logger.info(
-                        f"Doing git fetch {repo_url_redacted} refs/heads/{ref_to} in {hostname}{project_path_with_leading_slash}"
-                    )
-                    repo.git.fetch(repo_url, f"refs/heads/{ref_to}")
-                except git.exc.GitCommandError:
-                    self._logger.info(
-                        f"git fetch failed. Doing git fetch {repo_url_redacted} +refs/tags/{ref_to}:refs/tags/{ref_to} in {hostname}{project_path_with_leading_slash}"
-                    )
-                    repo.git.fetch(repo_url, f"+refs/tags/{ref_to}:refs/tags/{ref_to}")
-                latest_commit = repo.commit("FETCH_HEAD")
-            except git.exc.NoSuchPathError:
-                self._logger.info(
-                    f"Doing git clone {repo_url_redacted} --branch {ref_to}"
-                )
-                repo = git.Repo.clone_from(
-                    url=repo_url,
-                    to_path=cached_repo_path,
-                    branch=ref_to,
-                )
-                try:
-                    latest_commit = repo.commit(f"remotes/origin/{ref_to}")
-                except gitdb.exc.BadName:
-                    latest_commit = repo.commit(f"refs/tags/{ref_to}")
-
-            self._git_fetched_for[repo_and_ref_to_key] = latest_commit
-
-        diff = repo.commit(ref_from).diff(
-            latest_commit, create_patch=True, minimal=True, find_renames="40%"
-        )
+                latest_commit = self._git_fetched_for[repo_and_ref_to_key]
+            else:
+                with plugin_registry.tracing.span(
+                    "git fetch", "git", repo=project_path_with_leading_slash, ref=ref_to
+                ):
+                    try:
+                        repo = git.Repo(cached_repo_path)
+                        try:
+                            self._logger.info(
+                                f"Doing git fetch {repo_url_redacted} refs/heads/{ref_to} in {hostname}{project_path_with_leading_slash}"
+                            )
+                            repo.git.fetch(
+                                repo_url,
+                                f"refs/heads/{ref_to}",
+                                **self._callTimeoutKwargs("kill_after_timeout"),
+                            )
+                        except git.exc.GitCommandError:
+                            self._logger.info(
+                                f"git fetch failed. Doing git fetch {repo_url_redacted} +refs/tags/{ref_to}:refs/tags/{ref_to} in {hostname}{project_path_with_leading_slash}"
+                            )
+                            repo.git.fetch(
+                                repo_url,
+                                f"+refs/tags/{ref_to}:refs/tags/{ref_to}",
+                                **self._callTimeoutKwargs("kill_after_timeout"),
+                            )
+                        latest_commit = repo.commit("FETCH_HEAD")
+                    except git.exc.NoSuchPathError:
+                        self._logger.info(
+                            f"Doing git clone {repo_url_redacted} --branch {ref_to}"
+                        )
+                        # Not Repo.clone_from, which does not honour kill_after_timeout
+                        try:
+                            git.Git().clone(
+                                f"--branch={ref_to}",
+                                "--",
+                                repo_url,
+                                cached_repo_path,
+                                **self._callTimeoutKwargs("kill_after_timeout"),
+                            )
+                        except git.exc.GitCommandError:
+                            # A killed clone leaves a partial repo behind, which would not be cloned again
+                            shutil.rmtree(cached_repo_path, ignore_errors=True)
+                            raise
+                        repo = git.Repo(cached_repo_path)
+                        try:
+                            latest_commit = repo.commit(f"remotes/origin/{ref_to}")
+                        except gitdb.exc.BadName:
+                            latest_commit = repo.commit(f"refs/tags/{ref_to}")
+
+                self._putCache(self._git_fetched_for, repo_and_ref_to_key, latest_commit)
+
+        with plugin_registry.tracing.span(
+            "git diff", "git", repo=project_path_with_leading_slash
+        ):
+            diff = repo.commit(ref_from).diff(
+                latest_commit, create_patch=True, minimal=True, find_renames="40%"
+            )
         return diff, latest_commit.hexsha[:8]
 
     def diff(self, url: str) -> plugin_registry.contract.IDiff | bool | None:
@@ -159,34 +200,30 @@ class UrlResolver(plugin_registry.IUrlResolver):
         if match:
             environment_name = match.group("environment_name")
 
-        try:
-            if url_parsed.path not in self._repository_compare_cache:
+        def compare():
+            try:
                 project = self._getAndCacheProject(gl=gl, project_id=project_id)
 
+                ref = ref_to
                 if environment_name:
                     environment = self._getAndCacheProjectEnvironment(
                         project=project,
                         project_id=project_id,
                         environment_name=environment_name,
                     )
-                    ref_to = environment.last_deployment["ref"]
+                    ref = environment.last_deployment["ref"]
 
-                diff, ref_to_hexsha_8chars = self._calcDiff(
-                    url_parsed, ref_from, ref_to
-                )
-                self._repository_compare_cache[url_parsed.path] = (
-                    diff,
-                    ref_to_hexsha_8chars,
-                )
-            elif self._repository_compare_cache[url_parsed.path] is None:
+                return self._calcDiff(url_parsed, ref_from, ref)
+            except Exception as e:
+                self._logger.warning(f"{type(e)}: {e}")
                 return None
-            compare_result, ref_to_hexsha_8chars = self._repository_compare_cache[
-                url_parsed.path
-            ]
-        except Exception as e:
-            self._logger.warning(f"{type(e)}: {e}")
-            self._repository_compare_cache[url_parsed.path] = None
+
+        compare_result = self._getOrCompute(
+            self._repository_compare_cache, url_parsed.path, compare
+        )
+        if compare_result is None:
             return None
+        compare_result, ref_to_hexsha_8chars = compare_result
 
         diff_entry_arr = [
             item for item in compare_result if item.a_path == file_path
@@ -380,6 +417,40 @@ class UrlResolver(plugin_registry.IUrlResolver):
                 was_lines_content=was_lines_content,
             )
 
+    def describeWorkload(self, url: str) -> plugin_registry.contract.IWorkload:
+        url_parsed = urllib.parse.urlparse(url)
+        match = re.match(
+            r"/(?P<project_id>.+)/-/blob/(?P<ref>[^/]+)/(?P<file_path>[^@#]+)(@(?P<ref_from>[a-fA-F0-9]+))?",
+            url_parsed.path,
+        )
+        if not match:  # Resolving it fails, it is told in the plan but takes no calls
+            self._logger.warning(f"Unparseable GitLab URL: {url}")
+            return plugin_registry.contract.IWorkload(
+                groups={"GitLab project": "unparseable"}, calls=[]
+            )
+        project = f"{url_parsed.hostname}/{match.group('project_id')}"
+        ref = match.group("ref")
+        ref_from = match.group("ref_from")
+
+        groups = {"GitLab project": project}
+        calls = [("GitLab API calls", ("projects.get", project))]
+        match = re.match(
+            r"\${environment\([\"'](?P<environment_name>[^\"']+)[\"']\).last_deployment.sha}",
+            ref,
+        )
+        if match:
+            environment = (project, match.group("environment_name"))
+            calls.append(("GitLab API calls", ("environments.list", environment)))
+            calls.append(("GitLab API calls", ("environments.get", environment)))
+
+        if ref_from:  # Resolved by diff
+            groups["GitLab ref pair"] = f"{project} {ref_from}..{ref}"
+            calls.append(("git fetches", (project, ref)))
+            calls.append(("git diffs", url_parsed.path))
+        else:
+            calls.append(("GitLab API calls", ("files.get", url_parsed.path)))
+        return plugin_registry.contract.IWorkload(groups=groups, calls=calls)
+
     def resolveToContent(
         self, url: str
     ) -> plugin_registry.contract.IVersionedContent | None:
@@ -406,22 +477,32 @@ class UrlResolver(plugin_registry.IUrlResolver):
         if match:
             environment_name = match.group("environment_name")
 
-        try:
-            if url_parsed.path not in self._repository_content_cache:
-                if environment_name:
-                    environment = self._getAndCacheProjectEnvironment(
-                        project=project,
-                        project_id=project_id,
-                        environment_name=environment_name,
-                    )
-                    ref = environment.last_deployment["sha"]
-
-                self._repository_content_cache[url_parsed.path] = project.files.get(
-                    file_path=file_path, ref=ref
+        def getFile():
+            file_ref = ref
+            if environment_name:
+                environment = self._getAndCacheProjectEnvironment(
+                    project=project,
+                    project_id=project_id,
+                    environment_name=environment_name,
                 )
+                file_ref = environment.last_deployment["sha"]
+
+            with plugin_registry.tracing.span(
+                "files.get", "gitlab api", project=project_id, file_path=file_path
+            ):
+                gitlab_file = project.files.get(file_path=file_path, ref=file_ref)
+            self._countFetched(gitlab_file.content)
+            # Not the ProjectFile, which does not outlive its GitLab client in the persistent cache
+            return gitlab_file.decode(), gitlab_file.last_commit_id
 
-            gitlab_file = self._repository_content_cache[url_parsed.path]
-            all_lines = gitlab_file.decode()
+        try:
+            all_lines, last_commit_id = self._getOrCompute(
+                self._repository_content_cache,
+                url_parsed.path,
+                getFile,
+                persist="files",
+                immutable=re.fullmatch(r"[0-9a-fA-F]{40}", ref) is not None,
+            )
 
             m = re.match(r"L(?P<from>\d+)(-(?P<to>\d+))?", url_parsed.fragment)
             from_line: int = int(m.group("from"))
@@ -432,7 +513,7 @@ class UrlResolver(plugin_registry.IUrlResolver):
 
             return plugin_registry.contract.IVersionedContent(
                 content=b"\n".join(lines),
-                last_commit_id=gitlab_file.last_commit_id[0:8],
+                last_commit_id=last_commit_id[0:8],
             )
 
         except gitlab.GitlabGetError as e:
@@ -1,10 +1,24 @@
 import logging
 import plugin_registry
+import aiohttp
+import asyncio
+import os
 import requests
+import requests.adapters
+import typing
+import urllib.parse
+import urllib3.util.request
 import yaml
 
 MY_SCHEME_NAME = "https"
 
+# Connections kept open per host, for as many workers resolving URLs of the host at once.
+# Also the bound of concurrent requests per host of resolveToContentAsync.
+DEFAULT_POOL_SIZE = 10
+# Bytes of a response body, decoded. Larger bodies are not resolved.
+DEFAULT_MAX_SIZE = 100 * 1024 * 1024
+CHUNK_SIZE = 64 * 1024
+
 
 class Https(plugin_registry.contract.IPlugin):
     _url_resolver: plugin_registry.IUrlResolver
@@ -13,7 +27,14 @@ class Https(plugin_registry.contract.IPlugin):
         super().__init__(logger)
 
         with open("https_plugin_headers.yaml") as stream:
-            self._url_resolver = UrlResolver(logger, yaml.safe_load(stream))
+            self._url_resolver = UrlResolver(
+                logger,
+                yaml.safe_load(stream),
+                pool_size=int(
+                    os.getenv("HTTPS_PLUGIN_POOL_SIZE", str(DEFAULT_POOL_SIZE))
+                ),
+                max_size=int(os.getenv("HTTPS_PLUGIN_MAX_SIZE", str(DEFAULT_MAX_SIZE))),
+            )
 
         logger.info(__class__.__name__ + " plugin loaded")
 
@@ -21,23 +42,263 @@ class Https(plugin_registry.contract.IPlugin):
         return self._url_resolver if scheme == MY_SCHEME_NAME else None
 
 
+class HttpContent(plugin_registry.contract.IContent):
+    """Content with its validators, for conditional GETs of it."""
+
+    def __init__(
+        self,
+        content: bytes | None,
+        etag: str | None,
+        last_modified: str | None,
+        fingerprint: str | None = None,
+    ) -> None:
+        super().__init__(content, fingerprint)
+        self.etag = etag
+        self.last_modified = last_modified
+
+
+class _Body:
+    """A response body as it arrives, hashed chunk by chunk and, unless fingerprint_only, kept."""
+
+    def __init__(self, fingerprint_only: bool) -> None:
+        self.size = 0
+        self._hash = plugin_registry.contract.fingerprintHash()
+        self._chunks: typing.List[bytes] | None = None if fingerprint_only else []
+
+    def add(self, chunk: bytes) -> None:
+        self.size += len(chunk)
+        self._hash.update(chunk)
+        if self._chunks is not None:
+            self._chunks.append(chunk)
+
+    def toContent(
+        self, etag: str | None, last_modified: str | None
+    ) -> plugin_registry.contract.IContent:
+        content = None if self._chunks is None else b"".join(self._chunks)
+        fingerprint = self._hash.hexdigest(plugin_registry.contract.FINGERPRINT_BYTES)
+        if not (etag or last_modified):
+            return plugin_registry.contract.IContent(content, fingerprint)
+        return HttpContent(content, etag, last_modified, fingerprint)
+
+
 class UrlResolver(plugin_registry.IUrlResolver):
-    def __init__(self, logger: logging.Logger, headers) -> None:
+    def __init__(
+        self,
+        logger: logging.Logger,
+        headers,
+        pool_size: int = DEFAULT_POOL_SIZE,
+        max_size: int = DEFAULT_MAX_SIZE,
+    ) -> None:
         super().__init__(logger)
         self.isVersioningSupported = False
         self._headers = headers
+        self._pool_size = pool_size
+        self._max_size = max_size
+        self._sessions = {}  # Per host, keeping connections alive between requests
+        # Of the event loop it was created in, every asyncio.run has its own
+        self._async_session: aiohttp.ClientSession | None = None
+        self._async_session_loop: asyncio.AbstractEventLoop | None = None
         self._cache = {}
+        self._fingerprints = {}  # Of contents never held whole
+        # The last HttpContent of a URL, kept past the cache TTL to revalidate it with a conditional GET.
+        # Per fingerprint_only, as a fingerprint without content cannot stand in for content.
+        self._validated: typing.Dict[typing.Tuple[str, bool], HttpContent] = {}
 
     def resolveToContent(self, url: str) -> plugin_registry.contract.IContent | None:
+        return self._getOrCompute(
+            self._cache, url, lambda: self._fetch(url), persist="content"
+        )
+
+    def resolveToFingerprint(
+        self, url: str
+    ) -> plugin_registry.contract.IContent | None:
+        if url in self._cache:  # Held whole already, e.g. for a value-ref
+            return self.resolveToContent(url)
+        return self._getOrCompute(
+            self._fingerprints,
+            url,
+            lambda: self._fetch(url, fingerprint_only=True),
+            persist="fingerprints",
+        )
+
+    async def resolveToContentAsync(
+        self, url: str
+    ) -> plugin_registry.contract.IContent | None:
+        return await self._getOrComputeAsync(
+            self._cache, url, lambda: self._fetchAsync(url), persist="content"
+        )
+
+    async def resolveToFingerprintAsync(
+        self, url: str
+    ) -> plugin_registry.contract.IContent | None:
+        if url in self._cache:
+            return await self.resolveToContentAsync(url)
+        return await self._getOrComputeAsync(
+            self._fingerprints,
+            url,
+            lambda: self._fetchAsync(url, fingerprint_only=True),
+            persist="fingerprints",
+        )
+
+    async def closeAsync(self) -> None:
+        if self._async_session is not None:
+            await self._async_session.close()
+            self._async_session = None
+
+    def describeWorkload(self, url: str) -> plugin_registry.contract.IWorkload:
+        return plugin_registry.contract.IWorkload(groups={}, calls=[("HTTP GETs", url)])
+
+    def _getSession(self, host: str) -> requests.Session:
+        def createSession():
+            session = requests.Session()
+            adapter = requests.adapters.HTTPAdapter(
+                pool_connections=1, pool_maxsize=self._pool_size
+            )
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            # The encodings which urllib3 decodes, br when brotli is installed
+            session.headers["Accept-Encoding"] = urllib3.util.request.ACCEPT_ENCODING
+            return session
+
+        return self._getOrCompute(
+            self._sessions, host, createSession, expires=False, count=False
+        )
+
+    def _getValidated(self, url: str, fingerprint_only: bool) -> HttpContent | None:
+        validated = self._validated.get((url, fingerprint_only))
+        if validated is None and self._persistent_cache is not None:
+            _, validated = self._persistent_cache.get(
+                self._validatedNamespace(fingerprint_only), url
+            )
+        return validated
+
+    def _putValidated(
+        self, url: str, fingerprint_only: bool, content_obj: HttpContent
+    ) -> None:
+        self._validated[(url, fingerprint_only)] = content_obj
+        if self._persistent_cache is not None:
+            # Never expires, it is revalidated on use
+            self._persistent_cache.put(
+                self._validatedNamespace(fingerprint_only), url, content_obj, None
+            )
+
+    def _validatedNamespace(self, fingerprint_only: bool) -> str:
+        return self._persistentNamespace(
+            "validated_fingerprints" if fingerprint_only else "validated"
+        )
+
+    def _getAsyncSession(self) -> aiohttp.ClientSession:
+        loop = asyncio.get_running_loop()
+        if self._async_session is None or self._async_session_loop is not loop:
+            self._async_session = aiohttp.ClientSession(
+                headers=self._headers,
+                connector=aiohttp.TCPConnector(
+                    limit=0, limit_per_host=self._pool_size
+                ),
+            )
+            self._async_session_loop = loop
+        return self._async_session
+
+    def _conditionalHeaders(self, validated: HttpContent | None) -> dict:
+        headers = {}
+        if validated is not None:
+            if validated.etag:
+                headers["If-None-Match"] = validated.etag
+            if validated.last_modified:
+                headers["If-Modified-Since"] = validated.last_modified
+        return headers
+
+    def _fetch(
+        self, url: str, fingerprint_only: bool = False
+    ) -> plugin_registry.contract.IContent | None:
+        session = self._getSession(urllib.parse.urlparse(url).netloc)
+        validated = self._getValidated(url, fingerprint_only)
+        headers = {**(self._headers or {}), **self._conditionalHeaders(validated)}
+        with plugin_registry.tracing.span("GET", "http", url=url):
+            r = session.get(
+                url, headers=headers, stream=True, **self._callTimeoutKwargs("timeout")
+            )
+            try:
+                if not self._isBodyWanted(
+                    url, r.status_code, r.reason, r.headers, validated
+                ):
+                    return validated if r.status_code == 304 else None
+                # Decoded per Content-Encoding only, not to text and back
+                body = _Body(fingerprint_only)
+                for chunk in r.iter_content(CHUNK_SIZE):
+                    if not self._addChunk(url, body, chunk):
+                        return None
+            finally:
+                r.close()
+        return self._toContent(url, fingerprint_only, r.headers, body)
+
+    async def _fetchAsync(
+        self, url: str, fingerprint_only: bool = False
+    ) -> plugin_registry.contract.IContent | None:
+        validated = self._getValidated(url, fingerprint_only)
+        with plugin_registry.tracing.span("GET", "http", url=url):
+            async with self._getAsyncSession().get(
+                url,
+                headers=self._conditionalHeaders(validated),
+                **self._asyncTimeoutKwargs(),
+            ) as r:
+                if not self._isBodyWanted(
+                    url, r.status, r.reason, r.headers, validated
+                ):
+                    return validated if r.status == 304 else None
+                body = _Body(fingerprint_only)
+                async for chunk in r.content.iter_chunked(CHUNK_SIZE):
+                    if not self._addChunk(url, body, chunk):
+                        return None
+        return self._toContent(url, fingerprint_only, r.headers, body)
+
+    def _asyncTimeoutKwargs(self) -> typing.Dict[str, aiohttp.ClientTimeout]:
+        # Not ClientTimeout(total=None), which is no timeout at all: the session's default, unless it is set
+        if self._call_timeout is None:
+            return {}
+        return {"timeout": aiohttp.ClientTimeout(total=self._call_timeout)}
 
-        cache_key = url
+    def _isBodyWanted(
+        self,
+        url: str,
+        status: int,
+        reason: str,
+        headers: typing.Mapping[str, str],
+        validated: HttpContent | None,
+    ) -> bool:
+        if status == 304 and validated is not None:
+            self._logger.debug(f"Not modified: {url}")
+            return False
+        if status >= 300:
+            self._logger.warning(f"{status} {reason}: {url}")
+            return False
+        # Of the encoded body, which the decoded one is at least about as large as
+        content_length = headers.get("Content-Length")
+        if content_length is not None and int(content_length) > self._max_size:
+            self._logger.warning(
+                f"Content-Length {content_length} is over the maximum size {self._max_size}: {url}"
+            )
+            return False
+        return True
 
-        if cache_key not in self._cache:
-            r = requests.get(url, headers=self._headers)
-            if r.status_code >= 300:
-                self._logger.warning(f"{r.status_code} {r.reason}: {url}")
-                self._cache[cache_key] = None
-            else:
-                self._cache[cache_key] = plugin_registry.contract.IContent(r.text.encode())
+    def _addChunk(self, url: str, body: _Body, chunk: bytes) -> bool:
+        self._countFetched(chunk)
+        body.add(chunk)
+        if body.size > self._max_size:
+            self._logger.warning(
+                f"Content is over the maximum size {self._max_size}, stopped: {url}"
+            )
+            return False
+        return True
 
-        return self._cache[cache_key]
+    def _toContent(
+        self,
+        url: str,
+        fingerprint_only: bool,
+        headers: typing.Mapping[str, str],
+        body: _Body,
+    ) -> plugin_registry.contract.IContent:
+        content_obj = body.toContent(headers.get("ETag"), headers.get("Last-Modified"))
+        if isinstance(content_obj, HttpContent):
+            self._putValidated(url, fingerprint_only, content_obj)
+        return content_obj
@@ -69,30 +69,13 @@ class UrlResolver(plugin_registry.IUrlResolver):
         cache_key = host + url_parsed.path
 
         try:
-            if cache_key not in self._k8s_results_cache:
-                config = kubernetes.client.Configuration()
-                kubernetes.config.load_kube_config(
-                    context=self._host_name_to_kubectl_context_name[host],
-                    client_configuration=config,
-                )
-
-                client = kubernetes.dynamic.DynamicClient(
-                    kubernetes.client.api_client.ApiClient(configuration=config)
-                )
-
-                api = client.resources.get(
-                    group=api_group, api_version=api_version, kind=resource_kind
-                )
-
-                response = api.get(
-                    body=None,
-                    name=resource_name,
-                    namespace=namespace,
-                )
-
-                self._k8s_results_cache[cache_key] = response
-
-            response = self._k8s_results_cache[cache_key]
+            response = self._getOrCompute(
+                self._k8s_results_cache,
+                cache_key,
+                lambda: self._get(
+                    host, api_group, api_version, resource_kind, resource_name, namespace
+                ),
+            )
 
             result = str(jmespath.search(jmethpath_expression, response))
 
@@ -103,3 +86,46 @@ class UrlResolver(plugin_registry.IUrlResolver):
                 raise e
 
         return plugin_registry.contract.IContent(content=result.encode())
+
+    def describeWorkload(self, url: str) -> plugin_registry.contract.IWorkload:
+        url_parsed = urllib.parse.urlparse(url[len(MY_SCHEME_NAME) + 3 :])
+        host = url_parsed.scheme + "://" + url_parsed.hostname
+        return plugin_registry.contract.IWorkload(
+            groups={
+                "k8s context": self._host_name_to_kubectl_context_name.get(host, host)
+            },
+            calls=[("k8s API calls", host + url_parsed.path)],
+        )
+
+    def _get(
+        self,
+        host: str,
+        api_group: str,
+        api_version: str,
+        resource_kind: str,
+        resource_name: str,
+        namespace: str,
+    ):
+        config = kubernetes.client.Configuration()
+        kubernetes.config.load_kube_config(
+            context=self._host_name_to_kubectl_context_name[host],
+            client_configuration=config,
+        )
+
+        client = kubernetes.dynamic.DynamicClient(
+            kubernetes.client.api_client.ApiClient(configuration=config)
+        )
+
+        api = client.resources.get(
+            group=api_group, api_version=api_version, kind=resource_kind
+        )
+
+        with plugin_registry.tracing.span(
+            f"GET {resource_kind}", "k8s api", host=host, namespace=namespace
+        ):
+            return api.get(
+                body=None,
+                name=resource_name,
+                namespace=namespace,
+                **self._callTimeoutKwargs("_request_timeout"),
+            )
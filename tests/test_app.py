@@ -8,6 +8,11 @@ import pytest
 import unittest
 from unittest import mock
 import tests.tests_lib as tests_lib
+import json
+import os
+import pstats
+import tempfile
+import time
 
 
 class TestWriteXmlTreeInArchiFormat:
@@ -196,7 +201,7 @@ class TestProcessFileWithVersioning:
             "builtins.open", mock.mock_open(read_data=file_content)
         ) as mock_file:
             mock_plugin = mock.MagicMock()
-            mock_plugin.getUrlResolver.return_value.resolveToContent.return_value = (
+            mock_plugin.getUrlResolver.return_value.resolveToFingerprint.return_value = (
                 plugin_registry.contract.IVersionedContent(
                     content=b"fakecontent",
                     last_commit_id="a996319a",
@@ -206,7 +211,7 @@ class TestProcessFileWithVersioning:
             assert changes_detected
             mock_file.assert_called_with("somefile.xml", "w")
             mock_file.return_value.close.assert_called_with()
-            mock_plugin.getUrlResolver.return_value.resolveToContent.assert_called_with(
+            mock_plugin.getUrlResolver.return_value.resolveToFingerprint.assert_called_with(
                 "someproto://some.host/some/path/file.ext#L1"
             )
             assert (
@@ -245,7 +250,7 @@ class TestProcessFileWithVersioning:
                 side_effect=(lambda proto: url_resolver2 if proto == "proto2" else None)
             )
 
-            url_resolver1.resolveToContent.return_value = (
+            url_resolver1.resolveToFingerprint.return_value = (
                 plugin_registry.contract.IContent(content=b"fakecontent")
             )
 
@@ -263,7 +268,7 @@ class TestProcessFileWithVersioning:
             assert changes_detected
             mock_file.assert_called_with("somefile.xml", "w")
             mock_file.return_value.close.assert_called_with()
-            url_resolver1.resolveToContent.assert_has_calls(
+            url_resolver1.resolveToFingerprint.assert_has_calls(
                 [
                     unittest.mock.call("proto1://some.host/file1.ext#L1"),
                     unittest.mock.call("proto1://some.host/file3.ext#L2"),
@@ -1100,14 +1105,14 @@ class TestProcessFile:
         with mock.patch(
             "builtins.open", mock.mock_open(read_data=file_content)
         ) as mock_file:
-            mock_plugin.getUrlResolver.return_value.resolveToContent.return_value = (
+            mock_plugin.getUrlResolver.return_value.resolveToFingerprint.return_value = (
                 plugin_registry.contract.IContent(b"fakecontent")
             )
             changes_detected = lib.processFile(logger, [mock_plugin], "somefile.xml")
             assert changes_detected
             mock_file.assert_called_with("somefile.xml", "w")
             mock_file.return_value.close.assert_called_with()
-            mock_plugin.getUrlResolver.return_value.resolveToContent.assert_called_with(
+            mock_plugin.getUrlResolver.return_value.resolveToFingerprint.assert_called_with(
                 "someproto://some.host/some/path/file.ext#L1"
             )
         assert (
@@ -1135,7 +1140,7 @@ class TestProcessFile:
         with mock.patch(
             "builtins.open", mock.mock_open(read_data=file_content)
         ) as mock_file:
-            mock_plugin.getUrlResolver.return_value.resolveToContent.return_value = (
+            mock_plugin.getUrlResolver.return_value.resolveToFingerprint.return_value = (
                 plugin_registry.contract.IContent(b"fakecontent")
             )
             changes_detected = lib.processFile(
@@ -1144,7 +1149,7 @@ class TestProcessFile:
             assert changes_detected
             mock_file.assert_called_with("outfile.xml", "w")
             mock_file.return_value.close.assert_called_with()
-            mock_plugin.getUrlResolver.return_value.resolveToContent.assert_called_with(
+            mock_plugin.getUrlResolver.return_value.resolveToFingerprint.assert_called_with(
                 "someproto://some.host/some/path/file.ext#L1"
             )
         assert (
@@ -1175,7 +1180,7 @@ class TestProcessFile:
             with mock.patch(
                 "builtins.open", mock.mock_open(read_data=file_content)
             ) as mock_file:
-                mock_plugin.getUrlResolver.return_value.resolveToContent.return_value = (
+                mock_plugin.getUrlResolver.return_value.resolveToFingerprint.return_value = (
                     None
                 )
                 changes_detected = lib.processFile(
@@ -1184,7 +1189,7 @@ class TestProcessFile:
                 assert not changes_detected
                 mock_file.assert_called_with("somefile.xml", "rb")
                 mock_file.return_value.close.assert_called_with()
-                mock_plugin.getUrlResolver.return_value.resolveToContent.assert_called_with(
+                mock_plugin.getUrlResolver.return_value.resolveToFingerprint.assert_called_with(
                     "someproto://some.host/some/path/file.ext#L1"
                 )
 
@@ -1465,31 +1470,576 @@ class TestMain(unittest.TestCase):
         self, processFile, os_path_exists, pathlib_path, git_repo
     ):
         os_path_exists.return_value = False
-        pathlib_path.return_value.glob.return_value = ["fakefile.txt"]
-        processFile.return_value = True  # Changes detected
-        diffItem = mock.Mock()
-        diffItem.a_path = "difffakefile.txt"
-        git_repo.clone_from.return_value.index.diff.return_value = [diffItem]
+        pathlib_path.return_value.glob.return_value = [
+            "/fake/path/to/local/clone/dir/model/fakefile1.xml",
+            "/fake/path/to/local/clone/dir/model/fakefile2.xml",
+        ]
+        processFile.side_effect = lambda logger, plugins, file: file.endswith(
+            "fakefile2.xml"
+        )  # Changes detected in fakefile2.xml
 
         app.main()
 
         processFile.assert_called_with(
-            unittest.mock.ANY, unittest.mock.ANY, "fakefile.txt"
+            unittest.mock.ANY,
+            unittest.mock.ANY,
+            "/fake/path/to/local/clone/dir/model/fakefile2.xml",
+        )
+        # Stages exactly the files processFile rewrote, without diffing the working tree
+        git_repo.clone_from.return_value.index.diff.assert_not_called()
+        git_repo.clone_from.return_value.index.add.assert_called_once_with(
+            ["model/fakefile2.xml"]
         )
-        git_repo.clone_from.return_value.index.diff.assert_called_once_with(None)
-        git_repo.clone_from.return_value.index.add.assert_called_once()
-        assert list(git_repo.clone_from.return_value.index.add.call_args.args[0]) == [
-            "difffakefile.txt"
-        ]
         git_repo.clone_from.return_value.index.commit.assert_called_with(
             "Report detected changes",
             author=git.Actor("Archi Power Tools Inspector", "some@email.com"),
         )
         git_repo.clone_from.return_value.remotes.origin.push.assert_called_with()
 
+
 @mock.patch(
     "sys.argv",
-    ["program_name", "fake-coarchi-repo-url", "/fake/path/to/local/clone/dir"],
+    [
+        "program_name",
+        "fake-coarchi-repo-url",
+        "/fake/path/to/local/clone/dir",
+        "--depth",
+        "1",
+        "--filter",
+        "blob:none",
+        "--sparse",
+    ],
+)
+@mock.patch("git.Repo")
+@mock.patch("pathlib.Path")
+@mock.patch("os.path.exists")
+class TestMainShallowClone(unittest.TestCase):
+    def test_main_local_clone_does_not_exist(
+        self, os_path_exists, pathlib_path, git_repo
+    ):
+        os_path_exists.return_value = False
+
+        app.main()
+
+        git_repo.clone_from.assert_called_once_with(
+            "fake-coarchi-repo-url",
+            "/fake/path/to/local/clone/dir",
+            depth=1,
+            filter="blob:none",
+            sparse=True,
+        )
+        git_repo.clone_from.return_value.git.sparse_checkout.assert_called_once_with(
+            "set", "model"
+        )
+
+    @mock.patch("plugin_registry.Registry")  # Plugins look for their config files
+    @mock.patch("os.path.isdir")
+    @mock.patch("git.remote.Remote")
+    def test_main_local_clone_exists(
+        self,
+        git_remote_remote,
+        os_path_isdir,
+        registry,
+        os_path_exists,
+        pathlib_path,
+        git_repo,
+    ):
+        os_path_exists.return_value = True
+        os_path_isdir.return_value = True
+        git_repo.return_value.active_branch.name = "main"
+
+        app.main()
+
+        git_repo.clone_from.assert_not_called()
+        git_remote_remote.return_value.pull.assert_not_called()
+        git_repo.return_value.remotes.origin.fetch.assert_called_once_with(depth=1)
+        git_repo.return_value.head.reset.assert_called_once_with(
+            "origin/main", index=True, working_tree=True
+        )
+
+
+@mock.patch(
+    "sys.argv",
+    [
+        "program_name",
+        "fake-coarchi-repo-url",
+        "/fake/path/to/local/clone/dir",
+        "--workers",
+        "4",
+    ],
+)
+@mock.patch("git.Repo")
+@mock.patch("pathlib.Path")
+@mock.patch("os.path.exists")
+class TestMainWorkers(unittest.TestCase):
+    @mock.patch("lib.processFile")
+    def test_main_workers(self, processFile, os_path_exists, pathlib_path, git_repo):
+        os_path_exists.return_value = False
+        files = [f"fakefile{i}.txt" for i in range(10)]
+        pathlib_path.return_value.glob.return_value = reversed(files)
+        processFile.side_effect = lambda logger, plugins, file: file == "fakefile7.txt"
+
+        app.main()
+
+        assert sorted(call.args[2] for call in processFile.call_args_list) == files
+        git_repo.clone_from.return_value.index.commit.assert_called_once()
+
+    @mock.patch("lib.processFile")
+    def test_main_workers_no_changes_detected(
+        self, processFile, os_path_exists, pathlib_path, git_repo
+    ):
+        os_path_exists.return_value = False
+        pathlib_path.return_value.glob.return_value = ["fakefile1.txt", "fakefile2.txt"]
+        processFile.return_value = False
+
+        app.main()
+
+        assert processFile.call_count == 2
+        git_repo.clone_from.return_value.index.commit.assert_not_called()
+
+
+@mock.patch("git.Repo")
+@mock.patch("pathlib.Path")
+@mock.patch("os.path.exists")
+class TestMainShard(unittest.TestCase):
+    @mock.patch(
+        "sys.argv",
+        [
+            "program_name",
+            "fake-coarchi-repo-url",
+            "/fake/path/to/local/clone/dir",
+            "--shard",
+            "1/2",
+            "--shard-output",
+            "/fake/shard/output",
+        ],
+    )
+    @mock.patch("lib.writeShardOutput")
+    @mock.patch("lib.shardPlan")
+    @mock.patch("lib.planFiles")
+    @mock.patch("lib.processFile")
+    def test_main_shard(
+        self,
+        processFile,
+        planFiles,
+        shardPlan,
+        writeShardOutput,
+        os_path_exists,
+        pathlib_path,
+        git_repo,
+    ):
+        os_path_exists.return_value = False
+        pathlib_path.return_value.glob.return_value = [
+            "/fake/path/to/local/clone/dir/model/fakefile1.xml",
+            "/fake/path/to/local/clone/dir/model/fakefile2.xml",
+        ]
+        shardPlan.return_value = (
+            ["/fake/path/to/local/clone/dir/model/fakefile2.xml"],
+            lib.Plan(),
+        )
+        processFile.return_value = True
+
+        app.main()
+
+        shardPlan.assert_called_once_with(
+            planFiles.return_value, "/fake/path/to/local/clone/dir", 1, 2
+        )
+        processFile.assert_called_once_with(
+            unittest.mock.ANY,
+            unittest.mock.ANY,
+            "/fake/path/to/local/clone/dir/model/fakefile2.xml",
+        )
+        writeShardOutput.assert_called_once_with(
+            unittest.mock.ANY,
+            "/fake/shard/output",
+            1,
+            2,
+            "/fake/path/to/local/clone/dir",
+            ["model/fakefile2.xml"],
+            0,
+            git_repo.clone_from.return_value.head.commit.hexsha,
+        )
+        git_repo.clone_from.return_value.index.commit.assert_not_called()
+
+    @mock.patch(
+        "sys.argv",
+        [
+            "program_name",
+            "fake-coarchi-repo-url",
+            "/fake/path/to/local/clone/dir",
+            "--merge-shards",
+            "2",
+            "--shard-output",
+            "/fake/shard/output",
+        ],
+    )
+    @mock.patch("lib.mergeShardOutputs")
+    @mock.patch("lib.processFile")
+    def test_main_merge_shards(
+        self, processFile, mergeShardOutputs, os_path_exists, pathlib_path, git_repo
+    ):
+        os_path_exists.return_value = False
+        mergeShardOutputs.return_value = ["model/fakefile1.xml"]
+
+        app.main()
+
+        mergeShardOutputs.assert_called_once_with(
+            unittest.mock.ANY,
+            "/fake/shard/output",
+            2,
+            "/fake/path/to/local/clone/dir",
+            git_repo.clone_from.return_value.head.commit.hexsha,
+        )
+        processFile.assert_not_called()
+        git_repo.clone_from.return_value.index.add.assert_called_once_with(
+            ["model/fakefile1.xml"]
+        )
+        git_repo.clone_from.return_value.index.commit.assert_called_once()
+        git_repo.clone_from.return_value.remotes.origin.push.assert_called_once()
+
+    @mock.patch(
+        "sys.argv",
+        [
+            "program_name",
+            "fake-coarchi-repo-url",
+            "/fake/path/to/local/clone/dir",
+            "--shard",
+            "1/2",
+        ],
+    )
+    def test_main_shard_no_output(self, os_path_exists, pathlib_path, git_repo):
+        with pytest.raises(SystemExit):
+            app.main()
+
+
+@mock.patch("git.Repo")
+@mock.patch("pathlib.Path")
+@mock.patch("os.path.exists")
+class TestMainReport(unittest.TestCase):
+    @mock.patch("lib.processFile")
+    def test_main_report(self, processFile, os_path_exists, pathlib_path, git_repo):
+        os_path_exists.return_value = False
+        pathlib_path.return_value.glob.return_value = [
+            "/fake/path/to/local/clone/dir/model/fakefile.xml"
+        ]
+        # Plugins are loaded by the schemes which the model uses
+        processFile.side_effect = lambda logger, plugins, file: (
+            plugin_registry.getUrlResolver(plugins, "https") is not None
+        )
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            with mock.patch(
+                "sys.argv",
+                [
+                    "program_name",
+                    "fake-coarchi-repo-url",
+                    "/fake/path/to/local/clone/dir",
+                    "--report",
+                    f"{tmp_dir}/report.json",
+                    "--prometheus-textfile",
+                    f"{tmp_dir}/inspector.prom",
+                    "--trace",
+                    f"{tmp_dir}/trace.json",
+                ],
+            ):
+                app.main()
+
+            with open(f"{tmp_dir}/report.json") as f:
+                report = json.load(f)
+            with open(f"{tmp_dir}/inspector.prom") as f:
+                assert "pwrt_inspector_stage_seconds" in f.read()
+            with open(f"{tmp_dir}/trace.json") as f:
+                assert "traceEvents" in json.load(f)
+
+        assert list(report["stages"]) == [
+            "clone",
+            "discover",
+            "process",
+            "commit",
+            "push",
+        ]
+        assert "plugins.https.handler" in report["url_resolvers"]
+
+
+@mock.patch("git.Repo")
+@mock.patch("pathlib.Path")
+@mock.patch("os.path.exists")
+class TestMainProfile(unittest.TestCase):
+    def test_main_profile(self, os_path_exists, pathlib_path, git_repo):
+        os_path_exists.return_value = False
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            file_name = f"{tmp_dir}/model/a.xml"
+            os.makedirs(f"{tmp_dir}/model")
+            with open(file_name, "w") as f:
+                f.write(
+                    '<root><properties key="pwrt:inspector:value-deps" value="unknown://some.host/file.ext"/></root>'
+                )
+            pathlib_path.return_value.glob.return_value = [file_name]
+            with mock.patch(
+                "sys.argv",
+                [
+                    "program_name",
+                    "fake-coarchi-repo-url",
+                    "/fake/path/to/local/clone/dir",
+                    "--prefetch",
+                    "--profile",
+                    f"{tmp_dir}/profile.pstats",
+                ],
+            ):
+                app.main()
+
+            stats = pstats.Stats(f"{tmp_dir}/profile.pstats")
+
+        # Files are processed on the profiled thread
+        assert any(function == "_processFile" for _, _, function in stats.stats)
+
+
+class StopDaemon(Exception):
+    pass
+
+
+@mock.patch(
+    "sys.argv",
+    [
+        "program_name",
+        "fake-coarchi-repo-url",
+        "/fake/path/to/local/clone/dir",
+        "--daemon",
+        "--interval",
+        "600",
+        "--cache-ttl",
+        "1200",
+        "--scheme-cache-ttl",
+        "https=60",
+    ],
+)
+@mock.patch("git.Repo")
+@mock.patch("pathlib.Path")
+@mock.patch("os.path.exists")
+class TestMainDaemon(unittest.TestCase):
+    @mock.patch("time.sleep")
+    @mock.patch("lib.processFile")
+    @mock.patch("plugin_registry.Registry")
+    def test_main_daemon(
+        self, registry, processFile, sleep, os_path_exists, pathlib_path, git_repo
+    ):
+        os_path_exists.return_value = False
+        pathlib_path.return_value.glob.return_value = ["fakefile.txt"]
+        git_repo.clone_from.side_effect = [Exception(), mock.DEFAULT, mock.DEFAULT]
+        processFile.return_value = False
+        sleep.side_effect = [None, None, StopDaemon()]
+        https_url_resolver = mock.Mock()
+        https_url_resolver.evictExpired.return_value = 1
+        other_url_resolver = mock.Mock()
+        other_url_resolver.evictExpired.return_value = 0
+        https_plugin = mock.Mock()
+        https_plugin.getUrlResolver.side_effect = lambda scheme: (
+            https_url_resolver if scheme == "https" else None
+        )
+        https_plugin.getUrlResolvers.return_value = [https_url_resolver]
+        other_plugin = mock.Mock()
+        other_plugin.getUrlResolvers.return_value = [other_url_resolver]
+        registry.return_value.loadPluginsLazily.return_value = [
+            https_plugin,
+            other_plugin,
+        ]
+
+        with self.assertRaises(StopDaemon):
+            app.main()
+
+        # A failed cycle does not stop the daemon
+        assert git_repo.clone_from.call_count == 3
+        assert processFile.call_count == 2
+        sleep.assert_called_with(600)
+        other_url_resolver.setCacheTtl.assert_called_once_with(1200)
+        https_url_resolver.setCacheTtl.assert_has_calls(
+            [mock.call(1200), mock.call(60)]
+        )
+        assert https_url_resolver.evictExpired.call_count == 3
+        # The cache stats of the report are of the cycle
+        assert https_url_resolver.resetCacheStats.call_count == 3
+
+
+@mock.patch(
+    "sys.argv",
+    [
+        "program_name",
+        "fake-coarchi-repo-url",
+        "/fake/path/to/local/clone/dir",
+        "--exclude",
+        "model/diagrams/*",
+    ],
+)
+@mock.patch("git.Repo")
+@mock.patch("pathlib.Path")
+@mock.patch("os.path.exists")
+class TestMainPrefilter(unittest.TestCase):
+    @mock.patch("lib.processFile")
+    @mock.patch("lib.prefilter.hasInspectorProperties")
+    def test_main_prefilter(
+        self,
+        hasInspectorProperties,
+        processFile,
+        os_path_exists,
+        pathlib_path,
+        git_repo,
+    ):
+        os_path_exists.return_value = False
+        pathlib_path.return_value.glob.return_value = [
+            "/fake/path/to/local/clone/dir/model/business/a.xml",
+            "/fake/path/to/local/clone/dir/model/business/b.xml",
+            "/fake/path/to/local/clone/dir/model/diagrams/c.xml",
+        ]
+        hasInspectorProperties.side_effect = lambda file: file.endswith("a.xml")
+        processFile.return_value = False
+
+        app.main()
+
+        processFile.assert_called_once_with(
+            unittest.mock.ANY,
+            unittest.mock.ANY,
+            "/fake/path/to/local/clone/dir/model/business/a.xml",
+        )
+
+
+@mock.patch(
+    "sys.argv",
+    [
+        "program_name",
+        "fake-coarchi-repo-url",
+        "/fake/path/to/local/clone/dir",
+        "--inventory",
+        "--prefetch",
+    ],
+)
+@mock.patch("git.Repo")
+@mock.patch("pathlib.Path")
+@mock.patch("os.path.exists")
+class TestMainInventory(unittest.TestCase):
+    @mock.patch("lib.processFile")
+    @mock.patch("lib.resolvePlan")
+    @mock.patch("lib.planFiles")
+    @mock.patch("lib.discoverFiles")
+    @mock.patch("lib.Inventory")
+    def test_main_inventory(
+        self,
+        Inventory,
+        discoverFiles,
+        planFiles,
+        resolvePlan,
+        processFile,
+        os_path_exists,
+        pathlib_path,
+        git_repo,
+    ):
+        os_path_exists.return_value = False
+        plan = lib.Plan()
+        discoverFiles.return_value = (["fakefile1.txt"], lib.PrefilterStats(), plan)
+        processFile.return_value = False
+
+        app.main()
+
+        pathlib_path.return_value.glob.assert_not_called()
+        planFiles.assert_not_called()
+        resolvePlan.assert_called_once_with(
+            unittest.mock.ANY, unittest.mock.ANY, plan, workers=1, deadline=None
+        )
+        processFile.assert_called_once_with(
+            unittest.mock.ANY, unittest.mock.ANY, "fakefile1.txt"
+        )
+        Inventory.return_value.close.assert_called_once()
+
+
+@mock.patch(
+    "sys.argv",
+    [
+        "program_name",
+        "fake-coarchi-repo-url",
+        "/fake/path/to/local/clone/dir",
+        "--prefetch",
+        "--workers",
+        "2",
+    ],
+)
+@mock.patch("git.Repo")
+@mock.patch("pathlib.Path")
+@mock.patch("os.path.exists")
+class TestMainPrefetch(unittest.TestCase):
+    @mock.patch("lib.processFile")
+    @mock.patch("lib.resolvePlan")
+    @mock.patch("lib.planFiles")
+    def test_main_prefetch(
+        self, planFiles, resolvePlan, processFile, os_path_exists, pathlib_path, git_repo
+    ):
+        os_path_exists.return_value = False
+        pathlib_path.return_value.glob.return_value = ["fakefile2.txt", "fakefile1.txt"]
+        processFile.return_value = False
+
+        app.main()
+
+        planFiles.assert_called_once_with(
+            unittest.mock.ANY, ["fakefile1.txt", "fakefile2.txt"]
+        )
+        resolvePlan.assert_called_once_with(
+            unittest.mock.ANY, unittest.mock.ANY, planFiles.return_value, workers=2, deadline=None
+        )
+        assert processFile.call_count == 2
+
+
+@mock.patch(
+    "sys.argv",
+    [
+        "program_name",
+        "fake-coarchi-repo-url",
+        "/fake/path/to/local/clone/dir",
+        "--async",
+    ],
+)
+@mock.patch("git.Repo")
+@mock.patch("pathlib.Path")
+@mock.patch("os.path.exists")
+class TestMainAsync(unittest.TestCase):
+    @mock.patch("lib.processFile")
+    @mock.patch("lib.resolvePlanAsync")
+    @mock.patch("lib.resolvePlan")
+    @mock.patch("lib.planFiles")
+    def test_main_async(
+        self,
+        planFiles,
+        resolvePlan,
+        resolvePlanAsync,
+        processFile,
+        os_path_exists,
+        pathlib_path,
+        git_repo,
+    ):
+        os_path_exists.return_value = False
+        pathlib_path.return_value.glob.return_value = ["fakefile1.txt"]
+        processFile.return_value = False
+
+        app.main()
+
+        resolvePlan.assert_not_called()
+        resolvePlanAsync.assert_awaited_once_with(
+            unittest.mock.ANY,
+            unittest.mock.ANY,
+            planFiles.return_value,
+            concurrency=100,
+            deadline=None,
+        )
+        processFile.assert_called_once()
+
+
+@mock.patch(
+    "sys.argv",
+    [
+        "program_name",
+        "fake-coarchi-repo-url",
+        "/fake/path/to/local/clone/dir",
+        "--retry-backoff",
+        "0",
+    ],
 )
 @mock.patch("git.Repo")
 @mock.patch("os.path.exists")
@@ -1497,9 +2047,8 @@ class TestMain2(unittest.TestCase):
 
     @mock.patch("lib.processFile")
     @mock.patch("pathlib.Path.glob")
-    @mock.patch("time.sleep")
     def test_main_exception_in_process_file(
-        self, sleep, glob, processFile, os_path_exists, git_repo
+        self, glob, processFile, os_path_exists, git_repo
     ):
         os_path_exists.return_value = False
         glob.return_value = ["fakefile.txt"]
@@ -1508,9 +2057,193 @@ class TestMain2(unittest.TestCase):
         with self.assertRaises(Exception) as context:
             app.main() # Expected to throw exception
 
-        sleep.assert_any_call(60)
-        sleep.assert_any_call(120)
-        sleep.assert_any_call(240)
-        sleep.assert_any_call(480)
-        sleep.assert_any_call(960)
-        sleep.assert_any_call(1920)
+        assert processFile.call_count == 7  # The first attempt and 6 retries
+        git_repo.clone_from.return_value.index.commit.assert_not_called()
+
+    @mock.patch("lib.processFile")
+    @mock.patch("pathlib.Path.glob")
+    def test_main_exception_in_process_file_retried(
+        self, glob, processFile, os_path_exists, git_repo
+    ):
+        os_path_exists.return_value = False
+        glob.return_value = ["fakefile1.txt", "fakefile2.txt"]
+        failed = set()
+
+        def processFileSideEffect(logger, plugins, file):
+            if file == "fakefile1.txt" and file not in failed:
+                failed.add(file)
+                raise Exception()
+            return True
+
+        processFile.side_effect = processFileSideEffect
+
+        app.main()
+
+        assert [call.args[2] for call in processFile.call_args_list] == [
+            "fakefile1.txt",
+            "fakefile2.txt",
+            "fakefile1.txt",
+        ]
+        git_repo.clone_from.return_value.index.commit.assert_called_once()
+
+
+@mock.patch(
+    "sys.argv",
+    [
+        "program_name",
+        "fake-coarchi-repo-url",
+        "/fake/path/to/local/clone/dir",
+        "--plan",
+    ],
+)
+@mock.patch("plugin_registry.Registry")
+@mock.patch("git.Repo")
+@mock.patch("pathlib.Path")
+@mock.patch("os.path.exists")
+class TestMainPlan(unittest.TestCase):
+    @mock.patch("lib.processFile")
+    @mock.patch("lib.estimateWorkload")
+    @mock.patch("lib.planFiles")
+    @mock.patch("lib.prefilter.hasInspectorProperties")
+    def test_main_plan(
+        self,
+        hasInspectorProperties,
+        planFiles,
+        estimateWorkload,
+        processFile,
+        os_path_exists,
+        pathlib_path,
+        git_repo,
+        registry,
+    ):
+        os_path_exists.return_value = True
+        pathlib_path.return_value.glob.return_value = [
+            "/fake/path/to/local/clone/dir/model/a.xml"
+        ]
+        hasInspectorProperties.return_value = True
+        estimateWorkload.return_value = {
+            "files": 1,
+            "urls": 2,
+            "unresolvable_urls": 0,
+            "urls_by_scheme": {"https": 2},
+            "urls_by_host": {"https://some.host": 2},
+            "urls_by_group": {},
+            "calls": {"HTTP GETs": 2},
+        }
+
+        with mock.patch("builtins.print") as mock_print:
+            app.main()
+
+        planFiles.assert_called_once_with(
+            unittest.mock.ANY, ["/fake/path/to/local/clone/dir/model/a.xml"]
+        )
+        mock_print.assert_any_call("Distinct dependency URLs: 2")
+        mock_print.assert_any_call(f"  {2:8} https://some.host")
+        processFile.assert_not_called()
+        git_repo.clone_from.assert_not_called()
+        git_repo.return_value.remotes.origin.pull.assert_not_called()
+        git_repo.return_value.remotes.origin.fetch.assert_not_called()
+
+    def test_main_plan_no_clone(
+        self, os_path_exists, pathlib_path, git_repo, registry
+    ):
+        os_path_exists.return_value = False
+        with self.assertRaises(Exception):
+            app.main()
+        git_repo.clone_from.assert_not_called()
+
+
+@mock.patch(
+    "sys.argv",
+    [
+        "program_name",
+        "fake-coarchi-repo-url",
+        "/fake/path/to/local/clone/dir",
+        "--deadline",
+        "0.2",
+        "--call-timeout",
+        "30",
+        "--scheme-call-timeout",
+        "gitlab=600",
+    ],
+)
+@mock.patch("plugin_registry.Registry")
+@mock.patch("git.Repo")
+@mock.patch("pathlib.Path")
+@mock.patch("os.path.exists")
+class TestMainDeadline(unittest.TestCase):
+    @mock.patch("lib.processFile")
+    def test_main_deadline(
+        self, processFile, os_path_exists, pathlib_path, git_repo, registry
+    ):
+        os_path_exists.return_value = False
+        pathlib_path.return_value.glob.return_value = [
+            "/fake/path/to/local/clone/dir/model/a.xml",
+            "/fake/path/to/local/clone/dir/model/b.xml",
+            "/fake/path/to/local/clone/dir/model/c.xml",
+        ]
+        url_resolver = mock.MagicMock()
+        plugin = mock.MagicMock()
+        registry.return_value.loadPluginsLazily.return_value = [plugin]
+        plugin.getUrlResolvers.return_value = [url_resolver]
+        plugin.getUrlResolver.return_value = url_resolver
+
+        def processFileSideEffect(logger, plugins, file):
+            time.sleep(0.3)  # Past the deadline
+            return True
+
+        processFile.side_effect = processFileSideEffect
+
+        with mock.patch("lib.prefilter.hasInspectorProperties", return_value=True):
+            app.main()
+
+        # The default worker processes the first file, the others are not started
+        processFile.assert_called_once()
+        git_repo.clone_from.return_value.index.add.assert_called_once_with(
+            ["model/a.xml"]
+        )
+        git_repo.clone_from.return_value.index.commit.assert_called_once()
+        assert url_resolver.setCallTimeout.call_args_list == [
+            mock.call(30),
+            mock.call(600),
+        ]
+
+
+@mock.patch("plugin_registry.Registry")
+@mock.patch("git.Repo")
+@mock.patch("pathlib.Path")
+class TestMainCacheDb(unittest.TestCase):
+    @mock.patch("lib.processFile")
+    def test_main_cache_db(self, processFile, pathlib_path, git_repo, registry):
+        pathlib_path.return_value.glob.return_value = []
+        url_resolver = mock.MagicMock()
+        https_url_resolver = mock.MagicMock()
+        plugin = mock.MagicMock()
+        plugin.getUrlResolvers.return_value = [url_resolver, https_url_resolver]
+        plugin.getUrlResolver.side_effect = lambda scheme: (
+            https_url_resolver if scheme == "https" else None
+        )
+        registry.return_value.loadPluginsLazily.return_value = [plugin]
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            with mock.patch(
+                "sys.argv",
+                [
+                    "program_name",
+                    "fake-coarchi-repo-url",
+                    f"{tmp_dir}/clone",
+                    "--cache-db",
+                    f"{tmp_dir}/cache.sqlite",
+                    "--scheme-cache-db-ttl",
+                    "https=60",
+                ],
+            ):
+                app.main()
+
+        persistent_cache = url_resolver.setPersistentCache.call_args.args[0]
+        assert isinstance(persistent_cache, plugin_registry.PersistentCache)
+        url_resolver.setPersistentCache.assert_called_once_with(persistent_cache, 3600)
+        assert https_url_resolver.setPersistentCache.call_args_list == [
+            mock.call(persistent_cache, 3600),
+            mock.call(persistent_cache, 60),
+        ]
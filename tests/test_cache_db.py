@@ -0,0 +1,34 @@
+import cache_db
+import plugin_registry
+
+from unittest import mock
+
+
+def runCacheDb(*args):
+    with mock.patch("sys.argv", ["program_name", *args]), mock.patch(
+        "builtins.print"
+    ) as mock_print:
+        cache_db.main()
+    return [call.args[0] for call in mock_print.call_args_list]
+
+
+def test_main(tmp_path):
+    file_name = str(tmp_path / "cache.sqlite")
+    persistent_cache = plugin_registry.PersistentCache(file_name)
+    persistent_cache.put(
+        "plugins.https.handler:content", "https://some.host/a", "A", ttl=None
+    )
+    persistent_cache.put(
+        "plugins.https.handler:content", "https://some.host/b", "B", ttl=60
+    )
+    persistent_cache.close()
+
+    [line] = runCacheDb(file_name, "stats")
+    assert line.startswith("plugins.https.handler:content: 2 entries, 0 expired, ")
+
+    [line] = runCacheDb(file_name, "list", "--key-prefix", "https://some.host/b")
+    assert line.startswith("plugins.https.handler:content https://some.host/b ")
+
+    assert runCacheDb(
+        file_name, "purge", "--namespace", "plugins.https.handler:content"
+    ) == ["Purged 2 entries"]
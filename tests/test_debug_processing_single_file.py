@@ -1,5 +1,8 @@
 import debug_processing_single_file
+import lib
 
+import pstats
+import tempfile
 import unittest
 from unittest import mock
 
@@ -59,3 +62,22 @@ class TestMain(unittest.TestCase):
 ?                                                                       ^^^
                       </root>"""
             )
+
+    @mock.patch("lib.processFile")
+    def test_main_profile(self, processFile):
+        processFile.return_value = False
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            with mock.patch(
+                "sys.argv",
+                [
+                    "program_name",
+                    "fake-file.xml",
+                    "--profile",
+                    f"{tmp_dir}/profile.pstats",
+                    "--profile-memory",
+                ],
+            ):
+                debug_processing_single_file.main()
+            stats = pstats.Stats(f"{tmp_dir}/profile.pstats")
+        assert stats.total_calls > 0
+        assert "plugin_load" in lib.getMemoryPeaks().peaks
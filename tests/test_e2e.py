@@ -17,7 +17,7 @@ def plugins():
         ).loadPlugins()
         return [P(logger) for P in plugins]
 
-@mock.patch("requests.get")
+@mock.patch("requests.Session.get")
 class TestPlugins:
     def test_https_value_ref(self, get, plugins):
 
@@ -28,9 +28,32 @@ class TestPlugins:
             </root>
         """
         get.return_value.status_code = 200
-        get.return_value.text = '{"some_attr":"some value"}'
+        get.return_value.iter_content.return_value = [b'{"some_attr":"some value"}']
 
         with mock.patch(
             "builtins.open", mock.mock_open(read_data=file_content)
         ) as mock_file:
             lib.processFile(logging.getLogger("test"), plugins, "somefile.xml")
+
+    def test_https_prefetch(self, get, plugins):
+        url_resolver = plugin_registry.getUrlResolver(plugins=plugins, scheme="https")
+        url_resolver._cache = {}  # Clear the resolver's cache.
+
+        file_content = """
+            <root>
+                <properties key="pwrt:inspector:value-deps" value="https://some.host.com/api/v1/some/path"/>
+            </root>
+        """
+        get.return_value.status_code = 200
+        get.return_value.iter_content.return_value = [b'{"some_attr":"some value"}']
+
+        logger = logging.getLogger("test")
+        with mock.patch("builtins.open", mock.mock_open(read_data=file_content)):
+            plan = lib.planFiles(logger, ["somefile1.xml", "somefile2.xml"])
+            lib.resolvePlan(logger, plugins, plan, workers=2)
+            get.assert_called_once()
+
+            lib.processFile(logger, plugins, "somefile1.xml")
+            lib.processFile(logger, plugins, "somefile2.xml")
+
+        get.assert_called_once()
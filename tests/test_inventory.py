@@ -0,0 +1,134 @@
+import lib
+import git
+import logging
+import os
+import pytest
+from unittest import mock
+
+
+@pytest.fixture
+def logger():
+    return logging.getLogger("test")
+
+
+@pytest.fixture
+def repo(tmp_path):
+    repo = git.Repo.init(tmp_path)
+    (tmp_path / "model" / "diagrams").mkdir(parents=True)
+    (tmp_path / "model" / "a.xml").write_text(
+        '<root><properties key="pwrt:inspector:value-ref" value="someproto://some.host/file.ext#L1"/></root>'
+    )
+    (tmp_path / "model" / "b.xml").write_text("<root/>")
+    (tmp_path / "model" / "diagrams" / "c.xml").write_text(
+        '<root><properties key="pwrt:inspector:value-ref" value="someproto://some.host/other.ext#L1"/></root>'
+    )
+    (tmp_path / "README.md").write_text("pwrt:inspector:")
+    repo.index.add(["model/a.xml", "model/b.xml", "model/diagrams/c.xml", "README.md"])
+    return repo
+
+
+def test_Inventory(tmp_path):
+    inventory = lib.Inventory(str(tmp_path / "inventory.sqlite"))
+    assert inventory.get("a1b2c3") is None
+    inventory.put(
+        "a1b2c3",
+        True,
+        ["someproto://some.host/file.ext#L1", "someproto://some.host/ref.ext#L1"],
+        ["someproto://some.host/ref.ext#L1"],
+    )
+    inventory.put("d4e5f6", False, [], [])
+    inventory.commit()
+    inventory.close()
+
+    inventory = lib.Inventory(str(tmp_path / "inventory.sqlite"))
+    assert inventory.get("a1b2c3") == (
+        True,
+        ["someproto://some.host/file.ext#L1", "someproto://some.host/ref.ext#L1"],
+        ["someproto://some.host/ref.ext#L1"],
+    )
+    assert inventory.get("d4e5f6") == (False, [], [])
+
+
+def test_Inventory_urls_list(tmp_path):
+    # Entries of inventories which predate content URLs
+    inventory = lib.Inventory(str(tmp_path / "inventory.sqlite"))
+    inventory._connection.execute(
+        "INSERT INTO blobs VALUES (?, ?, ?)",
+        ("a1b2c3", 1, '["someproto://some.host/file.ext#L1"]'),
+    )
+    assert inventory.get("a1b2c3") == (
+        True,
+        ["someproto://some.host/file.ext#L1"],
+        ["someproto://some.host/file.ext#L1"],
+    )
+
+
+def test_discoverFiles(repo, logger):
+    inventory = lib.Inventory(lib.inventoryFileName(repo))
+
+    files, stats, plan = lib.discoverFiles(
+        logger, repo, inventory, exclude=["model/diagrams/*"]
+    )
+
+    a_xml = f"{repo.working_tree_dir}/model/a.xml"
+    assert files == [a_xml]
+    assert (stats.total, stats.excluded, stats.without_inspector_properties) == (
+        3,
+        1,
+        1,
+    )
+    assert plan.files == {a_xml: ["someproto://some.host/file.ext#L1"]}
+
+    with mock.patch("lib.inventory.planFile") as planFile, mock.patch(
+        "lib.inventory.hasInspectorProperties"
+    ) as hasInspectorProperties:
+        files, stats, plan = lib.discoverFiles(
+            logger, repo, inventory, exclude=["model/diagrams/*"]
+        )
+        planFile.assert_not_called()
+        hasInspectorProperties.assert_not_called()
+
+    assert files == [a_xml]
+    assert plan.files == {a_xml: ["someproto://some.host/file.ext#L1"]}
+
+
+def test_discoverFiles_changed_blob(repo, logger):
+    inventory = lib.Inventory(lib.inventoryFileName(repo))
+    lib.discoverFiles(logger, repo, inventory)
+
+    b_xml = f"{repo.working_tree_dir}/model/b.xml"
+    with open(b_xml, "w") as f:
+        f.write('<root><properties key="pwrt:inspector:value-deps" value="someproto://some.host/x"/></root>')
+    repo.index.add(["model/b.xml"])
+
+    files, stats, plan = lib.discoverFiles(logger, repo, inventory)
+
+    assert b_xml in files
+    assert plan.files[b_xml] == ["someproto://some.host/x"]
+
+
+def test_discoverFiles_working_tree(repo, logger):
+    inventory = lib.Inventory(lib.inventoryFileName(repo))
+    lib.discoverFiles(logger, repo, inventory)
+
+    # Changed, added and deleted, not staged
+    b_xml = f"{repo.working_tree_dir}/model/b.xml"
+    with open(b_xml, "w") as f:
+        f.write('<root><properties key="pwrt:inspector:value-deps" value="someproto://some.host/x"/></root>')
+    d_xml = f"{repo.working_tree_dir}/model/d.xml"
+    with open(d_xml, "w") as f:
+        f.write('<root><properties key="pwrt:inspector:value-deps" value="someproto://some.host/y"/></root>')
+    c_xml = f"{repo.working_tree_dir}/model/diagrams/c.xml"
+    os.remove(c_xml)
+
+    files, stats, plan = lib.discoverFiles(logger, repo, inventory)
+
+    a_xml = f"{repo.working_tree_dir}/model/a.xml"
+    assert files == [a_xml, b_xml, d_xml]
+    assert stats.total == 3
+    assert plan.files[b_xml] == ["someproto://some.host/x"]
+    assert plan.files[d_xml] == ["someproto://some.host/y"]
+    # Keyed by the blob SHAs of the working tree files, as git would stage them
+    assert inventory.get(repo.git.hash_object("model/b.xml"))[1] == [
+        "someproto://some.host/x"
+    ]
@@ -0,0 +1,66 @@
+import plugin_registry
+import os
+import pytest
+import stat
+from unittest import mock
+
+
+@pytest.fixture
+def persistent_cache(tmp_path):
+    persistent_cache = plugin_registry.PersistentCache(str(tmp_path / "cache.sqlite"))
+    yield persistent_cache
+    persistent_cache.close()
+
+
+def test_get_put(persistent_cache):
+    assert persistent_cache.get("ns", "key") == (False, None)
+    value = plugin_registry.contract.IContent(content=b"some content" * 100)
+    persistent_cache.put("ns", "key", value, ttl=None)
+
+    found, cached = persistent_cache.get("ns", "key")
+    assert found
+    assert cached.content == value.content
+    assert persistent_cache.get("other ns", "key") == (False, None)
+
+
+def test_file_readable_by_owner_only(tmp_path):
+    file_name = str(tmp_path / "cache.sqlite")
+    plugin_registry.PersistentCache(file_name).close()
+    assert stat.S_IMODE(os.stat(file_name).st_mode) == 0o600
+
+
+@mock.patch("time.time")
+def test_expiry(time, persistent_cache):
+    time.return_value = 1000
+    persistent_cache.put("ns", "expiring", "A", ttl=60)
+    persistent_cache.put("ns", "forever", "B", ttl=None)
+
+    time.return_value = 1059
+    assert persistent_cache.get("ns", "expiring") == (True, "A")
+    time.return_value = 1060
+    assert persistent_cache.get("ns", "expiring") == (False, None)
+    assert persistent_cache.get("ns", "forever") == (True, "B")
+
+    assert persistent_cache.stats() == [
+        {"namespace": "ns", "entries": 2, "expired": 1, "bytes": mock.ANY}
+    ]
+    assert persistent_cache.purge(expired_only=True) == 1
+    assert [entry["key"] for entry in persistent_cache.entries()] == ["forever"]
+
+
+def test_entries_purge(persistent_cache):
+    persistent_cache.put("ns1", "secretsmanager@/a", "A", ttl=None)
+    persistent_cache.put("ns1", "ssm@/b", "B", ttl=None)
+    persistent_cache.put("ns2", "secretsmanager@/c", "C", ttl=None)
+
+    assert [
+        entry["key"] for entry in persistent_cache.entries(key_prefix="secretsmanager@")
+    ] == ["secretsmanager@/a", "secretsmanager@/c"]
+    assert [entry["key"] for entry in persistent_cache.entries(namespace="ns1")] == [
+        "secretsmanager@/a",
+        "ssm@/b",
+    ]
+
+    assert persistent_cache.purge(namespace="ns1", key_prefix="secretsmanager@") == 1
+    assert persistent_cache.purge() == 2
+    assert persistent_cache.entries() == []
@@ -0,0 +1,218 @@
+import lib
+import asyncio
+import logging
+import pytest
+import time
+import unittest
+from unittest import mock
+
+
+@pytest.fixture
+def logger():
+    return logging.getLogger("test")
+
+
+@pytest.fixture
+def mock_plugin():
+    mock_plugin = mock.MagicMock()
+    mock_plugin.getUrlResolver.return_value.isVersioningSupported = True
+    return mock_plugin
+
+
+def test_planFile():
+    file_content = """
+        <root>
+            <properties key="pwrt:inspector:value-deps" value="someproto://some.host/file1.ext@a1b2c3d4#L1;someproto://other.host/file2.ext#L2"/>
+            <properties key="pwrt:inspector:value-ref" value="someproto://some.host/file3.ext#L3"/>
+            <properties key="pwrt:inspector:value-regexp" value="(.*)"/>
+        </root>
+    """
+    with mock.patch("builtins.open", mock.mock_open(read_data=file_content)):
+        assert lib.planFile("somefile.xml") == (
+            [
+                "someproto://some.host/file1.ext@a1b2c3d4#L1",
+                "someproto://other.host/file2.ext#L2",
+                "someproto://some.host/file3.ext#L3",
+            ],
+            ["someproto://some.host/file3.ext#L3"],
+        )
+
+
+def test_planFile_non_reviewed():
+    file_content = """
+        <root>
+            <properties key="pwrt:inspector:value-deps" value="someproto://some.host/file1.ext#L1"/>
+            <properties key="pwrt:inspector:value-requires-reviewing" value="true"/>
+        </root>
+    """
+    with mock.patch("builtins.open", mock.mock_open(read_data=file_content)):
+        assert lib.planFile("somefile.xml") == ([], [])
+
+
+def test_planFiles_deduplicates(logger):
+    with mock.patch("lib.plan.planFile") as planFile:
+        planFile.side_effect = lambda file_name: {
+            "file1.xml": (["someproto://some.host/a", "someproto://some.host/b"], []),
+            "file2.xml": (
+                ["someproto://some.host/b", "someproto://other.host/c"],
+                ["someproto://other.host/c"],
+            ),
+        }[file_name]
+        plan = lib.planFiles(logger, ["file1.xml", "file2.xml"])
+
+    assert list(plan.urls) == [
+        "someproto://some.host/a",
+        "someproto://some.host/b",
+        "someproto://other.host/c",
+    ]
+    assert plan.files["file2.xml"] == [
+        "someproto://some.host/b",
+        "someproto://other.host/c",
+    ]
+    assert list(plan.content_urls) == ["someproto://other.host/c"]
+
+
+def test_planFiles_error(logger):
+    with mock.patch("lib.plan.planFile") as planFile:
+        planFile.side_effect = FileNotFoundError()
+        plan = lib.planFiles(logger, ["file1.xml"])
+    assert plan.urls == {}
+    assert plan.files == {"file1.xml": []}
+    files, _ = lib.shardPlan(plan, ".", 0, 1)
+    assert files == ["file1.xml"]
+
+
+def test_groupByResolverAndHost(mock_plugin):
+    plan = lib.Plan()
+    plan.add("file1.xml", ["someproto://some.host/a", "someproto://other.host/c"])
+    plan.add("file2.xml", ["someproto://some.host/b"])
+
+    url_resolver = mock_plugin.getUrlResolver.return_value
+    assert plan.groupByResolverAndHost([mock_plugin]) == {
+        (url_resolver, "some.host"): [
+            "someproto://some.host/a",
+            "someproto://some.host/b",
+        ],
+        (url_resolver, "other.host"): ["someproto://other.host/c"],
+    }
+
+
+@pytest.mark.parametrize("workers", [1, 4])
+def test_resolvePlan(logger, mock_plugin, workers):
+    plan = lib.Plan()
+    plan.add(
+        "file1.xml",
+        ["someproto://some.host/a@a1b2c3d4#L1", "someproto://some.host/b#L1"],
+    )
+    plan.add(
+        "file2.xml",
+        ["someproto://some.host/b#L1", "someproto://other.host/c#L1"],
+        ["someproto://other.host/c#L1"],
+    )
+
+    lib.resolvePlan(logger, [mock_plugin], plan, workers=workers)
+
+    url_resolver = mock_plugin.getUrlResolver.return_value
+    url_resolver.diff.assert_called_once_with("someproto://some.host/a@a1b2c3d4#L1")
+    url_resolver.resolveToFingerprint.assert_called_once_with(
+        "someproto://some.host/b#L1"
+    )
+    url_resolver.resolveToContent.assert_called_once_with("someproto://other.host/c#L1")
+    assert sorted(call.args[0] for call in url_resolver.prefetch.call_args_list) == [
+        ["someproto://other.host/c#L1"],
+        ["someproto://some.host/a@a1b2c3d4#L1", "someproto://some.host/b#L1"],
+    ]
+
+
+def test_resolvePlan_error(logger, mock_plugin):
+    plan = lib.Plan()
+    plan.add("file1.xml", ["someproto://some.host/a#L1", "someproto://some.host/b#L1"])
+    url_resolver = mock_plugin.getUrlResolver.return_value
+    url_resolver.prefetch.side_effect = Exception("Some error")
+    url_resolver.resolveToFingerprint.side_effect = Exception("Some error")
+
+    lib.resolvePlan(logger, [mock_plugin], plan)
+
+    url_resolver.prefetch.assert_called_once()
+    assert url_resolver.resolveToFingerprint.call_count == 2
+
+
+
+def test_resolvePlan_deadline(logger, mock_plugin):
+    plan = lib.Plan()
+    plan.add("file1.xml", ["someproto://some.host/a#L1"])
+
+    lib.resolvePlan(logger, [mock_plugin], plan, deadline=time.monotonic() - 1)
+    asyncio.run(
+        lib.resolvePlanAsync(logger, [mock_plugin], plan, deadline=time.monotonic() - 1)
+    )
+
+    mock_plugin.getUrlResolver.return_value.resolveToFingerprint.assert_not_called()
+
+
+def test_resolvePlanAsync(logger, mock_plugin):
+    plan = lib.Plan()
+    plan.add(
+        "file1.xml",
+        ["someproto://some.host/a@a1b2c3d4#L1", "someproto://some.host/b#L1"],
+    )
+    plan.add(
+        "file2.xml",
+        ["someproto://some.host/b#L1", "someproto://some.host/c#L1"],
+        ["someproto://some.host/c#L1"],
+    )
+    url_resolver = mock_plugin.getUrlResolver.return_value
+    url_resolver.prefetchAsync = mock.AsyncMock()
+    url_resolver.diffAsync = mock.AsyncMock()
+    url_resolver.resolveToContentAsync = mock.AsyncMock()
+    url_resolver.resolveToFingerprintAsync = mock.AsyncMock(side_effect=[Exception()])
+
+    asyncio.run(lib.resolvePlanAsync(logger, [mock_plugin], plan, concurrency=2))
+
+    url_resolver.prefetchAsync.assert_awaited_once_with(
+        [
+            "someproto://some.host/a@a1b2c3d4#L1",
+            "someproto://some.host/b#L1",
+            "someproto://some.host/c#L1",
+        ]
+    )
+    url_resolver.resolveToContentAsync.assert_awaited_once_with(
+        "someproto://some.host/c#L1"
+    )
+    url_resolver.diffAsync.assert_awaited_once_with(
+        "someproto://some.host/a@a1b2c3d4#L1"
+    )
+    url_resolver.resolveToFingerprintAsync.assert_awaited_once_with(
+        "someproto://some.host/b#L1"
+    )
+    url_resolver.diff.assert_not_called()
+    url_resolver.resolveToFingerprint.assert_not_called()
+
+
+def test_estimateWorkload(mock_plugin):
+    plan = lib.Plan()
+    plan.add("file1.xml", ["someproto://some.host/a#L1", "someproto://some.host/a#L2"])
+    plan.add("file2.xml", ["someproto://other.host/b", "unknown://some.host/c"])
+
+    url_resolver = mock_plugin.getUrlResolver.return_value
+    mock_plugin.getUrlResolver.side_effect = lambda scheme: (
+        url_resolver if scheme == "someproto" else None
+    )
+    url_resolver.describeWorkload.side_effect = lambda url: mock.Mock(
+        groups={"some group": url.split("/")[2]},
+        calls=[("API calls", url.split("#")[0])],
+    )
+
+    assert lib.estimateWorkload([mock_plugin], plan) == {
+        "files": 2,
+        "urls": 4,
+        "unresolvable_urls": 1,
+        "urls_by_scheme": {"someproto": 3, "unknown": 1},
+        "urls_by_host": {
+            "someproto://some.host": 2,
+            "someproto://other.host": 1,
+            "unknown://some.host": 1,
+        },
+        "urls_by_group": {"some group": {"some.host": 2, "other.host": 1}},
+        "calls": {"API calls": 2},
+    }
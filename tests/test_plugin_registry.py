@@ -1,6 +1,12 @@
+import asyncio
 import logging
+import os
 import plugin_registry
 import pytest
+import subprocess
+import sys
+import textwrap
+from unittest import mock
 
 
 @pytest.fixture(scope="session")
@@ -28,3 +34,248 @@ def test_getUrlResolver_boto3(plugins):
 
 def test_getUrlResolver_https(plugins):
     assert plugin_registry.getUrlResolver(plugins=plugins, scheme="https") != None
+
+
+class FakeUrlResolver(plugin_registry.IUrlResolver):
+    def diff(self, url: str):
+        return plugin_registry.contract.IDiff(updated_url=url + "@a1b2c3d4")
+
+    def resolveToContent(self, url: str):
+        return plugin_registry.contract.IContent(content=url.encode())
+
+
+def test_async_adapters():
+    url_resolver = FakeUrlResolver(logging.getLogger("tests"))
+
+    async def run():
+        return await asyncio.gather(
+            url_resolver.diffAsync("someproto://some.host/a"),
+            url_resolver.resolveToContentAsync("someproto://some.host/b"),
+        )
+
+    diff, content_obj = asyncio.run(run())
+    assert diff.updated_url == "someproto://some.host/a@a1b2c3d4"
+    assert content_obj.content == b"someproto://some.host/b"
+
+
+def test_getOrComputeAsync():
+    url_resolver = FakeUrlResolver(logging.getLogger("tests"))
+    cache = {}
+    computed = []
+
+    async def compute():
+        computed.append(1)
+        await asyncio.sleep(0.01)
+        return "some value"
+
+    async def run():
+        return await asyncio.gather(
+            *[
+                url_resolver._getOrComputeAsync(cache, "some key", compute)
+                for _ in range(5)
+            ]
+        )
+
+    assert asyncio.run(run()) == ["some value"] * 5
+    # And again in another event loop
+    assert asyncio.run(run()) == ["some value"] * 5
+    assert computed == [1]
+    assert url_resolver.cacheStats()["cache_hits"] == 9
+    assert url_resolver.cacheStats()["cache_misses"] == 1
+
+
+def test_getOrCompute_not_counted():
+    url_resolver = FakeUrlResolver(logging.getLogger("tests"))
+    clients = {}
+    for _ in range(3):
+        url_resolver._getOrCompute(
+            clients, "some host", lambda: "some client", expires=False, count=False
+        )
+    url_resolver._getOrCompute({}, "some key", lambda: "some value")
+
+    assert url_resolver.cacheStats()["cache_hits"] == 0
+    assert url_resolver.cacheStats()["cache_misses"] == 1
+
+
+def test_resetCacheStats():
+    url_resolver = FakeUrlResolver(logging.getLogger("tests"))
+    cache = {}
+    url_resolver._getOrCompute(cache, "some key", lambda: "some value")
+    url_resolver._countFetched(b"some content")
+
+    url_resolver.resetCacheStats()
+    url_resolver._getOrCompute(cache, "some key", lambda: "some value")
+
+    assert url_resolver.cacheStats() == {
+        "cache_hits": 1,
+        "cache_misses": 0,
+        "persistent_cache_hits": 0,
+        "bytes_fetched": 0,
+    }
+    # The cache is kept
+    assert cache == {"some key": "some value"}
+
+
+def test_getUrlResolvers(plugins):
+    assert plugin_registry.getUrlResolver(
+        plugins=plugins, scheme="https"
+    ) in plugin_registry.getUrlResolvers(plugins)
+
+
+@mock.patch("time.monotonic")
+def test_evictExpired(monotonic):
+    url_resolver = FakeUrlResolver(logging.getLogger("tests"))
+    results_cache = {}
+    clients_cache = {}
+    monotonic.return_value = 1000
+    url_resolver._getOrCompute(results_cache, "a", lambda: "A")
+    url_resolver._getOrCompute(clients_cache, "a", lambda: "client", expires=False)
+    monotonic.return_value = 1030
+    url_resolver._getOrCompute(results_cache, "b", lambda: "B")
+
+    assert url_resolver.evictExpired() == 0  # No TTL, cached forever
+
+    url_resolver.setCacheTtl(60)
+    monotonic.return_value = 1070
+    assert url_resolver.evictExpired() == 1
+    assert results_cache == {"b": "B"}
+    assert clients_cache == {"a": "client"}
+    # The lock of the evicted entry is gone, the others are kept
+    assert set(url_resolver._locks) == {
+        (id(results_cache), "b"),
+        (id(clients_cache), "a"),
+    }
+
+    # Looking up does not check expiry
+    monotonic.return_value = 1100
+    assert url_resolver._getOrCompute(results_cache, "b", lambda: "B2") == "B"
+    assert url_resolver.evictExpired() == 1
+    assert url_resolver._getOrCompute(results_cache, "b", lambda: "B2") == "B2"
+
+
+def test_loadPluginsLazily():
+    plugins = plugin_registry.Registry(
+        plugin_directory="plugins", logger=logging.getLogger("tests")
+    ).loadPluginsLazily()
+
+    https_plugin = [p for p in plugins if "https" in p.schemes][0]
+    assert plugin_registry.getUrlResolvers([https_plugin]) == []
+    url_resolver = plugin_registry.getUrlResolver(plugins=plugins, scheme="https")
+    assert https_plugin.isLoaded()
+    assert plugin_registry.getUrlResolvers([https_plugin]) == [url_resolver]
+    assert plugin_registry.getUrlResolver(plugins=plugins, scheme="unknown") is None
+
+
+def test_configureUrlResolvers():
+    plugins = plugin_registry.Registry(
+        plugin_directory="plugins", logger=logging.getLogger("tests")
+    ).loadPluginsLazily()
+
+    plugin_registry.configureUrlResolvers(
+        plugins, lambda url_resolver: url_resolver.setCacheTtl(60)
+    )
+    # Configured when loaded, as well as when already loaded
+    url_resolver = plugin_registry.getUrlResolver(plugins=plugins, scheme="file")
+    assert url_resolver._cache_ttl == 60
+    plugin_registry.configureUrlResolvers(
+        plugins, lambda url_resolver: url_resolver.setCacheTtl(120)
+    )
+    assert url_resolver._cache_ttl == 120
+
+
+# Importing the app and loading the plugins in a fresh interpreter. Generous, so as not to be flaky on slow machines.
+STARTUP_BUDGET_SECONDS = 1.0
+
+
+def test_startup_import_budget():
+    script = textwrap.dedent(
+        """
+        import time
+        started = time.perf_counter()
+        import logging
+        import sys
+        import app
+        import plugin_registry
+        plugin_registry.Registry(
+            plugin_directory="plugins", logger=logging.getLogger("tests")
+        ).loadPluginsLazily()
+        print(time.perf_counter() - started)
+        print(",".join(m for m in ["boto3", "kubernetes", "gitlab", "requests"] if m in sys.modules))
+        """
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", script],
+        cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    seconds, heavy_modules = result.stdout.splitlines()
+    assert heavy_modules == ""
+    assert float(seconds) < STARTUP_BUDGET_SECONDS
+
+
+def test_Plugins_schemes():
+    plugins = plugin_registry.Registry(
+        plugin_directory="plugins", logger=logging.getLogger("tests")
+    ).loadPluginsLazily()
+
+    assert isinstance(plugins, plugin_registry.Plugins)
+    assert plugins.schemes["boto3+json+jmespath"] is plugins.schemes["boto3"]
+    assert {p.package for p in plugins.schemes.values()} == {
+        "plugins.boto3",
+        "plugins.file",
+        "plugins.gitlab",
+        "plugins.https",
+        "plugins.k8s",
+    }
+
+
+def test_Plugins_conflicting_schemes():
+    logger = logging.getLogger("tests")
+    with pytest.raises(Exception, match="Scheme https is claimed by both"):
+        plugin_registry.Plugins(
+            [
+                plugin_registry.LazyPlugin(
+                    "plugins.https", {"class": "Https", "schemes": ["https"]}, logger
+                ),
+                plugin_registry.LazyPlugin(
+                    "other.https", {"class": "Https", "schemes": ["https"]}, logger
+                ),
+            ]
+        )
+
+
+def test_Plugins_undeclared_schemes():
+    undeclared_plugin = mock.Mock(schemes=[])
+    undeclared_plugin.getUrlResolver.side_effect = lambda scheme: (
+        "url resolver" if scheme == "someproto" else None
+    )
+    plugins = plugin_registry.Plugins([undeclared_plugin])
+
+    assert plugin_registry.getUrlResolver(plugins, "someproto") == "url resolver"
+    assert plugin_registry.getUrlResolver(plugins, "otherproto") is None
+
+
+def test_persistentCache(tmp_path):
+    persistent_cache = plugin_registry.PersistentCache(str(tmp_path / "cache.sqlite"))
+    compute = mock.Mock(side_effect=["A", None, "C"])
+    url_resolver = FakeUrlResolver(logging.getLogger("tests"))
+    url_resolver.setPersistentCache(persistent_cache, 60)
+    url_resolver._getOrCompute({}, "a", compute, persist="results")
+    url_resolver._getOrCompute({}, "b", compute, persist="results")
+    url_resolver._getOrCompute({}, "c", compute, persist="results", immutable=True)
+
+    # Another run
+    url_resolver = FakeUrlResolver(logging.getLogger("tests"))
+    url_resolver.setPersistentCache(persistent_cache, 60)
+    assert url_resolver._getOrCompute({}, "a", compute, persist="results") == "A"
+    assert compute.call_count == 3
+    assert url_resolver.cacheStats()["persistent_cache_hits"] == 1
+    # Errors are not kept
+    assert [entry["key"] for entry in persistent_cache.entries()] == ["a", "c"]
+    assert [entry["expires_at"] is None for entry in persistent_cache.entries()] == [
+        False,
+        True,
+    ]
+    persistent_cache.close()
@@ -11,8 +11,13 @@ def plugins():
     boto3_plugin_whitelisted_services_and_methods = """
 secretsmanager:
   - get_secret_value
+  - batch_get_secret_value
+  - list_secrets
 elbv2:
   - describe_tags
+ssm:
+  - get_parameter
+  - get_parameters
 """
     with mock.patch(
         "builtins.open",
@@ -29,10 +34,11 @@ elbv2:
 def url_resolver(plugins):
     res = plugin_registry.getUrlResolver(plugins=plugins, scheme="boto3")
     res._boto_results_cache = {}  # Clear the resolver's cache.
+    res._clients = {}
     return res
 
 
-@mock.patch("boto3.client")
+@mock.patch("boto3.session.Session.client")
 class TestBoto3Plugin:
     def test_resolveToContent(self, boto3client, url_resolver):
         boto3client.return_value.get_secret_value.return_value = {
@@ -80,6 +86,7 @@ class TestBoto3Plugin:
         url_resolver = plugin_registry.getUrlResolver(
             plugins=plugins, scheme="boto3")
         url_resolver._boto_results_cache = {}  # Clear the resolver's cache.
+        url_resolver._clients = {}
 
         boto3client.return_value.get_secret_value.return_value = {
             "SecretString": '{"key1":"value1"}'
@@ -127,3 +134,222 @@ class TestBoto3Plugin:
         )
         assert type(content_obj) == plugin_registry.contract.IContent
         assert content_obj.content == b"[{'ResourceArn': 'arn:aws:elasticloadbalancing:eu-west-1:012345678901:loadbalancer/net/a1b2c3d4e5f6', 'Tags': [{'Key': 'some_tag', 'Value': 'some_tag_value'}]}]"
+
+    def test_clientPool(self, boto3client, url_resolver):
+        url_resolver = type(url_resolver)(
+            logging.getLogger("tests"),
+            {"secretsmanager": ["get_secret_value"]},
+            max_pool_connections=25,
+        )
+        boto3client.return_value.get_secret_value.return_value = {
+            "SecretString": "some value"
+        }
+        for url in [
+            "boto3://secretsmanager/get_secret_value?SecretId=a#SecretString",
+            "boto3://secretsmanager/get_secret_value?SecretId=b#SecretString",
+            "boto3://secretsmanager@us-east-1/get_secret_value?SecretId=a#SecretString",
+            "boto3://secretsmanager@us-east-1/get_secret_value?SecretId=b#SecretString",
+        ]:
+            assert url_resolver.resolveToContent(url).content == b"some value"
+
+        assert list(url_resolver._clients) == [
+            ("secretsmanager", None),
+            ("secretsmanager", "us-east-1"),
+        ]
+        assert boto3client.call_count == 2
+        configs = [call.kwargs["config"] for call in boto3client.call_args_list]
+        assert [config.max_pool_connections for config in configs] == [25, 25]
+        assert [config.region_name for config in configs] == [None, "us-east-1"]
+
+    def test_prefetch_describe_tags(self, boto3client, url_resolver):
+        arns = [
+            f"arn:aws:elasticloadbalancing:eu-west-1:012345678901:loadbalancer/net/lb{i}"
+            for i in range(25)
+        ]
+        boto3client.return_value.describe_tags.side_effect = lambda ResourceArns: {
+            "TagDescriptions": [
+                {
+                    "ResourceArn": arn,
+                    "Tags": [{"Key": "k", "Value": arn.rsplit("/", 1)[1]}],
+                }
+                for arn in ResourceArns
+            ]
+        }
+        urls = [
+            f"boto3://elbv2/describe_tags?ResourceArns=[{arn}]#TagDescriptions"
+            for arn in arns
+        ]
+        urls.append(
+            f"boto3://elbv2/describe_tags?ResourceArns=[{arns[0]},{arns[1]}]#TagDescriptions"
+        )
+
+        url_resolver.prefetch(urls)
+
+        assert [
+            len(call.kwargs["ResourceArns"])
+            for call in boto3client.return_value.describe_tags.call_args_list
+        ] == [20, 5]
+        content_obj = url_resolver.resolveToContent(urls[-1])
+        assert b"'lb0'" in content_obj.content and b"'lb1'" in content_obj.content
+        assert (
+            url_resolver.resolveToContent(urls[24]).content
+            == (
+                f"[{{'ResourceArn': '{arns[24]}', 'Tags': [{{'Key': 'k', 'Value': 'lb24'}}]}}]"
+            ).encode()
+        )
+        assert boto3client.return_value.describe_tags.call_count == 2
+
+    def test_prefetch_get_parameter(self, boto3client, url_resolver):
+        boto3client.return_value.get_parameters.return_value = {
+            "Parameters": [
+                {
+                    "Name": "/a",
+                    "ARN": "arn:aws:ssm:eu-west-1:012345678901:parameter/a",
+                    "Value": "value a",
+                },
+                {
+                    "Name": "/b",
+                    "Selector": ":2",
+                    "ARN": "arn:aws:ssm:eu-west-1:012345678901:parameter/b",
+                    "Value": "value b2",
+                },
+            ],
+            "InvalidParameters": ["/c"],
+        }
+        urls = [
+            "boto3://ssm/get_parameter?Name=/a#Parameter",
+            "boto3://ssm/get_parameter?Name=/b:2#Parameter",
+            "boto3://ssm/get_parameter?Name=/c#Parameter",
+        ]
+
+        url_resolver.prefetch(urls)
+
+        boto3client.return_value.get_parameters.assert_called_once_with(
+            Names=["/a", "/b:2", "/c"]
+        )
+        assert set(url_resolver._boto_results_cache) == {
+            "ssm@None/get_parameter?Name=/a",
+            "ssm@None/get_parameter?Name=/b:2",
+        }
+        boto3client.return_value.get_parameter.return_value = {}
+        url_resolver.resolveToContent(urls[2])
+        boto3client.return_value.get_parameter.assert_called_once_with(Name="/c")
+
+    def test_prefetch_get_secret_value(self, boto3client, url_resolver):
+        arn = "arn:aws:secretsmanager:eu-west-1:012345678901:secret:my/secret-W0Wo0L"
+        boto3client.return_value.batch_get_secret_value.return_value = {
+            "SecretValues": [
+                {"ARN": arn, "Name": "my/secret", "SecretString": "some secret"},
+                {"ARN": arn + "2", "Name": "other", "SecretString": "other secret"},
+            ],
+            "Errors": [],
+        }
+
+        url_resolver.prefetch(
+            [
+                f"boto3://secretsmanager/get_secret_value?SecretId={arn}#SecretString",
+                "boto3://secretsmanager/get_secret_value?SecretId=other#SecretString",
+                # Not batched: with another param, of a method without a batch method
+                f"boto3://secretsmanager/get_secret_value?SecretId={arn}&VersionId=abcd#SecretString",
+                "boto3://secretsmanager/list_secrets?MaxResults=10",
+            ]
+        )
+
+        boto3client.return_value.batch_get_secret_value.assert_called_once_with(
+            SecretIdList=[arn, "other"]
+        )
+        assert (
+            url_resolver.resolveToContent(
+                "boto3://secretsmanager/get_secret_value?SecretId=other#SecretString"
+            ).content
+            == b"other secret"
+        )
+        boto3client.return_value.get_secret_value.assert_not_called()
+
+    def test_prefetch_batch_method_not_whitelisted(self, boto3client, url_resolver):
+        url_resolver = type(url_resolver)(
+            logging.getLogger("tests"), {"secretsmanager": ["get_secret_value"]}
+        )
+
+        url_resolver.prefetch(
+            [
+                "boto3://secretsmanager/get_secret_value?SecretId=a#SecretString",
+                "boto3://secretsmanager/get_secret_value?SecretId=b#SecretString",
+            ]
+        )
+
+        boto3client.return_value.batch_get_secret_value.assert_not_called()
+        assert url_resolver._boto_results_cache == {}
+
+    def test_prefetch_error(self, boto3client, url_resolver):
+        boto3client.return_value.batch_get_secret_value.side_effect = Exception(
+            "AccessDeniedException"
+        )
+        boto3client.return_value.get_secret_value.return_value = {
+            "SecretString": "some secret"
+        }
+        url = "boto3://secretsmanager/get_secret_value?SecretId=my/secret#SecretString"
+
+        url_resolver.prefetch([url])
+
+        assert url_resolver.resolveToContent(url).content == b"some secret"
+
+    def test_paginate(self, boto3client, url_resolver):
+        fetched = []
+
+        def paginate(**params):
+            for i in range(3):
+                fetched.append(i)
+                yield {"SecretList": [{"Name": f"s{i}a"}, {"Name": f"s{i}b"}]}
+
+        boto3client.return_value.get_paginator.return_value.paginate.side_effect = (
+            paginate
+        )
+
+        content_obj = url_resolver.resolveToContent(
+            "boto3+paginate://secretsmanager/list_secrets#SecretList[].Name"
+        )
+        assert content_obj.content == b"['s0a', 's0b', 's1a', 's1b', 's2a', 's2b']"
+        boto3client.return_value.get_paginator.assert_called_with("list_secrets")
+        assert fetched == [0, 1, 2]
+
+        fetched.clear()
+        content_obj = url_resolver.resolveToContent(
+            "boto3+paginate://secretsmanager/list_secrets?Filters=[x]#SecretList[?Name=='s1a'].Name | [0]"
+        )
+        assert content_obj.content == b"s1a"
+        boto3client.return_value.get_paginator.return_value.paginate.assert_called_with(
+            Filters=["x"]
+        )
+        assert fetched == [0, 1]  # Not the last page
+
+    def test_paginate_no_expression(self, boto3client, url_resolver):
+        assert (
+            url_resolver.resolveToContent(
+                "boto3+paginate://secretsmanager/list_secrets"
+            )
+            is None
+        )
+        boto3client.return_value.get_paginator.assert_not_called()
+
+
+def test_describeWorkload(url_resolver):
+    workload = url_resolver.describeWorkload(
+        "boto3://secretsmanager@eu-west-1/get_secret_value?SecretId=my/secret#SecretString"
+    )
+    assert workload.groups == {"AWS service and region": "secretsmanager@eu-west-1"}
+    assert workload.calls == [
+        (
+            "AWS API calls",
+            "secretsmanager@eu-west-1/get_secret_value?SecretId=my/secret",
+        )
+    ]
+
+
+def test_describeWorkload_unparseable(url_resolver):
+    workload = url_resolver.describeWorkload(
+        "boto3://@eu-west-1/get_secret_value?SecretId=my/secret#SecretString"
+    )
+
+    assert workload.groups == {"AWS service and region": "unparseable"}
+    assert workload.calls == []
@@ -3,6 +3,12 @@ import logging
 import requests
 from unittest import mock
 import pytest
+import aiohttp
+import asyncio
+import concurrent.futures
+import http.server
+import threading
+import time
 
 
 @pytest.fixture(scope="session")
@@ -31,12 +37,13 @@ def url_resolver(plugins):
     return res
 
 
-@mock.patch("requests.get")
+@mock.patch("requests.Session.get")
 class TestHttpsPlugin:
     def test_resolveToContent(self, get, url_resolver):
         test_content = '{"variable_type":"env_var","key":"TEST1","value":"test1 value","hidden":false,"protected":false,"masked":false,"raw":true,"environment_scope":"*","description":null}'
         get.return_value.status_code = 200
-        get.return_value.text = test_content
+        get.return_value.headers = {}
+        get.return_value.iter_content.return_value = [test_content.encode()]
 
         content_obj = url_resolver.resolveToContent(
             "https://gitlab.mycompany.com/api/v4/projects/12345/variables/TEST1"
@@ -52,15 +59,190 @@ class TestHttpsPlugin:
         )
         assert content_obj == None
 
+    def test_callTimeout(self, get, url_resolver):
+        get.return_value.status_code = 200
+        get.return_value.iter_content.return_value = [b"some content"]
+        url_resolver.setCallTimeout(5)
+        try:
+            url_resolver.resolveToContent("https://some.host/some/path")
+        finally:
+            url_resolver.setCallTimeout(None)
+        assert get.call_args.kwargs["timeout"] == 5
+
     def test_caching(self, get, plugins):
         url_resolver = plugin_registry.getUrlResolver(plugins=plugins, scheme="https")
         url_resolver._cache = {}  # Clear the resolver's cache.
 
         get.return_value.status_code = 200
-        get.return_value.text = ''
+        get.return_value.iter_content.return_value = []
 
         test_url = "https://gitlab.mycompany.com/api/v4/projects/12345/variables/TEST1"
         url_resolver.resolveToContent(test_url)
         url_resolver.resolveToContent(test_url)
 
         get.assert_called_once()
+
+    def test_caching_concurrent(self, get, url_resolver):
+        def slow_get(*args, **kwargs):
+            time.sleep(0.05)
+            return get.return_value
+
+        get.side_effect = slow_get
+        get.return_value.status_code = 200
+        get.return_value.iter_content.return_value = [b"some content"]
+
+        test_url = "https://gitlab.mycompany.com/api/v4/projects/12345/variables/TEST1"
+        with concurrent.futures.ThreadPoolExecutor(max_workers=8) as executor:
+            results = list(
+                executor.map(lambda _: url_resolver.resolveToContent(test_url), range(8))
+            )
+
+        get.assert_called_once()
+        assert all(r is results[0] for r in results)
+        assert results[0].content == b"some content"
+
+
+def test_sessionPerHost(url_resolver):
+    url_resolver = type(url_resolver)(logging.getLogger("tests"), {}, pool_size=3)
+    with mock.patch("requests.Session.get") as get:
+        get.return_value.status_code = 200
+        get.return_value.iter_content.return_value = [b"some content"]
+        url_resolver.resolveToContent("https://some.host/a")
+        url_resolver.resolveToContent("https://some.host/b")
+        url_resolver.resolveToContent("https://other.host/c")
+
+    assert list(url_resolver._sessions) == ["some.host", "other.host"]
+    session = url_resolver._sessions["some.host"]
+    assert session.get_adapter("https://some.host/")._pool_maxsize == 3
+    assert "gzip" in session.headers["Accept-Encoding"]
+
+
+def test_conditionalGet(url_resolver, tmp_path):
+    test_url = "https://some.host/large.json"
+    persistent_cache = plugin_registry.PersistentCache(str(tmp_path / "cache.sqlite"))
+    url_resolver = type(url_resolver)(logging.getLogger("tests"), {})
+    url_resolver.setPersistentCache(persistent_cache, 0)
+    with mock.patch("requests.Session.get") as get:
+        get.return_value.status_code = 200
+        get.return_value.headers = {
+            "ETag": '"abc"',
+            "Last-Modified": "Wed, 21 Oct 2015 07:28:00 GMT",
+        }
+        get.return_value.iter_content.return_value = [b"some content"]
+        first = url_resolver.resolveToContent(test_url)
+        assert "If-None-Match" not in get.call_args.kwargs["headers"]
+
+        # Another run, with the content expired in the persistent cache
+        url_resolver = type(url_resolver)(logging.getLogger("tests"), {})
+        url_resolver.setPersistentCache(persistent_cache, 0)
+        get.return_value.status_code = 304
+        get.return_value.iter_content.return_value = []
+        second = url_resolver.resolveToContent(test_url)
+
+    assert get.call_args.kwargs["headers"]["If-None-Match"] == '"abc"'
+    assert (
+        get.call_args.kwargs["headers"]["If-Modified-Since"]
+        == "Wed, 21 Oct 2015 07:28:00 GMT"
+    )
+    assert second.content == b"some content"
+    assert second.fingerprint() == first.fingerprint()
+    assert url_resolver.cacheStats()["bytes_fetched"] == 0
+    persistent_cache.close()
+
+
+def test_resolveToContentAsync(url_resolver):
+    in_flight = [0]  # Requests the server is handling, after each change
+    requested = []
+    lock = threading.Lock()
+
+    class Handler(http.server.BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_GET(self):
+            with lock:
+                requested.append(self.path)
+                in_flight.append(in_flight[-1] + 1)
+            time.sleep(0.05)
+            with lock:
+                in_flight.append(in_flight[-1] - 1)
+            body = self.path.encode()
+            self.send_response(200)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = http.server.ThreadingHTTPServer(("localhost", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url_resolver = type(url_resolver)(logging.getLogger("tests"), {}, pool_size=2)
+    urls = [f"http://localhost:{server.server_port}/{i}" for i in range(6)]
+
+    async def run():
+        try:
+            return await asyncio.gather(
+                *[url_resolver.resolveToContentAsync(url) for url in urls + urls[:3]]
+            )
+        finally:
+            await url_resolver.closeAsync()
+
+    try:
+        results = asyncio.run(run())
+    finally:
+        server.shutdown()
+
+    assert [r.content for r in results] == [
+        f"/{i}".encode() for i in list(range(6)) + list(range(3))
+    ]
+    assert sorted(requested) == [f"/{i}" for i in range(6)]
+    assert max(in_flight) == 2
+
+
+def test_asyncTimeoutKwargs(url_resolver):
+    url_resolver = type(url_resolver)(logging.getLogger("tests"), {})
+    assert url_resolver._asyncTimeoutKwargs() == {}
+    url_resolver.setCallTimeout(5)
+    assert url_resolver._asyncTimeoutKwargs() == {
+        "timeout": aiohttp.ClientTimeout(total=5)
+    }
+
+
+def test_resolveToFingerprint(url_resolver):
+    chunks = [b"some ", b"large ", b"content"]
+    with mock.patch("requests.Session.get") as get:
+        get.return_value.status_code = 200
+        get.return_value.headers = {}
+        get.return_value.iter_content.return_value = chunks
+        content_obj = url_resolver.resolveToFingerprint("https://some.host/large.bin")
+
+    assert get.call_args.kwargs["stream"]
+    assert content_obj.content is None
+    assert (
+        content_obj.fingerprint()
+        == plugin_registry.contract.IContent(b"".join(chunks)).fingerprint()
+    )
+
+
+def test_maxSize(url_resolver):
+    url_resolver = type(url_resolver)(logging.getLogger("tests"), {}, max_size=10)
+    consumed = []
+
+    def chunks():
+        for chunk in [b"123456", b"789012", b"345678"]:
+            consumed.append(chunk)
+            yield chunk
+
+    with mock.patch("requests.Session.get") as get:
+        get.return_value.status_code = 200
+        get.return_value.headers = {"Content-Length": "11"}
+        assert url_resolver.resolveToContent("https://some.host/a") is None
+        get.return_value.iter_content.assert_not_called()
+
+        # Without a Content-Length, e.g. chunked
+        get.return_value.headers = {}
+        get.return_value.iter_content.return_value = chunks()
+        assert url_resolver.resolveToFingerprint("https://some.host/b") is None
+
+    assert consumed == [b"123456", b"789012"]
+    assert get.return_value.close.call_count == 2
@@ -0,0 +1,65 @@
+import lib
+import logging
+import pytest
+
+
+@pytest.fixture
+def logger():
+    return logging.getLogger("test")
+
+
+def test_hasInspectorProperties(tmp_path):
+    with_properties = tmp_path / "with_properties.xml"
+    with_properties.write_text(
+        '<root><properties key="pwrt:inspector:value-ref" value="x"/></root>'
+    )
+    without_properties = tmp_path / "without_properties.xml"
+    without_properties.write_text('<root><properties key="other" value="x"/></root>')
+    empty = tmp_path / "empty.xml"
+    empty.write_text("")
+
+    assert lib.hasInspectorProperties(str(with_properties))
+    assert not lib.hasInspectorProperties(str(without_properties))
+    assert not lib.hasInspectorProperties(str(empty))
+
+
+def test_hasInspectorProperties_no_file(tmp_path):
+    # Passed through, so that processFile reports the error
+    assert lib.hasInspectorProperties(str(tmp_path / "nosuchfile.xml"))
+
+
+def test_prefilterFiles(tmp_path, logger):
+    (tmp_path / "model" / "business").mkdir(parents=True)
+    (tmp_path / "model" / "diagrams" / "sub").mkdir(parents=True)
+    files = [
+        tmp_path / "model" / "business" / "a.xml",
+        tmp_path / "model" / "business" / "b.xml",
+        tmp_path / "model" / "diagrams" / "sub" / "c.xml",
+    ]
+    files[0].write_text('<root><properties key="pwrt:inspector:value-deps"/></root>')
+    files[1].write_text("<root/>")
+    files[2].write_text('<root><properties key="pwrt:inspector:value-deps"/></root>')
+
+    candidates, stats = lib.prefilterFiles(
+        logger, files, str(tmp_path), exclude=["model/diagrams/*"]
+    )
+
+    assert candidates == [files[0]]
+    assert stats.total == 3
+    assert stats.excluded == 1
+    assert stats.without_inspector_properties == 1
+    assert stats.candidates == 1
+
+
+def test_prefilterFiles_include(tmp_path, logger):
+    files = [tmp_path / "model" / "a.xml", tmp_path / "model" / "b.xml"]
+    (tmp_path / "model").mkdir()
+    for file in files:
+        file.write_text('<root><properties key="pwrt:inspector:value-deps"/></root>')
+
+    candidates, stats = lib.prefilterFiles(
+        logger, files, str(tmp_path), include=["model/b.*"]
+    )
+
+    assert candidates == [files[1]]
+    assert stats.excluded == 1
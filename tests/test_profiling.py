@@ -0,0 +1,37 @@
+import lib
+import logging
+import pstats
+import pytest
+
+
+@pytest.fixture
+def logger():
+    return logging.getLogger("test")
+
+
+def test_profiled(tmp_path, logger):
+    profile_file = str(tmp_path / "profile.pstats")
+
+    with lib.profiled(logger, profile_file, top=5):
+        sorted(range(1000), key=lambda i: -i)
+
+    stats = pstats.Stats(profile_file)
+    assert any(function == "<lambda>" for _, _, function in stats.stats)
+
+
+def test_profiled_memory(logger):
+    with lib.profiled(logger, trace_memory=True):
+        with lib.measureMemory("parse"):
+            data = [bytes(1024) for _ in range(1000)]
+        with lib.measureMemory("resolve"):
+            pass
+
+    peaks = lib.getMemoryPeaks().peaks
+    assert peaks["parse"] >= 1024 * 1000
+    assert peaks["resolve"] < peaks["parse"]
+
+
+def test_measureMemory_not_tracing():
+    with lib.measureMemory("stage_not_traced"):
+        pass
+    assert "stage_not_traced" not in lib.getMemoryPeaks().peaks
@@ -0,0 +1,49 @@
+import lib
+from unittest import mock
+
+
+@mock.patch("random.uniform", return_value=1)
+@mock.patch("time.monotonic", return_value=1000)
+def test_park(monotonic, uniform):
+    retry_queue = lib.RetryQueue(initial_backoff=60, max_backoff=300, max_retries=5)
+
+    delays = []
+    while (delay := retry_queue.park("item")) is not None:
+        delays.append(delay)
+
+    assert delays == [60, 120, 240, 300, 300]
+
+
+@mock.patch("random.uniform", return_value=1)
+@mock.patch("time.monotonic")
+def test_popDue(monotonic, uniform):
+    retry_queue = lib.RetryQueue(initial_backoff=60)
+    monotonic.return_value = 1000
+    retry_queue.park("item1")
+    monotonic.return_value = 1030
+    retry_queue.park("item2")
+    assert len(retry_queue) == 2
+    assert retry_queue.nextDueIn() == 30
+
+    monotonic.return_value = 1060
+    assert retry_queue.popDue() == ["item1"]
+    assert len(retry_queue) == 1
+    assert retry_queue.nextDueIn() == 30
+
+    monotonic.return_value = 1090
+    assert retry_queue.popDue() == ["item2"]
+    assert not retry_queue
+
+
+def test_jitter():
+    retry_queue = lib.RetryQueue(initial_backoff=100, jitter=0.25)
+    for i in range(10):
+        assert 75 <= retry_queue.park(f"item{i}") <= 125
+
+
+def test_popAll():
+    retry_queue = lib.RetryQueue(initial_backoff=60)
+    retry_queue.park("item1")
+    retry_queue.park("item2")
+    assert retry_queue.popAll() == ["item1", "item2"]
+    assert not retry_queue
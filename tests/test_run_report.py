@@ -0,0 +1,114 @@
+import lib
+import plugin_registry
+import json
+import logging
+import pytest
+from unittest import mock
+
+
+@pytest.fixture
+def logger():
+    return logging.getLogger("test")
+
+
+class FakeUrlResolver(plugin_registry.IUrlResolver):
+    def resolveToContent(self, url: str):
+        content = self._getOrCompute(self._cache, url, lambda: url.encode())
+        self._countFetched(content)
+        return plugin_registry.contract.IContent(content=content)
+
+    def __init__(self, logger):
+        super().__init__(logger)
+        self._cache = {}
+
+
+def test_RunReport(logger):
+    report = lib.RunReport()
+    with report.measureStage("clone"):
+        pass
+    with report.measureParse():
+        pass
+    with report.measureWrite():
+        pass
+    for url in ["https://some.host/a", "https://some.host/a", "https://other.host/b"]:
+        with report.measureResolve(url):
+            pass
+    with report.measureFile("somefile.xml"):
+        pass
+
+    url_resolver = FakeUrlResolver(logger)
+    url_resolver.resolveToContent("https://some.host/a")
+    url_resolver.resolveToContent("https://some.host/a")
+    plugin = mock.Mock()
+    plugin.getUrlResolvers.return_value = [url_resolver]
+
+    report_dict = report.toDict([plugin], top=1)
+
+    assert list(report_dict["stages"]) == ["clone"]
+    assert report_dict["parse_seconds"] >= 0
+    assert report_dict["write_seconds"] >= 0
+    assert report_dict["resolve"]["https"]["some.host"]["calls"] == 2
+    assert report_dict["resolve"]["https"]["other.host"]["calls"] == 1
+    assert report_dict["url_resolvers"] == {
+        __name__: {
+            "cache_hits": 1,
+            "cache_misses": 1,
+            "persistent_cache_hits": 0,
+            "bytes_fetched": 38,
+        }
+    }
+    assert [f["file"] for f in report_dict["slowest_files"]] == ["somefile.xml"]
+    assert len(report_dict["slowest_urls"]) == 1
+    json.dumps(report_dict)
+
+
+def test_processFile_measured(logger):
+    file_content = """
+        <root>
+            <properties key="pwrt:inspector:value-deps" value="someproto://some.host/file1.ext#L1"/>
+        </root>
+    """
+    mock_plugin = mock.MagicMock()
+    mock_plugin.getUrlResolver.return_value.isVersioningSupported = False
+    mock_plugin.getUrlResolver.return_value.resolveToFingerprint.return_value = (
+        plugin_registry.contract.IContent(content=b"somecontent")
+    )
+    report = lib.startRunReport()
+
+    with mock.patch("builtins.open", mock.mock_open(read_data=file_content)):
+        lib.processFile(logger, [mock_plugin], "somefile.xml")
+
+    assert report.resolve["someproto"]["some.host"]["calls"] == 1
+    assert list(report.file_seconds) == ["somefile.xml"]
+    assert report.parse_seconds > 0
+    assert report.write_seconds > 0  # Hash of the content is new
+
+
+def test_writePrometheusTextfile(tmp_path):
+    report_dict = {
+        "stages": {"clone": 1.5},
+        "parse_seconds": 2,
+        "write_seconds": 3,
+        "resolve": {"https": {"some.host": {"calls": 4, "seconds": 5}}},
+        "url_resolvers": {
+            "plugins.https.handler": {
+                "cache_hits": 6,
+                "cache_misses": 7,
+                "persistent_cache_hits": 5,
+                "bytes_fetched": 8,
+            }
+        },
+    }
+    file_name = str(tmp_path / "inspector.prom")
+
+    lib.writePrometheusTextfile(report_dict, file_name)
+
+    with open(file_name) as f:
+        lines = f.read().splitlines()
+    assert 'pwrt_inspector_stage_seconds{stage="clone"} 1.5' in lines
+    assert "pwrt_inspector_parse_seconds 2" in lines
+    assert 'pwrt_inspector_resolve_calls{scheme="https",host="some.host"} 4' in lines
+    assert (
+        'pwrt_inspector_bytes_fetched{url_resolver="plugins.https.handler"} 8' in lines
+    )
+    assert "# TYPE pwrt_inspector_cache_hits gauge" in lines
@@ -0,0 +1,104 @@
+import lib
+import json
+import logging
+import os
+import pytest
+
+
+@pytest.fixture
+def logger():
+    return logging.getLogger("test")
+
+
+def test_parseShard():
+    assert lib.parseShard("1/4") == (1, 4)
+    with pytest.raises(ValueError):
+        lib.parseShard("4/4")
+
+
+def test_shardPlan():
+    plan = lib.Plan()
+    plan.add("/clone/model/a.xml", ["someproto://some.host/file1.ext#L1"])
+    plan.add("/clone/model/b.xml", ["someproto://some.host/file2.ext#L1"])
+    plan.add(
+        "/clone/model/c.xml",
+        ["someproto://some.host/file2.ext#L5", "someproto://some.host/file3.ext#L1"],
+    )
+    plan.add(
+        "/clone/model/d.xml",
+        ["someproto://some.host/file3.ext#L2"],
+        ["someproto://some.host/file3.ext#L2"],
+    )
+    for i in range(20):
+        plan.add(f"/clone/model/e{i}.xml", [f"someproto://some.host/e{i}.ext#L1"])
+
+    shards = [lib.shardPlan(plan, "/clone", index, 4) for index in range(4)]
+
+    # Every file is in exactly one shard
+    all_files = [file_name for files, _ in shards for file_name in files]
+    assert sorted(all_files) == sorted(plan.files)
+    # Files which share URLs, even with different fragments, are in the same shard
+    for files, shard_plan in shards:
+        assert ("/clone/model/b.xml" in files) == ("/clone/model/c.xml" in files)
+        assert ("/clone/model/c.xml" in files) == ("/clone/model/d.xml" in files)
+        assert list(shard_plan.files) == files
+        assert list(shard_plan.content_urls) == (
+            ["someproto://some.host/file3.ext#L2"]
+            if "/clone/model/d.xml" in files
+            else []
+        )
+    # Files are spread across shards
+    assert sum(1 for files, _ in shards if files) > 1
+    # Same on every node
+    assert lib.shardPlan(plan, "/clone", 2, 4)[0] == shards[2][0]
+
+
+def test_writeShardOutput_mergeShardOutputs(tmp_path, logger):
+    shard_clone = tmp_path / "shard_clone"
+    (shard_clone / "model" / "sub").mkdir(parents=True)
+    (shard_clone / "model" / "sub" / "a.xml").write_text("changed a")
+    coordinator_clone = tmp_path / "coordinator_clone"
+    (coordinator_clone / "model" / "sub").mkdir(parents=True)
+    (coordinator_clone / "model" / "sub" / "a.xml").write_text("a")
+    output_dir = str(tmp_path / "output")
+
+    lib.writeShardOutput(
+        logger, output_dir, 0, 2, str(shard_clone), ["model/sub/a.xml"], 0, "a1b2"
+    )
+    with pytest.raises(Exception):
+        lib.mergeShardOutputs(logger, output_dir, 2, str(coordinator_clone), "a1b2")
+
+    lib.writeShardOutput(logger, output_dir, 1, 2, str(shard_clone), [], 1, "a1b2")
+    with open(os.path.join(output_dir, "shard-1-of-2.done")) as f:
+        assert json.load(f) == {"files": [], "errors": 1, "head": "a1b2"}
+
+    # Of another commit than the clone's
+    with pytest.raises(Exception, match="is of commit a1b2"):
+        lib.mergeShardOutputs(logger, output_dir, 2, str(coordinator_clone), "c3d4")
+    assert (coordinator_clone / "model" / "sub" / "a.xml").read_text() == "a"
+
+    assert lib.mergeShardOutputs(
+        logger, output_dir, 2, str(coordinator_clone), "a1b2"
+    ) == ["model/sub/a.xml"]
+    assert (coordinator_clone / "model" / "sub" / "a.xml").read_text() == "changed a"
+    # Consumed
+    assert os.listdir(output_dir) == []
+
+
+def test_writeShardOutput_rerun_failing(tmp_path, logger):
+    shard_clone = tmp_path / "shard_clone"
+    (shard_clone / "model").mkdir(parents=True)
+    (shard_clone / "model" / "a.xml").write_text("changed a")
+    output_dir = str(tmp_path / "output")
+    lib.writeShardOutput(
+        logger, output_dir, 0, 1, str(shard_clone), ["model/a.xml"], 0, "a1b2"
+    )
+
+    with pytest.raises(FileNotFoundError):
+        lib.writeShardOutput(
+            logger, output_dir, 0, 1, str(shard_clone), ["model/missing.xml"], 0, "a1b2"
+        )
+
+    assert not os.path.exists(os.path.join(output_dir, "shard-0-of-1.done"))
+    with pytest.raises(Exception, match="not complete"):
+        lib.mergeShardOutputs(logger, output_dir, 1, str(tmp_path), "a1b2")
@@ -0,0 +1,74 @@
+import plugin_registry
+import asyncio
+import json
+import logging
+
+
+class FakeUrlResolver(plugin_registry.IUrlResolver):
+    def resolveToContent(self, url: str):
+        with plugin_registry.tracing.span("GET", "http", url=url):
+            return plugin_registry.contract.IContent(content=url.encode())
+
+    async def resolveToContentAsync(self, url: str):
+        with plugin_registry.tracing.span("GET", "http", url=url):
+            await asyncio.sleep(0.01)  # The other coroutine runs meanwhile
+            return plugin_registry.contract.IContent(content=url.encode())
+
+
+def test_traced(tmp_path):
+    url_resolver = FakeUrlResolver(logging.getLogger("tests"))
+    trace_file = str(tmp_path / "trace.json")
+
+    with plugin_registry.tracing.traced(trace_file):
+        content_obj = url_resolver.resolveToContent("https://some.host/a")
+
+    assert content_obj.content == b"https://some.host/a"
+    with open(trace_file) as f:
+        events = json.load(f)["traceEvents"]
+    inner, outer = events  # A span is recorded when it ends
+    assert outer["name"] == "resolveToContent some.host"
+    assert outer["cat"] == __name__
+    assert outer["args"] == {"url": "https://some.host/a"}
+    assert inner["name"] == "GET"
+    assert outer["ts"] <= inner["ts"]
+    assert inner["ts"] + inner["dur"] <= outer["ts"] + outer["dur"]
+    assert outer["ph"] == inner["ph"] == "X"
+
+
+def test_traced_async(tmp_path):
+    url_resolver = FakeUrlResolver(logging.getLogger("tests"))
+    trace_file = str(tmp_path / "trace.json")
+
+    async def run():
+        return await asyncio.gather(
+            url_resolver.resolveToContentAsync("https://some.host/a"),
+            url_resolver.resolveToContentAsync("https://some.host/b"),
+        )
+
+    with plugin_registry.tracing.traced(trace_file):
+        asyncio.run(run())
+
+    with open(trace_file) as f:
+        events = json.load(f)["traceEvents"]
+    assert len(events) == 4
+    outers = [e for e in events if e["name"] == "resolveToContentAsync some.host"]
+    assert len(outers) == 2
+    # Concurrent coroutines are on tracks of their own, where their spans nest
+    assert outers[0]["tid"] != outers[1]["tid"]
+    for outer in outers:
+        (inner,) = [
+            e
+            for e in events
+            if e["name"] == "GET" and e["args"]["url"] == outer["args"]["url"]
+        ]
+        assert inner["tid"] == outer["tid"]
+        assert outer["ts"] <= inner["ts"]
+        assert inner["ts"] + inner["dur"] <= outer["ts"] + outer["dur"]
+
+
+def test_not_traced():
+    url_resolver = FakeUrlResolver(logging.getLogger("tests"))
+
+    with plugin_registry.tracing.traced(None):
+        assert not plugin_registry.tracing.isTracing()
+        url_resolver.resolveToContent("https://some.host/a")